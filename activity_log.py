@@ -0,0 +1,259 @@
+import mmap
+import os
+import struct
+import threading
+import time
+
+KEYBOARD = 1
+MOUSE = 2
+WINDOW = 3
+SCREEN = 4
+PAUSE = 5
+RESUME = 6
+BREAK_START = 7
+BREAK_END = 8
+INPUT = 9  # Input of unknown device, seen by an OS idle-time query
+EVENT_KINDS = {
+    "keyboard": KEYBOARD,
+    "mouse": MOUSE,
+    "window": WINDOW,
+    "screen": SCREEN,
+    "pause": PAUSE,
+    "resume": RESUME,
+    "break_start": BREAK_START,
+    "break_end": BREAK_END,
+    "input": INPUT,
+}
+
+# Raw records: wall-clock seconds, kind, flags, padding, kind-specific value
+RECORD = struct.Struct("<dBBHI")
+# Compacted records: epoch minute, kind, event count
+AGGREGATE = struct.Struct("<qBxxxI")
+# numpy views of both; set by _load_numpy()
+np = RECORD_DTYPE = AGGREGATE_DTYPE = None
+
+SEGMENT_PREFIX = "segment-"
+AGGREGATE_PREFIX = "minutes-"
+
+
+def _load_numpy():
+    # Appending only needs struct; numpy is imported the first time the log is
+    # read back or compacted
+    global np, RECORD_DTYPE, AGGREGATE_DTYPE
+    if np is None:
+        import numpy
+        RECORD_DTYPE = numpy.dtype([("time", "<f8"), ("kind", "u1"), ("flags", "u1"), ("reserved", "<u2"),
+                                    ("value", "<u4")])
+        AGGREGATE_DTYPE = numpy.dtype([("minute", "<i8"), ("kind", "u1"), ("pad", "u1", (3,)), ("count", "<u4")])
+        np = numpy
+
+
+class ActivityLog:
+    # Append-only log of fixed-size activity records, split into segment
+    # files. Appends are a struct pack and a buffered write under a short
+    # lock; a background thread flushes them and compacts segments older than
+    # `raw_retention` seconds into per-minute counts. Timestamps never go
+    # backwards within the log, so readers can binary-search a segment.
+    def __init__(self, directory, segment_records=1 << 16, segment_seconds=86400, raw_retention=7 * 86400,
+                 flush_interval=5.0, compact_interval=3600.0):
+        self.directory = directory
+        self.segment_records = segment_records
+        self.segment_seconds = segment_seconds
+        self.raw_retention = raw_retention
+        self.flush_interval = flush_interval
+        self.compact_interval = compact_interval
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._file = None
+        self._segment_path = None
+        self._segment_count = 0
+        self._segment_end = 0.0
+        self._last_time = self._latest_time()
+        self._stop = threading.Event()
+        self._thread = None
+        self.appended = 0
+
+    def append(self, kind, value=0, flags=0, timestamp=None):
+        if timestamp is None:
+            timestamp = time.time()
+        with self._lock:
+            # Late reports (an idle source's last-input time) and wall clock
+            # steps back are recorded at the latest time already written
+            if timestamp < self._last_time:
+                timestamp = self._last_time
+            else:
+                self._last_time = timestamp
+            record = RECORD.pack(timestamp, kind, flags, 0, value & 0xFFFFFFFF)
+            if self._file is None or self._segment_count >= self.segment_records or timestamp >= self._segment_end:
+                self._roll(timestamp)
+            self._file.write(record)
+            self._segment_count += 1
+            self.appended += 1
+
+    def _roll(self, timestamp):
+        if self._file is not None:
+            self._file.close()
+        path = os.path.join(self.directory, f"{SEGMENT_PREFIX}{timestamp:017.6f}.bin")
+        self._file = open(path, "ab")
+        self._segment_path = path
+        self._segment_count = 0
+        self._segment_end = timestamp + self.segment_seconds
+
+    def _latest_time(self):
+        # The last complete record on disk, so a reopened log keeps its order
+        segments = self._files(SEGMENT_PREFIX)
+        if not segments:
+            return 0.0
+        path = segments[-1][1]
+        size = os.path.getsize(path) // RECORD.size * RECORD.size
+        if size == 0:
+            return segments[-1][0]
+        with open(path, "rb") as f:
+            f.seek(size - RECORD.size)
+            return RECORD.unpack(f.read(RECORD.size))[0]
+
+    def flush(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+
+    def _files(self, prefix):
+        names = sorted(name for name in os.listdir(self.directory)
+                       if name.startswith(prefix) and name.endswith(".bin"))
+        return [(float(name[len(prefix):-4]), os.path.join(self.directory, name)) for name in names]
+
+    def segments(self):
+        # Raw segments that have a compacted copy are skipped: compact()
+        # writes the aggregates before it removes the raw file, and a removal
+        # that failed must not count the segment twice
+        compacted = {start for start, _ in self._files(AGGREGATE_PREFIX)}
+        return [(start, path) for start, path in self._files(SEGMENT_PREFIX) if start not in compacted]
+
+    def _remove_compacted(self):
+        # Retries removals that failed during an earlier compaction
+        compacted = {start for start, _ in self._files(AGGREGATE_PREFIX)}
+        for start, path in self._files(SEGMENT_PREFIX):
+            if start in compacted:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def read(self, start=None, end=None):
+        # Returns zero-copy record views, one per segment overlapping [start, end).
+        # The views keep their segment mapped until they are released.
+        _load_numpy()
+        self.flush()
+        segments = self.segments()
+        views = []
+        for i, (segment_start, path) in enumerate(segments):
+            next_start = segments[i + 1][0] if i + 1 < len(segments) else float("inf")
+            if (end is not None and segment_start >= end) or (start is not None and next_start <= start):
+                continue
+            records = self._map(path)
+            if records is None:
+                continue
+            times = records["time"]
+            lo = 0 if start is None else int(np.searchsorted(times, start, "left"))
+            hi = len(records) if end is None else int(np.searchsorted(times, end, "left"))
+            if hi > lo:
+                views.append(records[lo:hi])
+        return views
+
+    @staticmethod
+    def _map(path):
+        _load_numpy()
+        size = os.path.getsize(path) // RECORD.size * RECORD.size
+        if size == 0:
+            return None
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+        return np.frombuffer(mapped, dtype=RECORD_DTYPE)
+
+    def read_aggregates(self, start=None, end=None):
+        _load_numpy()
+        parts = [np.fromfile(path, dtype=AGGREGATE_DTYPE) for _, path in self._files(AGGREGATE_PREFIX)]
+        if not parts:
+            return np.zeros(0, dtype=AGGREGATE_DTYPE)
+        aggregates = np.concatenate(parts)
+        mask = np.ones(len(aggregates), dtype=bool)
+        if start is not None:
+            mask &= aggregates["minute"] * 60 >= start
+        if end is not None:
+            mask &= aggregates["minute"] * 60 < end
+        return aggregates[mask]
+
+    def minute_counts(self, kind, start, end):
+        # Events of one kind per minute over [start, end), from both compacted
+        # and raw history
+        _load_numpy()
+        first = int(start // 60)
+        counts = np.zeros(int(np.ceil(end / 60)) - first, dtype=np.int64)
+        # Whole minutes: the first one starts before `start` when it is not on a minute
+        aggregates = self.read_aggregates(first * 60, end)
+        aggregates = aggregates[aggregates["kind"] == kind]
+        np.add.at(counts, aggregates["minute"] - first, aggregates["count"])
+        for records in self.read(start, end):
+            minutes = (records["time"][records["kind"] == kind] // 60).astype(np.int64) - first
+            counts += np.bincount(minutes, minlength=len(counts))[:len(counts)]
+        return counts
+
+    def compact(self, now=None):
+        # Replaces raw segments older than the retention window with per-minute
+        # counts. The active segment is never touched.
+        _load_numpy()
+        cutoff = (now if now is not None else time.time()) - self.raw_retention
+        with self._lock:
+            active = self._segment_path
+        self._remove_compacted()
+        segments = self.segments()
+        compacted = 0
+        for i, (segment_start, path) in enumerate(segments):
+            next_start = segments[i + 1][0] if i + 1 < len(segments) else None
+            if path == active or next_start is None or next_start > cutoff:
+                continue
+            records = np.fromfile(path, dtype=RECORD_DTYPE)
+            keys = (records["time"] // 60).astype(np.int64) * 256 + records["kind"]
+            unique, counts = np.unique(keys, return_counts=True)
+            aggregates = np.zeros(len(unique), dtype=AGGREGATE_DTYPE)
+            aggregates["minute"] = unique // 256
+            aggregates["kind"] = unique % 256
+            aggregates["count"] = counts
+            target = os.path.join(self.directory, f"{AGGREGATE_PREFIX}{segment_start:017.6f}.bin")
+            temp = target + ".tmp"
+            with open(temp, "wb") as f:
+                aggregates.tofile(f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp, target)
+            compacted += 1
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        return compacted
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="activity-log", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        next_compaction = time.monotonic()
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+            if time.monotonic() >= next_compaction:
+                try:
+                    self.compact()
+                except OSError:
+                    pass
+                next_compaction = time.monotonic() + self.compact_interval
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
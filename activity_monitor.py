@@ -1,54 +1,180 @@
+import queue
+import threading
 import time
 from threading import Thread
-from pynput import keyboard, mouse
-import win32gui
-import mss
-from PIL import Image, ImageChops
-import numpy as np
+from input_events import InputCoalescer
+from sampling_scheduler import SamplingScheduler
+from focus_backends import create_focus_backend
+from focus_time import FocusTimeTracker
+from idle_sources import IdlePoller, create_idle_source
+from monitor_log import get_logger
+from activity_log import ActivityLog, EVENT_KINDS
+from clock import SYSTEM_CLOCK
+from metrics import REGISTRY
+from profiling import STAGES
+
+ACTIVITY_STAMPS = REGISTRY.counter("healthguard_activity_stamps_total",
+                                   "Activity stamps accepted after coalescing", ["source"])
+SCREEN_CAPTURE_SECONDS = REGISTRY.histogram("healthguard_screen_capture_seconds",
+                                            "Wall time of one screen capture and comparison")
+SCREEN_CHANGES = REGISTRY.counter("healthguard_screen_changes_total", "Captures that found the screen changed")
+SENSOR_ERRORS = REGISTRY.counter("healthguard_sensor_errors_total", "Errors raised by a sensor loop", ["sensor"])
 
 class ActivityMonitor:
-    def __init__(self, app):
+    def __init__(self, app, detector_factory=None, runtime=None, clock=SYSTEM_CLOCK):
+        from config import (SENSOR_RUNTIME, INPUT_COALESCE_WINDOW, MOUSE_JITTER_PIXELS, IDLE_THRESHOLD,
+                            SCREEN_CHECK_INTERVAL, SCREEN_MIN_INTERVAL, SCREEN_MAX_INTERVAL,
+                            ACTIVITY_LOG_DIR, ACTIVITY_LOG_RAW_DAYS, IDLE_SOURCE)
         self.app = app
-        self.last_activity_time = time.time()
+        self.clock = clock
+        self.log = get_logger()
+        self.detector_factory = detector_factory
+        self.runtime = runtime or SENSOR_RUNTIME
+        self.last_activity_time = clock.time()
+        # Called with each activity timestamp; the UI points it at its session engine
+        self.activity_listener = None
         self.listener_running = True
         self.last_window = None
         self.last_screenshot = None
-        
-        self.start_keyboard_listener()
-        self.start_mouse_listener()
-        self.start_window_monitor()
-        self.start_screen_monitor()
+        self.focus_backend = None
+        self.focus_time = FocusTimeTracker(now=clock.time)
+        self.screen_capture = None
+        self.capture_worker = None
+        self.keyboard_listener = None
+        self.mouse_listener = None
+        self.idle_poller = None
+        self.wakeups = 0
+        # Window, screen and idle results for the UI; drained on the Tk thread
+        self.events = queue.SimpleQueue()
+        self.activity_log = None
+        if ACTIVITY_LOG_DIR:
+            self.activity_log = ActivityLog(ACTIVITY_LOG_DIR, raw_retention=ACTIVITY_LOG_RAW_DAYS * 86400)
+
+        self.input_coalescer = InputCoalescer(self.on_activity, window=INPUT_COALESCE_WINDOW,
+                                              jitter=MOUSE_JITTER_PIXELS, now=clock.monotonic)
+        self.screen_scheduler = SamplingScheduler(IDLE_THRESHOLD, SCREEN_CHECK_INTERVAL,
+                                                  SCREEN_MIN_INTERVAL, SCREEN_MAX_INTERVAL, now=clock.time)
+        self._screen_local = threading.local()
+        self.idle_source_name = IDLE_SOURCE
+        self.sensor_runtime = None
+        self.started = False
+        self.register_metrics()
+
+    def register_metrics(self):
+        # Read at render time from counters the monitor keeps anyway
+        coalescer = self.input_coalescer
+        REGISTRY.callback("healthguard_input_events_received_total", "Raw keyboard and mouse events received",
+                          lambda: coalescer.received, "counter")
+        REGISTRY.callback("healthguard_input_events_forwarded_total", "Input events forwarded after coalescing",
+                          lambda: coalescer.forwarded, "counter")
+        REGISTRY.callback("healthguard_monitor_wakeups_total", "Sensor thread wakeups", lambda: self.wakeups, "counter")
+        REGISTRY.callback("healthguard_seconds_since_activity", "Seconds since the last activity stamp",
+                          lambda: self.clock.time() - self.last_activity_time)
+
+    def start(self):
+        # Starts every sensor. Kept out of __init__ so the window can be shown
+        # first; pynput, mss and numpy are only imported from here on.
+        self.started = True
+        self._runtime_started = time.monotonic()
+        self._ctx_switches_start = self._context_switches()
+        if self.activity_log is not None:
+            self.activity_log.start()
+        if self.idle_source_name != "hooks":
+            self.open_idle_source(self.idle_source_name)
+        if self.idle_poller is None:
+            self.start_keyboard_listener()
+            self.start_mouse_listener()
+        if self.runtime == "asyncio":
+            from sensor_runtime import AsyncSensorRuntime
+            self.sensor_runtime = AsyncSensorRuntime(self)
+            self.open_focus_backend()
+            self.sensor_runtime.start()
+        else:
+            self.start_window_monitor()
+            self.start_screen_monitor()
+            if self.idle_poller is not None:
+                self.start_idle_monitor()
 
     def start_keyboard_listener(self):
-        def on_key_press(key):
-            print(f"Keyboard activity detected: {key}")
-            self.on_activity()
-            
-        self.keyboard_listener = keyboard.Listener(on_press=on_key_press)
+        # The logging wrapper is only installed at debug level, so the normal
+        # path goes straight from pynput into the coalescer
+        from pynput import keyboard
+        on_press = self.input_coalescer.on_key
+        if STAGES.enabled:
+            on_press = STAGES.wrap("input.keyboard", on_press)
+        if self.log.debug_enabled:
+            def on_press(key, forward=on_press):
+                self.log.debug("key_press", key=key)
+                forward(key)
+        self.keyboard_listener = keyboard.Listener(on_press=on_press)
         self.keyboard_listener.start()
 
     def start_mouse_listener(self):
-        def on_mouse_move(x, y):
-            print("Mouse movement detected")
-            self.on_activity()
-            
-        def on_mouse_click(x, y, button, pressed):
-            if pressed:
-                print(f"Mouse click detected: {button}")
-                self.on_activity()
-                
-        def on_mouse_scroll(x, y, dx, dy):
-            print("Mouse scroll detected")
-            self.on_activity()
-            
+        from pynput import mouse
+        on_move = self.input_coalescer.on_move
+        on_click = self.input_coalescer.on_click
+        on_scroll = self.input_coalescer.on_scroll
+        if STAGES.enabled:
+            on_move = STAGES.wrap("input.mouse_move", on_move)
+            on_click = STAGES.wrap("input.mouse_click", on_click)
+            on_scroll = STAGES.wrap("input.mouse_scroll", on_scroll)
+        if self.log.debug_enabled:
+            def on_move(x, y, forward=on_move):
+                self.log.debug("mouse_input", x=x, y=y)
+                forward(x, y)
         self.mouse_listener = mouse.Listener(
-            on_move=on_mouse_move,
-            on_click=on_mouse_click,
-            on_scroll=on_mouse_scroll
+            on_move=on_move,
+            on_click=on_click,
+            on_scroll=on_scroll
         )
         self.mouse_listener.start()
 
+    def open_focus_backend(self):
+        from config import FOCUS_BACKEND
+        try:
+            self.focus_backend = create_focus_backend(FOCUS_BACKEND)
+            self.focus_backend.start()
+        except Exception as e:
+            self.log.warning("window_monitor_unavailable", error=str(e))
+            self.focus_backend = None
+        return self.focus_backend
+
+    def open_idle_source(self, name):
+        # A query-based idle source replaces the global input hooks; if none
+        # works here the monitor falls back to the hooks
+        from config import IDLE_THRESHOLD, IDLE_POLL_INTERVAL
+        try:
+            source = create_idle_source(name)
+        except Exception as e:
+            self.log.warning("idle_source_unavailable", source=name, error=str(e))
+            return None
+        self.idle_poller = IdlePoller(source, IDLE_THRESHOLD, self.on_input_seen, IDLE_POLL_INTERVAL,
+                                      now=self.clock.time)
+        return self.idle_poller
+
+    def on_input_seen(self, timestamp):
+        self.on_activity("input", timestamp=timestamp)
+
+    def poll_idle_source(self):
+        self.wakeups += 1
+        try:
+            return self.idle_poller.poll()
+        except Exception as e:
+            SENSOR_ERRORS.labels("idle").inc()
+            self.log.error("idle_source_error", error=str(e))
+            return self.idle_poller.idle_interval
+
+    def start_idle_monitor(self):
+        self.idle_thread = Thread(target=self.monitor_idle_source, name="idle-poll", daemon=True)
+        self.idle_thread.start()
+
+    def monitor_idle_source(self):
+        while self.listener_running:
+            self.clock.sleep(self.poll_idle_source())
+
     def start_window_monitor(self):
+        if self.open_focus_backend() is None:
+            return
         self.window_thread = Thread(target=self.monitor_active_window)
         self.window_thread.daemon = True
         self.window_thread.start()
@@ -58,52 +184,188 @@ class ActivityMonitor:
         self.screen_thread.daemon = True
         self.screen_thread.start()
 
-    def on_activity(self, *args, **kwargs):
+    def on_activity(self, source=None, value=0, timestamp=None):
         if not self.app.paused:
-            self.last_activity_time = time.time()
+            if timestamp is None:
+                self.last_activity_time = now = self.clock.time()
+            else:
+                # Idle-source stamps lie in the past; never move activity backwards
+                now = timestamp
+                self.last_activity_time = max(self.last_activity_time, now)
+            ACTIVITY_STAMPS.labels(source).inc()
+            if self.activity_listener is not None:
+                self.activity_listener(now)
+            if self.activity_log is not None and source is not None:
+                self.activity_log.append(EVENT_KINDS[source], value, timestamp=now)
+
+    def record_event(self, kind, value=0):
+        if self.activity_log is not None:
+            self.activity_log.append(EVENT_KINDS[kind], value, timestamp=self.clock.time())
+
+    def input_stats(self):
+        if self.idle_poller is not None:
+            return self.idle_poller.stats()
+        return self.input_coalescer.stats()
+
+    def screen_stats(self):
+        if self.capture_worker is not None:
+            return self.capture_worker.stats()
+        return self.screen_capture.stats() if self.screen_capture else {}
+
+    def screen_schedule_stats(self):
+        return self.screen_scheduler.stats()
+
+    def screen_changes(self):
+        return self.screen_capture.last_changes if self.screen_capture else []
+
+    @staticmethod
+    def _context_switches():
+        try:
+            import psutil
+            switches = psutil.Process().num_ctx_switches()
+            return switches.voluntary + switches.involuntary
+        except Exception:
+            return None
+
+    def runtime_stats(self):
+        minutes = max(time.monotonic() - self._runtime_started, 1e-9) / 60
+        switches = self._context_switches()
+        return {
+            "runtime": self.runtime,
+            "threads": threading.active_count(),
+            "wakeups": self.wakeups,
+            "wakeups_per_minute": self.wakeups / minutes,
+            "context_switches_per_minute": (None if switches is None or self._ctx_switches_start is None
+                                            else (switches - self._ctx_switches_start) / minutes),
+        }
 
     def monitor_active_window(self):
-        from config import SCREEN_CHECK_INTERVAL
         while self.listener_running:
             try:
-                current_window = win32gui.GetForegroundWindow()
-                if current_window != self.last_window:
-                    self.last_window = current_window
-                    window_title = win32gui.GetWindowText(current_window)
-                    print(f"Window changed to: {window_title}")
-                    self.on_activity()
-                time.sleep(1)
+                change = self.focus_backend.wait_for_change()
+                if change is None:
+                    continue
+                self.handle_focus_change(change)
             except Exception as e:
-                print(f"Window monitoring error: {str(e)}")
+                SENSOR_ERRORS.labels("window").inc()
+                self.log.error("window_monitor_error", error=str(e))
+
+    def handle_focus_change(self, change):
+        self.wakeups += 1
+        if change.window != self.last_window:
+            self.last_window = change.window
+            self.log.info("window_change", title=change.title, app=change.app)
+            self.focus_time.focus(change.app, change.title)
+            self.on_activity("window", change.window)
+            self.events.put(("window", change))
+
+    def create_change_detector(self):
+        if self.detector_factory is not None:
+            return self.detector_factory()
+        from change_detector import create_change_detector
+        return create_change_detector()
+
+    def next_screen_action(self):
+        self.wakeups += 1
+        return self.screen_scheduler.next_action(
+            self.last_activity_time, getattr(self.app, "app_state", "working"), self.app.paused)
+
+    def _screen_grabber(self):
+        # mss keeps per-thread OS handles, so each capturing thread gets its own
+        sct = getattr(self._screen_local, "sct", None)
+        if sct is None:
+            from config import SCREEN_THUMBNAIL_SIZE, SCREEN_ROW_STRIDE, SCREEN_MONITORS
+            import mss
+            from screen_capture import ScreenCapture, select_monitors
+            sct = self._screen_local.sct = mss.mss()
+            if self.screen_capture is None:
+                self.screen_capture = ScreenCapture(select_monitors(sct.monitors, SCREEN_MONITORS),
+                                                    SCREEN_THUMBNAIL_SIZE, SCREEN_ROW_STRIDE,
+                                                    self.create_change_detector)
+        return sct
+
+    def _capture_in_process(self, mode, calibrate):
+        sct = self._screen_grabber()
+        if mode == "baseline":
+            self.screen_capture.reset()
+        return self.screen_capture.capture(sct, calibrate)
+
+    def _capture_in_worker(self, mode, calibrate):
+        if self.capture_worker is None:
+            from config import SCREEN_THUMBNAIL_SIZE, SCREEN_ROW_STRIDE, SCREEN_MONITORS, SCREEN_TILE_GRID
+            from capture_worker import CaptureWorker
+            self.capture_worker = CaptureWorker(SCREEN_THUMBNAIL_SIZE, SCREEN_ROW_STRIDE, SCREEN_MONITORS,
+                                                SCREEN_TILE_GRID, log=self.log)
+        return self.capture_worker.capture(mode, calibrate)
+
+    def capture_screen(self, mode):
+        from config import SCREEN_CAPTURE_PROCESS, IDLE_THRESHOLD
+        # Sub-threshold changes right after input may be the user's own
+        # typing; only quiet screens teach the detector its noise floor
+        calibrate = self.clock.time() - self.last_activity_time >= IDLE_THRESHOLD
+        try:
+            started = time.perf_counter()
+            cpu_start = time.thread_time()
+            if SCREEN_CAPTURE_PROCESS:
+                changes = self._capture_in_worker(mode, calibrate)
+                if changes is None:
+                    return
+            else:
+                changes = self._capture_in_process(mode, calibrate)
+            self.screen_scheduler.record_capture(time.thread_time() - cpu_start)
+            elapsed = time.perf_counter() - started
+            SCREEN_CAPTURE_SECONDS.observe(elapsed)
+            if STAGES.enabled:
+                STAGES.record("screen.capture", elapsed)
+            self.events.put(("screen", [(change.monitor, change.score, change.changed) for change in changes]))
+            for change in changes:
+                if change.changed:
+                    SCREEN_CHANGES.inc()
+                    row, column = divmod(int(change.tiles.argmax()), change.tiles.shape[1])
+                    self.log.info("screen_change", monitor=change.monitor, tile=f"{row},{column}",
+                                  score=change.score)
+                    self.on_activity("screen", int(change.score))
+                    break
+        except Exception as e:
+            SENSOR_ERRORS.labels("screen").inc()
+            self.log.error("screen_monitor_error", error=str(e))
+
+    def close_screen_grabber(self):
+        sct = getattr(self._screen_local, "sct", None)
+        if sct is not None:
+            sct.close()
+            self._screen_local.sct = None
+        if self.capture_worker is not None:
+            self.capture_worker.close()
+            self.capture_worker = None
 
     def monitor_screen_changes(self):
-        from config import SCREEN_CHECK_INTERVAL
-        with mss.mss() as sct:
-            last_screenshot = None
-            monitor = sct.monitors[1]
-            
-            while self.listener_running:
-                if not self.app.paused:
-                    try:
-                        screenshot = sct.grab(monitor)
-                        img = Image.frombytes("RGB", screenshot.size, screenshot.rgb)
-                        img = img.convert("L").resize((32, 32))
-                        
-                        if last_screenshot is not None:
-                            diff = ImageChops.difference(img, last_screenshot)
-                            diff_array = np.array(diff)
-                            change_score = np.sum(diff_array) / 255
-                            
-                            if change_score > 100:
-                                print(f"Significant screen change detected (score: {change_score:.1f})")
-                                self.on_activity()
-                        
-                        last_screenshot = img
-                    except Exception as e:
-                        print(f"Screen monitoring error: {str(e)}")
-                time.sleep(SCREEN_CHECK_INTERVAL)
+        while self.listener_running:
+            mode, delay = self.next_screen_action()
+            if mode is not None:
+                self.capture_screen(mode)
+            self.clock.sleep(delay)
+        self.close_screen_grabber()
+
+    def drain_events(self):
+        events = []
+        try:
+            while True:
+                events.append(self.events.get_nowait())
+        except queue.Empty:
+            return events
 
     def stop(self):
         self.listener_running = False
-        self.keyboard_listener.stop()
-        self.mouse_listener.stop()
\ No newline at end of file
+        if self.sensor_runtime is not None:
+            self.sensor_runtime.stop()
+        if self.focus_backend is not None:
+            self.focus_backend.close()
+        self.focus_time.suspend()
+        if self.keyboard_listener is not None:
+            self.keyboard_listener.stop()
+            self.mouse_listener.stop()
+        if self.idle_poller is not None:
+            self.idle_poller.source.close()
+        if self.activity_log is not None:
+            self.activity_log.close()
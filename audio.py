@@ -0,0 +1,337 @@
+import io
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import wave
+from monitor_log import get_logger
+
+
+class Sound:
+    __slots__ = ("path", "data", "duration")
+
+    def __init__(self, path, data, duration):
+        self.path = path
+        self.data = data
+        self.duration = duration
+
+
+class SoundCache:
+    # WAV files read and checked once, then played from memory
+    def __init__(self):
+        self._sounds = {}
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.load_ms = 0.0
+
+    def get(self, path):
+        with self._lock:
+            sound = self._sounds.get(path)
+            if sound is None:
+                started = time.perf_counter()
+                with open(path, "rb") as f:
+                    data = f.read()
+                with wave.open(io.BytesIO(data)) as w:
+                    duration = w.getnframes() / float(w.getframerate())
+                sound = self._sounds[path] = Sound(path, data, duration)
+                self.loads += 1
+                self.load_ms += (time.perf_counter() - started) * 1000
+            return sound
+
+
+class AudioBackend:
+    # play() blocks until the sound ends or stop() is called from another
+    # thread, and returns False if the sound was stopped before it started.
+    # Each play() may carry the player's request generation: stop(generation)
+    # only ends playback of that generation or an older one, and also stops
+    # one whose play() has not got going yet, so a stop meant for an old
+    # alert can never cut off a newer one. stop() with no generation ends
+    # whatever is playing.
+    name = "base"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stopped = 0  # generations up to this one must not play
+        self._active = False
+        self._generation = None
+
+    def play(self, sound, generation=None):
+        raise NotImplementedError
+
+    def _begin(self, generation):
+        # Called under self._lock just before the sound starts
+        if generation is not None and generation <= self._stopped:
+            return False
+        self._active = True
+        self._generation = generation
+        return True
+
+    def _end(self):
+        with self._lock:
+            self._active = False
+            self._generation = None
+
+    def stop(self, generation=None):
+        with self._lock:
+            if generation is not None:
+                self._stopped = max(self._stopped, generation)
+            if self._active and (generation is None or self._generation is None
+                                 or self._generation <= generation):
+                self._halt()
+
+    def _halt(self):
+        # Ends the sound that is playing; called under self._lock
+        pass
+
+    def close(self):
+        self.stop()
+
+
+class NullBackend(AudioBackend):
+    # Records what would have been played; for headless runs and tests
+    name = "null"
+
+    def __init__(self):
+        super().__init__()
+        self.played = []
+
+    def play(self, sound, generation=None):
+        with self._lock:
+            if not self._begin(generation):
+                return False
+            self.played.append(sound.path)
+        self._end()
+        return True
+
+
+class WinsoundBackend(AudioBackend):
+    # PlaySound with SND_MEMORY plays straight from the cached bytes. It can't
+    # be combined with SND_ASYNC, which is why playback has its own thread.
+    name = "winsound"
+
+    def __init__(self):
+        super().__init__()
+        import winsound
+        self._winsound = winsound
+
+    def play(self, sound, generation=None):
+        with self._lock:
+            if not self._begin(generation):
+                return False
+        # A stop that lands between here and PlaySound starting is missed;
+        # the blocking call can't be made under the lock
+        try:
+            self._winsound.PlaySound(sound.data, self._winsound.SND_MEMORY | self._winsound.SND_NODEFAULT)
+        finally:
+            self._end()
+        return True
+
+    def _halt(self):
+        # Stops whatever waveform sound this process is playing
+        self._winsound.PlaySound(None, 0)
+
+
+class AplayBackend(AudioBackend):
+    # Pipes the cached WAV into ALSA's aplay
+    name = "aplay"
+
+    def __init__(self):
+        super().__init__()
+        self.executable = shutil.which("aplay")
+        if self.executable is None:
+            raise RuntimeError("aplay not found")
+        self._process = None
+
+    def play(self, sound, generation=None):
+        # Started under the lock, so a stop() either prevents the process or sees it
+        with self._lock:
+            if not self._begin(generation):
+                return False
+            process = self._process = subprocess.Popen([self.executable, "-q", "-"], stdin=subprocess.PIPE,
+                                                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            process.stdin.write(sound.data)
+            process.stdin.close()
+        except (BrokenPipeError, OSError):
+            pass  # stopped while writing
+        process.wait()
+        with self._lock:
+            self._process = None
+        self._end()
+        return True
+
+    def _halt(self):
+        if self._process is not None and self._process.poll() is None:
+            self._process.terminate()
+
+
+AUDIO_BACKENDS = {"null": NullBackend, "winsound": WinsoundBackend, "aplay": AplayBackend}
+
+
+def create_audio_backend(name="auto"):
+    if name == "auto":
+        candidates = ["winsound"] if sys.platform == "win32" else ["aplay"]
+    elif name in AUDIO_BACKENDS:
+        candidates = [name]
+    else:
+        raise ValueError(f"Unknown audio backend: {name}")
+    for candidate in candidates:
+        try:
+            return AUDIO_BACKENDS[candidate]()
+        except Exception as e:
+            get_logger().warning("audio_backend_unavailable", backend=candidate, error=str(e))
+    return NullBackend()
+
+
+class AudioPlayer:
+    # Plays cached sounds on a worker thread. play() only records the request
+    # and wakes the worker; a new request replaces one that hasn't started
+    # and cuts off the sound that is playing, so the latest alert always wins.
+    # play() and cancel() bump a generation and stop the backend only up to
+    # the previous one, so a late stop can't cut off the newer alert, and a
+    # request overtaken while its sound was still loading never plays.
+    def __init__(self, backend=None, cache=None):
+        self.backend = backend or NullBackend()
+        self.cache = cache or SoundCache()
+        self.log = get_logger()
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._idle = threading.Condition(self._lock)
+        self._request = None
+        self._generation = 0
+        self._preload = []
+        self._playing = False
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="audio", daemon=True)
+        self._thread.start()
+
+        self.requests = 0
+        self.played = 0
+        self.replaced = 0
+        self.cancelled = 0
+        self.failures = 0
+        self.max_start_delay_ms = 0.0
+
+    def preload(self, *paths):
+        # Loads sounds on the worker so the first alert doesn't wait on the disk
+        with self._lock:
+            self._preload.extend(paths)
+            self._wake.notify()
+
+    def play(self, path):
+        with self._lock:
+            self.requests += 1
+            if self._request is not None:
+                self.replaced += 1
+            stale = self._generation
+            self._generation += 1
+            self._request = (path, time.perf_counter(), self._generation)
+            playing = self._playing
+            self._wake.notify()
+        if playing:
+            self.backend.stop(stale)
+
+    def cancel(self):
+        with self._lock:
+            playing = self._playing
+            if self._request is not None or playing:
+                self.cancelled += 1
+            stale = self._generation
+            self._generation += 1
+            self._request = None
+        if playing:
+            self.backend.stop(stale)
+
+    def wait_idle(self, timeout=None):
+        # Blocks until nothing is queued or playing
+        with self._lock:
+            return self._idle.wait_for(lambda: self._request is None and not self._preload and not self._playing,
+                                       timeout)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while self._request is None and not self._preload and not self._closed:
+                    self._wake.wait()
+                if self._closed:
+                    return
+                preload, self._preload = self._preload, []
+                request, self._request = self._request, None
+                self._playing = request is not None
+            for path in preload:
+                self._load(path)
+            if request is None:
+                with self._lock:
+                    self._idle.notify_all()
+                continue
+            path, requested_at, generation = request
+            sound = self._load(path)
+            try:
+                if sound is not None:
+                    delay_ms = (time.perf_counter() - requested_at) * 1000
+                    if self.backend.play(sound, generation):
+                        self.max_start_delay_ms = max(self.max_start_delay_ms, delay_ms)
+                        self.played += 1
+            except Exception as e:
+                self.failures += 1
+                self.log.warning("audio_play_failed", path=path, error=str(e))
+            finally:
+                with self._lock:
+                    self._playing = False
+                    self._idle.notify_all()
+
+    def _load(self, path):
+        try:
+            return self.cache.get(path)
+        except (OSError, EOFError, wave.Error) as e:
+            self.failures += 1
+            self.log.warning("audio_load_failed", path=path, error=str(e))
+            return None
+
+    def stats(self):
+        return {
+            "backend": self.backend.name,
+            "requests": self.requests,
+            "played": self.played,
+            "replaced": self.replaced,
+            "cancelled": self.cancelled,
+            "failures": self.failures,
+            "cached": self.cache.loads,
+            "load_ms": self.cache.load_ms,
+            "max_start_delay_ms": self.max_start_delay_ms,
+        }
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._request = None
+            generation = self._generation
+            playing = self._playing
+            self._wake.notify()
+        if playing:
+            self.backend.stop(generation)
+        self._thread.join(timeout=2)
+        self.backend.close()
+
+
+def measure_play_latency(paths, repeats=1000):
+    # Time spent on the calling thread per play() with the null backend
+    player = AudioPlayer(NullBackend())
+    try:
+        player.preload(*paths)
+        started = time.perf_counter()
+        for i in range(repeats):
+            player.play(paths[i % len(paths)])
+        elapsed = time.perf_counter() - started
+        player.wait_idle(timeout=10)
+    finally:
+        player.close()
+    return {"calls": repeats, "us_per_play": elapsed / repeats * 1e6, **player.stats()}
+
+
+if __name__ == "__main__":
+    paths = sys.argv[1:] or [p for p in ("break_alert.wav", "continue_alert.wav") if os.path.exists(p)]
+    for name, value in measure_play_latency(paths).items():
+        print(f"{name}: {value:.3f}" if isinstance(value, float) else f"{name}: {value}")
@@ -0,0 +1,250 @@
+import math
+import multiprocessing
+import os
+import time
+from multiprocessing import shared_memory
+import numpy as np
+from profiling import STAGES
+from screen_capture import MonitorChange
+
+MAX_MONITORS = 8
+BASELINE = 1
+COMPARE = 2
+MODES = {"baseline": BASELINE, "compare": COMPARE}
+
+# `seq` is the seqlock counter: odd while the worker is writing results.
+# `request`/`mode` are written by the UI process, everything else by the worker.
+HEADER_DTYPE = np.dtype([("seq", "<u8"), ("request", "<u8"), ("completed", "<u8"), ("mode", "<u4"),
+                         ("calibrate", "<u4"), ("monitors", "<u4"), ("timestamp", "<f8"), ("grab_ms", "<f4"), ("process_ms", "<f4")])
+
+
+def slot_dtype(size, tile_grid):
+    return np.dtype([("monitor", "<i4"), ("score", "<f4"), ("changed", "u1"), ("pad", "u1", (3,)),
+                     ("tiles", "<f4", tuple(tile_grid)), ("thumbnail", "<f4", (size, size))])
+
+
+class SharedResults:
+    # Fixed layout over a shared-memory block: one header followed by one
+    # slot per monitor. Both processes map the same bytes; nothing is pickled.
+    def __init__(self, buffer, size, tile_grid, max_monitors=MAX_MONITORS):
+        self.header = np.ndarray(1, dtype=HEADER_DTYPE, buffer=buffer)
+        self.slots = np.ndarray(max_monitors, dtype=slot_dtype(size, tile_grid), buffer=buffer,
+                                offset=HEADER_DTYPE.itemsize)
+
+    @staticmethod
+    def nbytes(size, tile_grid, max_monitors=MAX_MONITORS):
+        return HEADER_DTYPE.itemsize + max_monitors * slot_dtype(size, tile_grid).itemsize
+
+    @property
+    def seq(self):
+        return int(self.header["seq"][0])
+
+    def publish(self, changes, thumbnails, completed, grab_seconds, process_seconds):
+        header = self.header
+        header["seq"] += 1
+        for slot, change, thumbnail in zip(self.slots, changes, thumbnails):
+            slot["monitor"] = change.monitor
+            slot["score"] = math.nan if change.score is None else change.score
+            slot["changed"] = change.changed
+            slot["tiles"] = change.tiles
+            slot["thumbnail"] = thumbnail
+        header["monitors"] = len(changes)
+        header["timestamp"] = time.time()
+        header["grab_ms"] = grab_seconds * 1000
+        header["process_ms"] = process_seconds * 1000
+        header["completed"] = completed
+        header["seq"] += 1
+
+    def read(self, retries=1000):
+        # Seqlock read: retry while a write is in progress or if one
+        # started while we were reading. Returns (seq, changes) or None.
+        for _ in range(retries):
+            seq = self.seq
+            if seq & 1:
+                time.sleep(0)
+                continue
+            count = int(self.header["monitors"][0])
+            slots = self.slots[:count]
+            changes = [MonitorChange(int(monitor), None if math.isnan(score) else float(score), bool(changed),
+                                     tiles.copy())
+                       for monitor, score, changed, tiles in zip(slots["monitor"].tolist(), slots["score"].tolist(),
+                                                                 slots["changed"].tolist(), slots["tiles"])]
+            if self.seq == seq:
+                return seq, changes
+        return None
+
+    def thumbnail(self, slot):
+        # Zero-copy view of a monitor's latest thumbnail. It is only
+        # consistent if `seq` has not moved since the caller's read().
+        return self.slots["thumbnail"][slot]
+
+
+def run_worker(shm_name, size, row_stride, monitor_indices, tile_grid, max_monitors,
+               requests, done, stop, parent_pid):
+    # Entry point of the capture process: waits for a request, grabs and
+    # scores the screens, publishes the results and signals `done`
+    import mss
+    from change_detector import create_change_detector
+    from screen_capture import ScreenCapture, select_monitors
+
+    shm = shared_memory.SharedMemory(shm_name)
+    results = SharedResults(shm.buf, size, tile_grid, max_monitors)
+    if results.seq & 1:
+        # A previous worker died halfway through a write
+        results.header["seq"] += 1
+    try:
+        with mss.mss() as sct:
+            capture = ScreenCapture(select_monitors(sct.monitors, monitor_indices)[:max_monitors], size,
+                                    row_stride, create_change_detector)
+            while not stop.is_set():
+                if not requests.wait(1.0):
+                    if os.getppid() != parent_pid:
+                        break
+                    continue
+                requests.clear()
+                header = results.header
+                if int(header["mode"][0]) == BASELINE:
+                    capture.reset()
+                request = int(header["request"][0])
+                changes = capture.capture(sct, bool(header["calibrate"][0]))
+                results.publish(changes, [sampler.thumbnail for sampler in capture.samplers], request,
+                                capture.last_grab_seconds, capture.last_process_seconds)
+                done.set()
+    finally:
+        del results
+        shm.close()
+
+
+class CaptureWorker:
+    # Runs screen capture and change detection in a separate process so a
+    # slow grab never holds the UI process's GIL. Results come back through
+    # shared memory; a crashed or hung worker is restarted on the next
+    # request, with exponential backoff if it keeps failing.
+    def __init__(self, size=32, row_stride=1, monitor_indices=None, tile_grid=(4, 4), timeout=10.0,
+                 max_backoff=60.0, log=None):
+        self.size = size
+        self.row_stride = row_stride
+        self.monitor_indices = monitor_indices
+        self.tile_grid = tuple(tile_grid)
+        self.timeout = timeout
+        self.max_backoff = max_backoff
+        self.log = log
+        # Spawn rather than fork: the UI process has Tk and several threads
+        self._context = multiprocessing.get_context("spawn")
+        self._shm = shared_memory.SharedMemory(create=True, size=SharedResults.nbytes(size, self.tile_grid))
+        self.results = SharedResults(self._shm.buf, size, self.tile_grid)
+        self._requests = self._context.Event()
+        self._done = self._context.Event()
+        self._stop = self._context.Event()
+        self.process = None
+        self._backoff = 1.0
+        self._restart_at = 0.0
+
+        self.captures = 0
+        self.starts = 0
+        self.crashes = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+
+    def start(self):
+        self.process = self._context.Process(
+            target=run_worker, name="screen-capture", daemon=True,
+            args=(self._shm.name, self.size, self.row_stride, self.monitor_indices, self.tile_grid, MAX_MONITORS,
+                  self._requests, self._done, self._stop, os.getpid()))
+        self.process.start()
+        self.starts += 1
+
+    def _ensure_running(self):
+        if self.process is not None and self.process.is_alive():
+            return True
+        now = time.monotonic()
+        if self.process is not None:
+            if self._restart_at == 0.0:
+                self.crashes += 1
+                if self.log is not None:
+                    self.log.warning("capture_worker_exited", exitcode=self.process.exitcode,
+                                     restart_in=self._backoff)
+                self._restart_at = now + self._backoff
+                self._backoff = min(self._backoff * 2, self.max_backoff)
+            if now < self._restart_at:
+                return False
+            self.process.close()
+        self._restart_at = 0.0
+        self._requests.clear()
+        self._done.clear()
+        self.start()
+        return True
+
+    def capture(self, mode, calibrate=True):
+        # Blocks the calling sensor thread (never the UI thread) until the
+        # worker answers; returns MonitorChange rows, or None if no answer
+        if not self._ensure_running():
+            return None
+        header = self.results.header
+        request = int(header["request"][0]) + 1
+        self._done.clear()
+        header["mode"] = MODES[mode]
+        header["calibrate"] = calibrate
+        header["request"] = request
+        self._requests.set()
+        started = time.perf_counter()
+        deadline = started + self.timeout
+        # Wait in short slices so a worker that dies mid-request is noticed
+        # straight away instead of after the full timeout
+        answered = self._done.wait(min(self.timeout, 0.25))
+        while not answered and self.process.is_alive() and time.perf_counter() < deadline:
+            answered = self._done.wait(min(deadline - time.perf_counter(), 0.25))
+        self.wait_seconds += time.perf_counter() - started
+        if not answered:
+            if not self.process.is_alive():
+                return None
+            self.timeouts += 1
+            if self.log is not None:
+                self.log.warning("capture_worker_timeout", timeout=self.timeout)
+            # A hung worker is killed and replaced on the next request
+            self.process.kill()
+            self.process.join(1.0)
+            return None
+        result = self.results.read()
+        if result is None or int(header["completed"][0]) != request:
+            return None
+        if STAGES.enabled:
+            # The worker's own stage timers stay in its process; its grab
+            # time and its convert + diff time for all monitors are
+            # published with the results
+            STAGES.record("screen.grab", float(header["grab_ms"][0]) / 1000)
+            STAGES.record("screen.process", float(header["process_ms"][0]) / 1000)
+        self.captures += 1
+        self._backoff = 1.0
+        return result[1]
+
+    def thumbnail(self, slot):
+        return self.results.thumbnail(slot)
+
+    def stats(self):
+        header = self.results.header
+        return {
+            "worker_pid": self.process.pid if self.process is not None else None,
+            "monitors": int(header["monitors"][0]),
+            "samples": self.captures,
+            "last_grab_ms": float(header["grab_ms"][0]),
+            "last_process_ms": float(header["process_ms"][0]),
+            "mean_wait_ms": self.wait_seconds / self.captures * 1000 if self.captures else 0.0,
+            "starts": self.starts,
+            "crashes": self.crashes,
+            "timeouts": self.timeouts,
+            "shared_bytes": self._shm.size,
+        }
+
+    def close(self):
+        self._stop.set()
+        self._requests.set()
+        if self.process is not None:
+            self.process.join(2.0)
+            if self.process.is_alive():
+                self.process.kill()
+                self.process.join(1.0)
+        # Drop our numpy views before unmapping the block
+        self.results = None
+        self._shm.close()
+        self._shm.unlink()
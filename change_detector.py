@@ -0,0 +1,191 @@
+import numpy as np
+
+
+def tile_sums(values, tile_grid, out):
+    tile_rows, tile_cols = tile_grid
+    rows, cols = values.shape
+    np.sum(values.reshape(tile_rows, rows // tile_rows, tile_cols, cols // tile_cols), axis=(1, 3), out=out)
+    return out
+
+
+class FrameDiffDetector:
+    # Compares each thumbnail with the previous one against a fixed threshold
+    def __init__(self, size=32, tile_grid=(4, 4), threshold=100):
+        tile_rows, tile_cols = tile_grid
+        if size % tile_rows or size % tile_cols:
+            raise ValueError(f"A {size}x{size} thumbnail cannot be split into {tile_rows}x{tile_cols} tiles")
+        self.size = size
+        self.tile_grid = (tile_rows, tile_cols)
+        self.threshold = threshold
+        self._previous = np.zeros((size, size), dtype=np.float32)
+        self._diff = np.zeros((size, size), dtype=np.float32)
+        self.tile_scores = np.zeros(self.tile_grid, dtype=np.float32)
+        self.has_previous = False
+        self.changed = False
+
+    @property
+    def buffer_bytes(self):
+        return self._previous.nbytes + self._diff.nbytes + self.tile_scores.nbytes
+
+    def reset(self):
+        self.has_previous = False
+
+    def update(self, thumbnail, calibrate=True):
+        # Returns the change score against the previous thumbnail, or None
+        # without one. The threshold is fixed, so `calibrate` is ignored.
+        score = None
+        self.changed = False
+        if self.has_previous:
+            np.subtract(thumbnail, self._previous, out=self._diff)
+            np.abs(self._diff, out=self._diff)
+            tile_sums(self._diff, self.tile_grid, self.tile_scores)
+            self.tile_scores /= 255
+            score = float(self.tile_scores.sum())
+            self.changed = score > self.threshold
+        np.copyto(self._previous, thumbnail)
+        self.has_previous = True
+        return score
+
+
+class TemporalChangeDetector:
+    # Keeps the last `history` thumbnails in one ring buffer. Pixels that flip
+    # back to values seen a few samples ago (blinking cursors, looping
+    # animations) are masked out before scoring; content that keeps changing
+    # without repeating (scrolling, typing, video) still counts. The
+    # threshold follows the monitor's own noise floor, learned only from
+    # samples taken while the user is away from the input devices.
+    def __init__(self, size=32, tile_grid=(4, 4), history=16, threshold=100, min_threshold=25,
+                 pixel_epsilon=4.0, noise_k=4.0, noise_alpha=0.1):
+        tile_rows, tile_cols = tile_grid
+        if size % tile_rows or size % tile_cols:
+            raise ValueError(f"A {size}x{size} thumbnail cannot be split into {tile_rows}x{tile_cols} tiles")
+        if history < 3:
+            raise ValueError("Temporal change detection needs a history of at least 3 thumbnails")
+        self.size = size
+        self.tile_grid = (tile_rows, tile_cols)
+        self.history = history
+        self.initial_threshold = threshold
+        self.min_threshold = min_threshold
+        self.pixel_epsilon = pixel_epsilon
+        self.noise_k = noise_k
+        self.noise_alpha = noise_alpha
+
+        self._frames = np.zeros((history, size, size), dtype=np.float32)
+        self._changes = np.zeros((history, size, size), dtype=bool)
+        self._change_counts = np.zeros((size, size), dtype=np.int16)
+        self._distance = np.zeros((history, size, size), dtype=np.float32)
+        self._lead_distance = np.zeros((history, size, size), dtype=np.float32)
+        self._diff = np.zeros((size, size), dtype=np.float32)
+        self._changed_now = np.zeros((size, size), dtype=bool)
+        self._recurrent = np.zeros((size, size), dtype=bool)
+        self.mask = np.zeros((size, size), dtype=bool)
+        self.tile_scores = np.zeros(self.tile_grid, dtype=np.float32)
+
+        self.position = -1
+        self.frames_seen = 0
+        self.has_previous = False
+
+        self.noise_mean = 0.0
+        self.noise_var = 0.0
+        self.noise_samples = 0
+        self.threshold = threshold
+        self.changed = False
+
+    @property
+    def buffer_bytes(self):
+        return sum(a.nbytes for a in (self._frames, self._changes, self._change_counts, self._distance,
+                                      self._lead_distance, self._diff, self._changed_now, self._recurrent, self.mask,
+                                      self.tile_scores))
+
+    @property
+    def masked_fraction(self):
+        return float(self.mask.mean())
+
+    def reset(self):
+        # The next thumbnail starts a new comparison, but the history (and
+        # what it learned about unstable pixels) is kept
+        self.has_previous = False
+
+    def update(self, thumbnail, calibrate=True):
+        # With calibrate=False (input is recent, so sub-threshold changes may
+        # be the user's) the noise floor is left alone
+        previous = self.position
+        self.position = (self.position + 1) % self.history
+        slot = self.position
+
+        # Retire the transition that falls out of the window
+        if self._changes[slot].any():
+            self._change_counts -= self._changes[slot]
+            self._changes[slot] = False
+
+        score = None
+        self.changed = False
+        if self.has_previous:
+            np.subtract(thumbnail, self._frames[previous], out=self._diff)
+            np.abs(self._diff, out=self._diff)
+            np.greater(self._diff, self.pixel_epsilon, out=self._changed_now)
+            self._changes[slot] = self._changed_now
+            self._change_counts += self._changed_now
+            self._update_mask(thumbnail, previous)
+
+            self._diff[self.mask] = 0
+            tile_sums(self._diff, self.tile_grid, self.tile_scores)
+            self.tile_scores /= 255
+            score = float(self.tile_scores.sum())
+            self.changed = score > self.threshold
+            if not self.changed and calibrate:
+                self._update_noise_floor(score)
+
+        self._frames[slot] = thumbnail
+        self.frames_seen += 1
+        self.has_previous = True
+        return score
+
+    def _update_mask(self, thumbnail, previous):
+        # Recurrent: changed now, has changed at least twice before, and the
+        # last two values repeat an older pair of consecutive frames within
+        # epsilon (a blink or a loop). Matching a single older value is not
+        # enough: content that keeps changing hits one by chance too often.
+        self.mask[:] = False
+        older = min(self.frames_seen, self.history) - 1
+        if older > 2:
+            frames = self._frames
+            np.subtract(frames, thumbnail, out=self._distance)
+            np.abs(self._distance, out=self._distance)
+            # Slot j's predecessor in time is slot j - 1
+            np.subtract(frames[:-1], frames[previous], out=self._lead_distance[1:])
+            np.subtract(frames[-1], frames[previous], out=self._lead_distance[0])
+            np.abs(self._lead_distance, out=self._lead_distance)
+            np.maximum(self._distance, self._lead_distance, out=self._distance)
+            self._distance[previous] = np.inf
+            self._distance[self.position] = np.inf
+            if self.frames_seen < self.history:
+                # Unwritten slots, and slot 0 whose predecessor is one of them
+                self._distance[self.frames_seen:] = np.inf
+                self._distance[0] = np.inf
+            np.less_equal(self._distance.min(axis=0), self.pixel_epsilon, out=self._recurrent)
+            self._recurrent &= self._changed_now
+            self._recurrent &= self._change_counts >= 3
+            self.mask |= self._recurrent
+
+    def _update_noise_floor(self, score):
+        alpha = self.noise_alpha
+        if self.noise_samples == 0:
+            self.noise_mean = score
+        else:
+            delta = score - self.noise_mean
+            self.noise_mean += alpha * delta
+            self.noise_var = (1 - alpha) * (self.noise_var + alpha * delta * delta)
+        self.noise_samples += 1
+        if self.noise_samples >= self.history // 2:
+            self.threshold = max(self.min_threshold, self.noise_mean + self.noise_k * self.noise_var ** 0.5)
+
+
+def create_change_detector():
+    # The detector selected in config.py, one per monitor
+    from config import (SCREEN_DETECTOR, SCREEN_THUMBNAIL_SIZE, SCREEN_TILE_GRID, SCREEN_CHANGE_THRESHOLD,
+                        SCREEN_HISTORY, SCREEN_MIN_THRESHOLD)
+    if SCREEN_DETECTOR == "diff":
+        return FrameDiffDetector(SCREEN_THUMBNAIL_SIZE, SCREEN_TILE_GRID, SCREEN_CHANGE_THRESHOLD)
+    return TemporalChangeDetector(SCREEN_THUMBNAIL_SIZE, SCREEN_TILE_GRID, SCREEN_HISTORY,
+                                  SCREEN_CHANGE_THRESHOLD, SCREEN_MIN_THRESHOLD)
@@ -0,0 +1,90 @@
+import datetime
+import time
+
+BOOTTIME = getattr(time, "CLOCK_BOOTTIME", None)
+
+
+class SystemClock:
+    def time(self):
+        return time.time()
+
+    def monotonic(self):
+        return time.monotonic()
+
+    def boottime(self):
+        # The monotonic clock plus time spent suspended, where the OS has one
+        # (Linux); None elsewhere
+        if BOOTTIME is None:
+            return None
+        return time.clock_gettime(BOOTTIME)
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+    def today(self):
+        return datetime.date.today()
+
+    def strftime(self, fmt):
+        return time.strftime(fmt)
+
+
+SYSTEM_CLOCK = SystemClock()
+
+
+class VirtualClock:
+    # Deterministic clock for simulations and tests: time only moves when
+    # advance() (or sleep()) is called. With boottime=False it behaves like
+    # a platform without CLOCK_BOOTTIME.
+    def __init__(self, start=None, boottime=True):
+        if start is None:
+            start = datetime.datetime(2025, 3, 10, 8, 0).timestamp()
+        self._now = float(start)
+        self._monotonic = 0.0
+        self._boottime = 0.0 if boottime else None
+        self._today = None
+        self._tomorrow = 0.0
+
+    def time(self):
+        return self._now
+
+    def monotonic(self):
+        return self._monotonic
+
+    def boottime(self):
+        return self._boottime
+
+    def sleep(self, seconds):
+        self.advance(seconds)
+
+    def advance(self, seconds):
+        if seconds > 0:
+            self._now += seconds
+            self._monotonic += seconds
+            if self._boottime is not None:
+                self._boottime += seconds
+
+    def suspend(self, seconds):
+        # Sleep as Linux sees it: the wall clock and boot time move, the
+        # monotonic clock does not
+        if seconds > 0:
+            self._now += seconds
+            if self._boottime is not None:
+                self._boottime += seconds
+
+    def step(self, seconds):
+        # A wall clock adjustment (NTP, the user): only time() moves
+        self._now += seconds
+
+    def advance_to(self, timestamp):
+        self.advance(timestamp - self._now)
+
+    def today(self):
+        # Cached until midnight: simulations ask for the date on every tick
+        if self._now >= self._tomorrow or self._today is None:
+            self._today = datetime.date.fromtimestamp(self._now)
+            next_day = datetime.datetime.combine(self._today + datetime.timedelta(days=1), datetime.time())
+            self._tomorrow = next_day.timestamp()
+        return self._today
+
+    def strftime(self, fmt):
+        return time.strftime(fmt, time.localtime(self._now))
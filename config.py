@@ -11,4 +11,35 @@ COLORS = {
 DEFAULT_WORK_MINUTES = 25
 DEFAULT_BREAK_MINUTES = 5
 IDLE_THRESHOLD = 30  # Seconds of inactivity to consider user idle
-SCREEN_CHECK_INTERVAL = 15  # Seconds between screen checks
\ No newline at end of file
+SCREEN_CHECK_INTERVAL = 15  # Seconds between screen checks
+INPUT_COALESCE_WINDOW = 0.1  # Seconds; input events inside one window share a single activity stamp
+MOUSE_JITTER_PIXELS = 2  # Mouse moves smaller than this (in both axes) are ignored
+SCREEN_THUMBNAIL_SIZE = 32  # Screen samples are block-averaged down to this many pixels per side
+SCREEN_ROW_STRIDE = 2  # Only every n-th pixel row is read when block-averaging a screen sample
+SCREEN_CHANGE_THRESHOLD = 100  # Thumbnail difference score that counts as screen activity
+SCREEN_MONITORS = None  # mss monitor indices (1 = primary) to sample; None samples every monitor
+SCREEN_TILE_GRID = (4, 4)  # Rows x columns of change-scored tiles per monitor thumbnail
+SCREEN_MIN_INTERVAL = 2  # Fastest screen sampling, used just before the idle deadline
+SCREEN_MAX_INTERVAL = 300  # Slowest screen sampling, reached by backing off while the user is idle
+SCREEN_DETECTOR = "temporal"  # "temporal" masks blinking/looping pixels; "diff" compares consecutive frames only
+SCREEN_HISTORY = 16  # Thumbnails kept per monitor by the temporal detector
+SCREEN_MIN_THRESHOLD = 25  # Lowest change score the temporal detector calibrates down to
+FOCUS_BACKEND = "auto"  # Foreground-window events: "auto", "win32" (WinEvent hook), "x11" (_NET_ACTIVE_WINDOW) or "fake"
+SENSOR_RUNTIME = "threads"  # "threads" gives each sensor its own thread; "asyncio" runs them as tasks on one loop
+LOG_LEVEL = "info"  # Monitor log level: "debug", "info", "warning", "error" or "off"
+LOG_SAMPLE_RATES = {"key_press": 50, "mouse_input": 50}  # Keep one record in n for these events
+LOG_RATE_LIMITS = {"window_change": (5, 20), "screen_change": (1, 5)}  # Event: (records per second, burst)
+LOG_REDACT_FIELDS = ("key",)  # Logged fields replaced with "<redacted>"; remove "key" to log key names
+ACTIVITY_LOG_DIR = "activity_log"  # Directory for the binary activity event log; None disables it
+ACTIVITY_LOG_RAW_DAYS = 7  # Raw events older than this are compacted into per-minute counts
+IDLE_SOURCE = "hooks"  # "hooks" (pynput listeners), "auto", "win32" (GetLastInputInfo), "xss" (XScreenSaver), "logind" or "fake"
+IDLE_POLL_INTERVAL = 1  # Seconds between idle-time queries once the user is idle; active users are polled per IDLE_THRESHOLD
+SCREEN_CAPTURE_PROCESS = False  # Run screen capture and change detection in a separate worker process
+LEDGER_PATH = "ledger.db"  # SQLite event ledger for points, breaks and challenges; None disables it
+RULES_PATH = None  # JSON list of challenge/achievement rules; None uses the built-in catalog in rules.py
+AUDIO_BACKEND = "auto"  # Alert sound output: "auto", "winsound", "aplay" or "null"
+DAEMON_SOCKET = None  # Unix socket for daemon.py and main.py --connect; None uses $XDG_RUNTIME_DIR/healthguard-<uid>.sock
+METRICS_PORT = None  # Serve Prometheus metrics on http://127.0.0.1:<port>/metrics; None disables the endpoint
+PROFILE_STAGES = False  # Time the hot-path stages into latency histograms (see profiling.py latency)
+PROFILE_DIR = "profiles"  # Where SIGUSR1 / the daemon's "profile" command write sampling profiles
+PROFILE_SECONDS = 10  # Length of one sampling profile capture
@@ -0,0 +1,438 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+import queue
+import signal
+import socket
+import sys
+import tempfile
+import threading
+from clock import SYSTEM_CLOCK
+from health_service import DISCONNECTED
+from metrics import get_registry, start_http_server
+from monitor_log import close_logger, get_logger
+from profiling import STAGES, get_profiler, install_signal_handler
+from rules import RulesEngine, compile_rules
+from session_engine import SessionEngine, WORKING, BREAKING
+
+
+def default_socket_path():
+    from config import DAEMON_SOCKET
+    if DAEMON_SOCKET:
+        return DAEMON_SOCKET
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    name = f"healthguard-{os.getuid()}.sock" if hasattr(os, "getuid") else "healthguard.sock"
+    return os.path.join(runtime_dir, name)
+
+
+class DaemonServer:
+    # JSON lines over a Unix socket. Every request line {"id", "cmd", ...}
+    # gets one reply {"id", "ok", "result" | "error"}. After "subscribe" the
+    # connection is also sent {"event", "status"} whenever the service raises
+    # an event. The line is encoded once per event and appended to each
+    # subscriber's transport buffer, so fan-out costs a buffer append per
+    # client; clients that stop reading are dropped instead of buffered.
+    def __init__(self, service, path, max_buffer=1 << 20):
+        self.service = service
+        self.path = path
+        self.max_buffer = max_buffer
+        self.log = get_logger()
+        self.server = None
+        self.subscribers = set()
+        service.subscribe(self.publish)
+
+        self.connections = 0
+        self.requests = 0
+        self.published = 0
+        self.dropped = 0
+
+    async def start(self):
+        if os.path.exists(self.path):
+            # A socket file nobody answers on is left over from a crash
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.path)
+                raise RuntimeError(f"A daemon is already listening on {self.path}")
+            except (ConnectionRefusedError, FileNotFoundError):
+                os.unlink(self.path)
+            finally:
+                probe.close()
+        self.server = await asyncio.start_unix_server(self._serve_client, path=self.path)
+        os.chmod(self.path, 0o600)
+        self.log.info("daemon_listening", path=self.path)
+
+    async def _serve_client(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                request_id = None
+                try:
+                    request = json.loads(line)
+                    request_id = request.get("id")
+                    reply = {"id": request_id, "ok": True, "result": self.dispatch(request, writer)}
+                except Exception as e:
+                    reply = {"id": request_id, "ok": False, "error": str(e)}
+                self.requests += 1
+                writer.write(json.dumps(reply).encode("utf-8") + b"\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.subscribers.discard(writer)
+            writer.close()
+
+    def dispatch(self, request, writer):
+        # Commands that change state return the resulting status
+        service = self.service
+        command = request.get("cmd")
+        if command == "status":
+            return service.status()
+        if command == "rules":
+            return [rule._asdict() for rule in service.gamification.rules.rules]
+        if command == "stats":
+            return self.stats()
+        if command == "metrics":
+            return get_registry().render()
+        if command == "latency":
+            return {"enabled": STAGES.enabled, "stages": STAGES.report()}
+        if command == "profile":
+            from config import PROFILE_SECONDS
+            seconds = _number(request, "seconds", float, default=PROFILE_SECONDS, minimum=0, inclusive=False)
+            return {"path": os.path.abspath(get_profiler().start(seconds)), "seconds": seconds}
+        if command == "subscribe":
+            self.subscribers.add(writer)
+        elif command == "unsubscribe":
+            self.subscribers.discard(writer)
+        elif command == "pause":
+            service.set_paused(True)
+        elif command == "resume":
+            service.set_paused(False)
+        elif command == "snooze":
+            service.snooze(_number(request, "seconds", float, default=300, minimum=0, inclusive=False))
+        elif command == "break_now":
+            if service.app_state == WORKING:
+                service.take_break()
+        elif command == "end_break":
+            if service.app_state == BREAKING:
+                service.finish_break()
+        elif command == "settings":
+            # Both are checked before either is applied
+            work_minutes = _number(request, "work_minutes", int, minimum=1)
+            break_minutes = _number(request, "break_minutes", int, minimum=1)
+            service.set_durations(work_minutes, break_minutes)
+        else:
+            raise ValueError(f"Unknown command: {command}")
+        return service.status()
+
+    def publish(self, event):
+        self.published += 1
+        if not self.subscribers:
+            return
+        line = json.dumps({"event": event, "status": self.service.status()}).encode("utf-8") + b"\n"
+        for writer in list(self.subscribers):
+            transport = writer.transport
+            if transport.is_closing():
+                self.subscribers.discard(writer)
+            elif transport.get_write_buffer_size() > self.max_buffer:
+                self.dropped += 1
+                self.subscribers.discard(writer)
+                self.log.warning("daemon_subscriber_dropped", buffered=transport.get_write_buffer_size())
+                writer.close()
+            else:
+                writer.write(line)
+
+    def stats(self):
+        return {"connections": self.connections, "subscribers": len(self.subscribers), "requests": self.requests,
+                "published": self.published, "dropped": self.dropped}
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+        # Before waiting: newer asyncio waits for open connections to close
+        for writer in list(self.subscribers):
+            writer.close()
+        self.subscribers.clear()
+        if self.server is not None:
+            await self.server.wait_closed()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+def _number(request, name, kind, default=None, minimum=None, inclusive=True):
+    # Coerces a client-supplied argument, so a bad value fails the request
+    # with an error reply before the service is touched
+    value = request.get(name, default)
+    if value is None:
+        raise ValueError(f"Missing argument: {name}")
+    if isinstance(value, bool):
+        raise ValueError(f"{name} must be a number, not {value!r}")
+    try:
+        number = kind(value)
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError(f"{name} must be a number, not {value!r}") from None
+    if not math.isfinite(number):
+        raise ValueError(f"{name} must be finite, not {value!r}")
+    if minimum is not None and (number < minimum or not inclusive and number == minimum):
+        bound = "at least" if inclusive else "greater than"
+        raise ValueError(f"{name} must be {bound} {minimum}, not {value!r}")
+    return number
+
+
+async def run_daemon(service, path, auto_resume=False, tick_interval=1.0):
+    # Ticks the service on the event loop thread, as HealthAppUI does on the
+    # Tk thread, waking early when the session has a transition due
+    from health_service import BREAK_ENDED
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+    if auto_resume:
+        # No one may be there to press Continue
+        def resume_after_break(event):
+            if event == BREAK_ENDED:
+                loop.call_soon(service.set_paused, False)
+        service.subscribe(resume_after_break)
+    server = DaemonServer(service, path)
+    await server.start()
+    try:
+        while not stop.is_set():
+            service.tick()
+            delay = tick_interval
+            until_deadline = service.session.seconds_until_deadline()
+            if until_deadline is not None:
+                delay = min(delay, until_deadline)
+            try:
+                await asyncio.wait_for(stop.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        await server.close()
+
+
+class DaemonClient:
+    # Blocking client. A reader thread hands replies to the waiting request()
+    # and passes events to on_event(event, status).
+    def __init__(self, path=None, on_event=None, timeout=5.0):
+        self.path = path or default_socket_path()
+        self.on_event = on_event
+        self.timeout = timeout
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.path)
+        self._file = self.sock.makefile("rb")
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self._waiting = {}
+        self.closed = False
+        self._reader = threading.Thread(target=self._read, name="daemon-client", daemon=True)
+        self._reader.start()
+
+    def request(self, command, **arguments):
+        with self._lock:
+            if self.closed:
+                raise ConnectionError("Not connected to the daemon")
+            self._next_id += 1
+            request_id = self._next_id
+            waiter = self._waiting[request_id] = [threading.Event(), None]
+            self.sock.sendall(json.dumps({"id": request_id, "cmd": command, **arguments}).encode("utf-8") + b"\n")
+        if not waiter[0].wait(self.timeout):
+            with self._lock:
+                self._waiting.pop(request_id, None)
+            raise TimeoutError(f"No reply to {command!r} from the daemon")
+        reply = waiter[1]
+        if reply is None:
+            raise ConnectionError(f"Lost the daemon before it replied to {command!r}")
+        if not reply["ok"]:
+            raise RuntimeError(reply["error"])
+        return reply["result"]
+
+    def _read(self):
+        try:
+            for line in self._file:
+                message = json.loads(line)
+                if "event" in message:
+                    if self.on_event is not None:
+                        self.on_event(message["event"], message["status"])
+                    continue
+                with self._lock:
+                    waiter = self._waiting.pop(message.get("id"), None)
+                if waiter is not None:
+                    waiter[1] = message
+                    waiter[0].set()
+        except (OSError, ValueError):
+            pass
+        with self._lock:
+            self.closed = True
+            waiting, self._waiting = self._waiting, {}
+        # A waiter woken without a reply raises ConnectionError
+        for waiter in waiting.values():
+            waiter[0].set()
+        if self.on_event is not None:
+            self.on_event(DISCONNECTED, None)
+
+    def close(self):
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+        self._reader.join(timeout=1)
+
+
+class RemoteGamification:
+    # The part of Gamification the UI reads, mirrored from daemon status
+    def __init__(self, rules):
+        self.rules = rules
+        self.data = {"points": 0, "current_streak": 0}
+
+    def update(self, status):
+        self.data["points"] = status["points"]
+        self.data["current_streak"] = status["current_streak"]
+        self.rules.load_state(status["rules"])
+
+
+class RemoteService:
+    # HealthService's interface over a daemon connection, so HealthAppUI can
+    # run as a client (python main.py --connect). Commands are forwarded;
+    # events are queued by the reader thread and delivered from tick() on
+    # the caller's thread. Between events a local SessionEngine, loaded from
+    # the daemon's snapshot, extrapolates the countdown; the transitions it
+    # finds are ignored, the daemon makes them.
+    def __init__(self, path=None, clock=SYSTEM_CLOCK):
+        self.clock = clock
+        self.log = get_logger()
+        self.listeners = []
+        self._events = queue.SimpleQueue()
+        self.client = DaemonClient(path, on_event=self._queue_event)
+        self.gamification = RemoteGamification(RulesEngine(compile_rules(self.client.request("rules"))))
+        self.session = SessionEngine(1, 1, clock=clock)
+        self._apply(self.client.request("subscribe"))
+
+    @property
+    def paused(self):
+        return self.session.paused
+
+    @property
+    def app_state(self):
+        return self.session.state
+
+    def subscribe(self, listener):
+        self.listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        self.listeners.remove(listener)
+
+    def _queue_event(self, event, status):
+        self._events.put((event, status))
+
+    def _apply(self, status):
+        self.session.load_snapshot(status["session"])
+        self.work_minutes = status["work_minutes"]
+        self.break_minutes = status["break_minutes"]
+        self.top_apps = status["top_apps"]
+        self.gamification.update(status)
+
+    def tick(self):
+        while True:
+            try:
+                event, status = self._events.get_nowait()
+            except queue.Empty:
+                break
+            if status is None:
+                self.log.warning("daemon_disconnected", path=self.client.path)
+            else:
+                self._apply(status)
+            for listener in list(self.listeners):
+                listener(event)
+        self.session.update()
+
+    def take_break(self):
+        self.client.request("break_now")
+
+    def finish_break(self):
+        self.client.request("end_break")
+
+    def snooze(self, seconds=300):
+        self.client.request("snooze", seconds=seconds)
+
+    def set_paused(self, paused):
+        self.client.request("pause" if paused else "resume")
+
+    def set_durations(self, work_minutes, break_minutes):
+        self.client.request("settings", work_minutes=work_minutes, break_minutes=break_minutes)
+
+    def top_apps_today(self, limit=5, now=None):
+        return [tuple(entry) for entry in self.top_apps[:limit]]
+
+    def drain_monitor_events(self):
+        return []
+
+    def status(self):
+        return self.client.request("status")
+
+    def close(self):
+        self.client.close()
+
+
+CLIENT_COMMANDS = ("status", "stats", "metrics", "latency", "profile", "pause", "resume", "snooze", "break_now", "end_break", "watch")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run HealthGuard without a window, or talk to a running daemon")
+    parser.add_argument("command", nargs="?", default="serve", choices=("serve",) + CLIENT_COMMANDS)
+    parser.add_argument("--socket", help="Unix socket path (default: config.DAEMON_SOCKET or the runtime dir)")
+    parser.add_argument("--auto-resume", action="store_true", help="resume work after a break without a client")
+    args = parser.parse_args(argv)
+    path = args.socket or default_socket_path()
+
+    if args.command == "watch":
+        events = queue.SimpleQueue()
+        client = DaemonClient(path, on_event=lambda event, status: events.put((event, status)))
+        client.request("subscribe")
+        try:
+            while True:
+                event, status = events.get()
+                print(json.dumps({"event": event, "status": status}), flush=True)
+                if event == DISCONNECTED:
+                    return 1
+        except KeyboardInterrupt:
+            return 0
+        finally:
+            client.close()
+    if args.command != "serve":
+        client = DaemonClient(path)
+        try:
+            result = client.request(args.command)
+            if args.command == "metrics":
+                sys.stdout.write(result)
+            else:
+                print(json.dumps(result, indent=2))
+        finally:
+            client.close()
+        return 0
+
+    from activity_monitor import ActivityMonitor
+    from config import LEDGER_PATH, METRICS_PORT
+    from gamification import Gamification
+    from health_service import HealthService
+    from ledger import Ledger
+    monitor = ActivityMonitor(None)
+    service = HealthService(monitor, Gamification(ledger=Ledger(LEDGER_PATH) if LEDGER_PATH else None))
+    monitor.start()
+    if METRICS_PORT:
+        start_http_server(METRICS_PORT)
+    install_signal_handler()
+    try:
+        asyncio.run(run_daemon(service, path, args.auto_resume))
+    finally:
+        service.close()
+        close_logger()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,255 @@
+import os
+import queue
+import select
+import sys
+import threading
+from collections import namedtuple
+
+FocusChange = namedtuple("FocusChange", ["window", "title", "app"])
+
+
+class FocusBackend:
+    # Backends push a FocusChange whenever the foreground window changes.
+    # Consumers either block in wait_for_change(), so nothing runs while focus
+    # is stable (close() wakes them up with None), or register a listener
+    # that is called from the backend's thread instead.
+    def __init__(self):
+        self._events = queue.Queue()
+        self._closed = False
+        self._listener = None
+
+    def set_listener(self, listener):
+        self._listener = listener
+
+    def start(self):
+        pass
+
+    def wait_for_change(self, timeout=None):
+        try:
+            return self._events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self._closed = True
+        self._events.put(None)
+
+    def _publish(self, window, title, app=None):
+        if self._closed:
+            return
+        change = FocusChange(window, title, app)
+        if self._listener is not None:
+            self._listener(change)
+        else:
+            self._events.put(change)
+
+
+class FakeFocusBackend(FocusBackend):
+    def emit(self, window, title, app=None):
+        self._publish(window, title, app)
+
+
+class Win32FocusBackend(FocusBackend):
+    EVENT_SYSTEM_FOREGROUND = 0x0003
+    WINEVENT_OUTOFCONTEXT = 0x0000
+    WINEVENT_SKIPOWNPROCESS = 0x0002
+    WM_QUIT = 0x0012
+
+    def __init__(self):
+        super().__init__()
+        self._thread = None
+        self._thread_id = None
+        self._ready = threading.Event()
+        self._error = None
+
+    def start(self):
+        # WinEvent hooks are delivered through the message queue of the thread
+        # that installed them, so the hook lives on its own message-loop thread
+        self._thread = threading.Thread(target=self._run, name="focus-winevent", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._error:
+            raise self._error
+
+    def _run(self):
+        import ctypes
+        from ctypes import wintypes
+        import win32gui
+
+        user32 = ctypes.windll.user32
+        kernel32 = ctypes.windll.kernel32
+        WinEventProc = ctypes.WINFUNCTYPE(None, wintypes.HANDLE, wintypes.DWORD, wintypes.HWND,
+                                          wintypes.LONG, wintypes.LONG, wintypes.DWORD, wintypes.DWORD)
+
+        def on_event(hook, event, hwnd, id_object, id_child, event_thread, event_time):
+            if hwnd:
+                self._publish(hwnd, win32gui.GetWindowText(hwnd), self._process_name(hwnd))
+
+        # Keep a reference to the ctypes callback for as long as the hook exists
+        self._callback = WinEventProc(on_event)
+        user32.SetWinEventHook.restype = wintypes.HANDLE
+        hook = user32.SetWinEventHook(self.EVENT_SYSTEM_FOREGROUND, self.EVENT_SYSTEM_FOREGROUND, 0,
+                                      self._callback, 0, 0,
+                                      self.WINEVENT_OUTOFCONTEXT | self.WINEVENT_SKIPOWNPROCESS)
+        if not hook:
+            self._error = OSError("SetWinEventHook failed")
+            self._ready.set()
+            return
+        self._thread_id = kernel32.GetCurrentThreadId()
+        self._ready.set()
+
+        current = win32gui.GetForegroundWindow()
+        if current:
+            self._publish(current, win32gui.GetWindowText(current), self._process_name(current))
+
+        msg = wintypes.MSG()
+        while user32.GetMessageW(ctypes.byref(msg), 0, 0, 0) > 0:
+            user32.TranslateMessage(ctypes.byref(msg))
+            user32.DispatchMessageW(ctypes.byref(msg))
+        user32.UnhookWinEvent(hook)
+
+    @staticmethod
+    def _process_name(hwnd):
+        try:
+            import psutil
+            import win32process
+            _, pid = win32process.GetWindowThreadProcessId(hwnd)
+            return psutil.Process(pid).name()
+        except Exception:
+            return None
+
+    def close(self):
+        if self._thread_id is not None:
+            import ctypes
+            ctypes.windll.user32.PostThreadMessageW(self._thread_id, self.WM_QUIT, 0, 0)
+        super().close()
+
+
+class X11FocusBackend(FocusBackend):
+    # Listens for PropertyNotify on the root window and reacts when the window
+    # manager updates _NET_ACTIVE_WINDOW. Works against any X server,
+    # including Xvfb, as long as something maintains that property.
+    def __init__(self, display_name=None):
+        super().__init__()
+        self.display_name = display_name
+        self._thread = None
+        self._ready = threading.Event()
+        self._error = None
+        self._wake_read, self._wake_write = os.pipe()
+        self._pipe_lock = threading.Lock()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="focus-x11", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._error:
+            raise self._error
+
+    def _run(self):
+        wake = self._wake_read
+        try:
+            from Xlib import X, display
+            self._display = display.Display(self.display_name)
+        except Exception as e:
+            self._error = e
+            self._ready.set()
+            return
+        d = self._display
+        root = d.screen().root
+        self._atoms = {name: d.intern_atom(name) for name in
+                       ("_NET_ACTIVE_WINDOW", "_NET_WM_NAME", "UTF8_STRING")}
+        root.change_attributes(event_mask=X.PropertyChangeMask)
+        d.flush()
+        self._ready.set()
+
+        last_window = self._publish_active(root, None)
+        try:
+            while not self._closed:
+                readable, _, _ = select.select([d.fileno(), wake], [], [])
+                if wake in readable:
+                    break
+                # Several PropertyNotify events can arrive in one read; only
+                # the final active window matters
+                active_changed = False
+                for _ in range(d.pending_events()):
+                    event = d.next_event()
+                    if event.type == X.PropertyNotify and event.atom == self._atoms["_NET_ACTIVE_WINDOW"]:
+                        active_changed = True
+                if active_changed:
+                    last_window = self._publish_active(root, last_window)
+        finally:
+            d.close()
+            if self._closed:
+                self._close_wake_pipe()
+
+    def _publish_active(self, root, last_window):
+        from Xlib import X
+        from Xlib.error import XError
+        # Returns the window last published; a failed query leaves it as it was
+        try:
+            prop = root.get_full_property(self._atoms["_NET_ACTIVE_WINDOW"], X.AnyPropertyType)
+            window_id = prop.value[0] if prop and len(prop.value) else 0
+            if not window_id or window_id == last_window:
+                return last_window
+            window = self._display.create_resource_object("window", window_id)
+            self._publish(window_id, self._window_title(window), self._window_class(window))
+        except XError:
+            # The window can disappear between the event and our query
+            return last_window
+        return window_id
+
+    def _window_title(self, window):
+        prop = window.get_full_property(self._atoms["_NET_WM_NAME"], self._atoms["UTF8_STRING"])
+        if prop and prop.value:
+            value = prop.value
+            return value.decode("utf-8", "replace") if isinstance(value, bytes) else str(value)
+        name = window.get_wm_name()
+        return name if isinstance(name, str) else (name or b"").decode("latin-1", "replace")
+
+    @staticmethod
+    def _window_class(window):
+        wm_class = window.get_wm_class()
+        return wm_class[1] if wm_class else None
+
+    def close(self):
+        super().close()
+        with self._pipe_lock:
+            if self._wake_write is not None:
+                try:
+                    os.write(self._wake_write, b"x")
+                except OSError:
+                    pass
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            if self._thread.is_alive():
+                # Still in select(); the thread closes the pipe on its way out
+                return
+        self._close_wake_pipe()
+
+    def _close_wake_pipe(self):
+        with self._pipe_lock:
+            fds = [fd for fd in (self._wake_read, self._wake_write) if fd is not None]
+            self._wake_read = self._wake_write = None
+        for fd in fds:
+            os.close(fd)
+
+
+FOCUS_BACKENDS = {
+    "win32": Win32FocusBackend,
+    "x11": X11FocusBackend,
+    "fake": FakeFocusBackend,
+}
+
+
+def create_focus_backend(name="auto"):
+    if name == "auto":
+        if sys.platform == "win32":
+            name = "win32"
+        elif os.environ.get("DISPLAY"):
+            name = "x11"
+        else:
+            raise RuntimeError("No focus-change backend available on this platform")
+    try:
+        return FOCUS_BACKENDS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown focus backend: {name}") from None
@@ -0,0 +1,189 @@
+import array
+import bisect
+import datetime
+import heapq
+import threading
+import time
+
+UNKNOWN_APP = "unknown"
+
+
+def _day(timestamp):
+    return datetime.date.fromtimestamp(timestamp).toordinal()
+
+
+def _day_start(ordinal):
+    return datetime.datetime.combine(datetime.date.fromordinal(ordinal), datetime.time()).timestamp()
+
+
+class FocusTimeTracker:
+    # Foreground time per application and per window title. Names are
+    # interned into id tables; each closed focus span is one row across
+    # parallel arrays (start, duration, app id, title id). Per-day totals are
+    # kept up to date as spans close, so top-N queries only sort the day
+    # tables plus the open span and never rescan history. compact() drops
+    # rows and day totals past their retention and re-numbers the id tables
+    # so memory stays flat however many distinct titles come and go.
+    def __init__(self, span_days=7, title_days=7, app_days=35, compact_interval=3600.0, now=time.time):
+        self.span_days = span_days
+        self.title_days = title_days
+        self.app_days = app_days
+        self.compact_interval = compact_interval
+        self.now = now
+        self._lock = threading.Lock()
+
+        self.apps = []
+        self._app_ids = {}
+        self.titles = []
+        self._title_ids = {}
+        self._starts = array.array("d")
+        self._durations = array.array("f")
+        self._span_apps = array.array("I")
+        self._span_titles = array.array("I")
+        self._app_totals = {}    # day ordinal -> {app id: seconds}
+        self._title_totals = {}  # day ordinal -> {title id: seconds}
+        self._current = None     # (app id, title id, start)
+        self._next_compaction = now() + compact_interval
+
+    def _intern(self, ids, names, name):
+        index = ids.get(name)
+        if index is None:
+            index = ids[name] = len(names)
+            names.append(name)
+        return index
+
+    def focus(self, app, title, timestamp=None):
+        # Closes the running span and opens one for the new foreground window
+        now = self.now() if timestamp is None else timestamp
+        with self._lock:
+            self._close(now)
+            app_id = self._intern(self._app_ids, self.apps, app or UNKNOWN_APP)
+            title_id = self._intern(self._title_ids, self.titles, title or "")
+            self._current = (app_id, title_id, now)
+            if now >= self._next_compaction:
+                self._next_compaction = now + self.compact_interval
+                self._compact(now)
+
+    def suspend(self, timestamp=None):
+        # Ends the running span without starting another, e.g. on shutdown
+        with self._lock:
+            self._close(self.now() if timestamp is None else timestamp)
+            self._current = None
+
+    def _close(self, end):
+        if self._current is None:
+            return
+        app_id, title_id, start = self._current
+        if end <= start:
+            return
+        self._starts.append(start)
+        self._durations.append(end - start)
+        self._span_apps.append(app_id)
+        self._span_titles.append(title_id)
+        # Spans running past midnight are credited to each day they cover
+        day = _day(start)
+        while start < end:
+            split = min(end, _day_start(day + 1))
+            seconds = split - start
+            apps = self._app_totals.setdefault(day, {})
+            apps[app_id] = apps.get(app_id, 0.0) + seconds
+            titles = self._title_totals.setdefault(day, {})
+            titles[title_id] = titles.get(title_id, 0.0) + seconds
+            start = split
+            day += 1
+
+    def _top(self, totals, names, current_index, days, limit, now):
+        now = self.now() if now is None else now
+        today = _day(now)
+        first = today - days + 1
+        combined = {}
+        with self._lock:
+            for day in range(first, today + 1):
+                for index, seconds in totals.get(day, {}).items():
+                    combined[index] = combined.get(index, 0.0) + seconds
+            if self._current is not None:
+                index = self._current[current_index]
+                open_seconds = now - max(self._current[2], _day_start(first))
+                if open_seconds > 0:
+                    combined[index] = combined.get(index, 0.0) + open_seconds
+            top = heapq.nlargest(limit, combined.items(), key=lambda item: item[1])
+            return [(names[index], seconds) for index, seconds in top]
+
+    def top_apps(self, days=1, limit=5, now=None):
+        return self._top(self._app_totals, self.apps, 0, days, limit, now)
+
+    def top_titles(self, days=1, limit=5, now=None):
+        return self._top(self._title_totals, self.titles, 1, days, limit, now)
+
+    def top_apps_today(self, limit=5, now=None):
+        return self.top_apps(1, limit, now)
+
+    def top_apps_week(self, limit=5, now=None):
+        return self.top_apps(7, limit, now)
+
+    def spans(self, start=None, end=None):
+        # Closed spans overlapping [start, end) as (start, duration, app, title)
+        with self._lock:
+            lo = 0 if start is None else max(bisect.bisect_left(self._starts, start) - 1, 0)
+            hi = len(self._starts) if end is None else bisect.bisect_left(self._starts, end)
+            rows = []
+            for i in range(lo, hi):
+                span_start, duration = self._starts[i], self._durations[i]
+                if start is not None and span_start + duration <= start:
+                    continue
+                rows.append((span_start, duration, self.apps[self._span_apps[i]],
+                             self.titles[self._span_titles[i]]))
+            return rows
+
+    def compact(self, now=None):
+        with self._lock:
+            self._compact(self.now() if now is None else now)
+
+    def _compact(self, now):
+        today = _day(now)
+        cut = bisect.bisect_left(self._starts, now - self.span_days * 86400)
+        if cut:
+            for column in (self._starts, self._durations, self._span_apps, self._span_titles):
+                del column[:cut]
+        for totals, days in ((self._title_totals, self.title_days), (self._app_totals, self.app_days)):
+            for day in [day for day in totals if day <= today - days]:
+                del totals[day]
+
+        # Drop names nothing refers to any more and re-number the rest
+        for names, ids, column, totals, current_index in (
+                (self.titles, self._title_ids, self._span_titles, self._title_totals, 1),
+                (self.apps, self._app_ids, self._span_apps, self._app_totals, 0)):
+            used = set(column)
+            for day_totals in totals.values():
+                used.update(day_totals)
+            if self._current is not None:
+                used.add(self._current[current_index])
+            if len(used) == len(names):
+                continue
+            remap = {}
+            kept = []
+            for old in sorted(used):
+                remap[old] = len(kept)
+                kept.append(names[old])
+            names[:] = kept
+            ids.clear()
+            ids.update((name, index) for index, name in enumerate(kept))
+            column[:] = array.array("I", [remap[old] for old in column])
+            for day, day_totals in totals.items():
+                totals[day] = {remap[old]: seconds for old, seconds in day_totals.items()}
+            if self._current is not None:
+                current = list(self._current)
+                current[current_index] = remap[current[current_index]]
+                self._current = tuple(current)
+
+    def stats(self):
+        with self._lock:
+            spans = len(self._starts)
+            return {
+                "spans": spans,
+                "apps": len(self.apps),
+                "titles": len(self.titles),
+                "span_bytes": spans * (self._starts.itemsize + self._durations.itemsize
+                                       + self._span_apps.itemsize + self._span_titles.itemsize),
+                "title_days": len(self._title_totals),
+            }
@@ -1,9 +1,26 @@
-import os
-import json
+import copy
 import datetime
+import threading
+from clock import SYSTEM_CLOCK
+from ledger import ACHIEVEMENT_UNLOCKED, BREAK, CHALLENGE_COMPLETED, POINTS, SNOOZE, WEEKLY_RESET
+from metrics import REGISTRY
+from profiling import STAGES
+from monitor_log import get_logger
+from persistence import WriteBehindStore, load_json
+from rules import WINDOWS, RulesEngine, load_rules
+
+SAVE_REQUESTS = REGISTRY.counter("healthguard_save_requests_total", "save_data() calls, i.e. state changes to persist")
 
 class Gamification:
-    def __init__(self):
+    def __init__(self, path='gamification.json', clock=SYSTEM_CLOCK, ledger=None, rules=None):
+        from config import RULES_PATH
+        self.path = path
+        self.clock = clock
+        self.ledger = ledger
+        self.rules = RulesEngine(rules if rules is not None else load_rules(RULES_PATH))
+        self.log = get_logger()
+        # Mutations run on the Tk thread, snapshots on the state writer thread
+        self._lock = threading.RLock()
         self.data = {
             'points': 0,
             'daily_breaks': 0,
@@ -13,71 +30,169 @@ class Gamification:
                 'weekly_points': {'target': 500, 'progress': 0, 'completed': False},
                 'weekly_breaks': {'target': 10, 'progress': 0, 'completed': False}
             },
-            'last_reset': None
+            'last_reset': None,
+            'rules': None
         }
+        self.store = WriteBehindStore(path, self.snapshot, log=self.log)
+        self.register_metrics()
         self.load_data()
+        self.load_rule_state()
+        if ledger is not None and not ledger.imported:
+            ledger.import_state(self.snapshot(), timestamp=clock.time())
         self.check_weekly_reset()
 
+    def register_metrics(self):
+        store = self.store
+        REGISTRY.callback("healthguard_state_writes_total", "State file writes", lambda: store.writes, "counter")
+        REGISTRY.callback("healthguard_state_write_failures_total", "Failed state file writes",
+                          lambda: store.failures, "counter")
+        REGISTRY.callback("healthguard_points", "Gamification points", lambda: self.data['points'])
+        REGISTRY.callback("healthguard_current_streak_days", "Current break streak",
+                          lambda: self.data['current_streak'])
+
     def load_data(self):
-        try:
-            with open('gamification.json', 'r') as f:
-                loaded_data = json.load(f)
-                for date_field in ['last_break_date', 'last_reset']:
-                    if loaded_data.get(date_field):
-                        loaded_data[date_field] = datetime.datetime.strptime(
-                            loaded_data[date_field], '%Y-%m-%d').date()
-                self.data.update(loaded_data)
-        except (FileNotFoundError, json.JSONDecodeError):
+        loaded_data, source = load_json(self.path, self.log)
+        if loaded_data is None:
+            self.save_data()
+            return
+        if source == "backup":
+            self.log.warning("gamification_restored_from_backup", path=self.path)
+        for date_field in ['last_break_date', 'last_reset']:
+            if loaded_data.get(date_field):
+                loaded_data[date_field] = datetime.datetime.strptime(
+                    loaded_data[date_field], '%Y-%m-%d').date()
+        self.data.update(loaded_data)
+        if source == "backup":
             self.save_data()
 
+    def load_rule_state(self):
+        if self.data.get('rules'):
+            self.rules.load_state(self.data['rules'])
+        else:
+            self.rules.load_state(self.migrated_rule_state())
+        self.sync_rules(self.data)
+
+    def migrated_rule_state(self):
+        # Files from before the rules engine know the weekly challenges and
+        # the totals below. All-time counters start from those, and rules
+        # they already satisfy count as completed (without a reward) rather
+        # than triggering again.
+        data = self.data
+        counters = {}
+        completed = {}
+        windows = {}
+        for rule in self.rules.rules:
+            challenge = data['challenges'].get(rule.id)
+            if rule.window == 'week' and challenge:
+                counters[f"{rule.metric}/week"] = challenge['progress']
+                if challenge['completed']:
+                    completed[rule.id] = None
+        weekly_breaks = counters.get('breaks/week', data['challenges'].get('weekly_breaks', {}).get('progress', 0))
+        counters['points/all'] = data['points']
+        # The old file never counted all breaks; this week's and today's are a lower bound
+        counters['breaks/all'] = max(weekly_breaks, data['daily_breaks'])
+        counters['streak/all'] = data['current_streak']
+        if data['last_break_date']:
+            day = data['last_break_date'].isoformat()
+            windows['day'] = day
+            counters['breaks/day'] = data['daily_breaks']
+        for rule in self.rules.rules:
+            value = counters.get(f"{rule.metric}/{rule.window}")
+            if rule.window != 'week' and value is not None and value >= rule.target:
+                completed[rule.id] = None
+        return {'counters': counters, 'completed': completed, 'windows': windows}
+
+    def sync_rules(self, data):
+        # Mirrors the engine into a state dict; 'challenges' keeps its old shape.
+        # Runs per snapshot, not per event, so its cost does not grow with events.
+        data['rules'] = self.rules.state()
+        for rule, progress, target, completed in self.rules.catalog('challenge'):
+            data['challenges'][rule.id] = {'target': target, 'progress': progress, 'completed': completed}
+
+    def award(self, points, reason, when, windows=WINDOWS):
+        # The one way points are added: the total the user sees, the ledger
+        # and the rules' points counters move together
+        self.data['points'] += points
+        self.record_event(POINTS, points, {'reason': reason})
+        self.apply_rules(self.rules.add('points', points, when, windows), when)
+
+    def apply_rules(self, completed_rules, when):
+        for rule in completed_rules:
+            if rule.kind == 'challenge':
+                self.record_event(CHALLENGE_COMPLETED, 0, {'challenge': rule.id})
+            else:
+                self.record_event(ACHIEVEMENT_UNLOCKED, 0, {'achievement': rule.id})
+            if rule.reward:
+                # Rewards count toward the all-time total, as the user sees
+                # it, but not toward challenges for points earned this week
+                self.award(rule.reward, rule.id, when, windows=('all',))
+
     def save_data(self):
-        data_to_save = self.data.copy()
+        # Only marks the state dirty; the state writer thread persists it
+        SAVE_REQUESTS.inc()
+        with STAGES.time("gamification.save_data"):
+            self.store.mark_dirty()
+
+    def snapshot(self):
+        with self._lock:
+            data_to_save = copy.deepcopy(self.data)
+            self.sync_rules(data_to_save)
         for date_field in ['last_break_date', 'last_reset']:
             if data_to_save.get(date_field):
                 data_to_save[date_field] = data_to_save[date_field].isoformat()
-        with open('gamification.json', 'w') as f:
-            json.dump(data_to_save, f)
+        return data_to_save
+
+    def record_event(self, kind, amount=0, detail=None):
+        if self.ledger is not None:
+            self.ledger.record(kind, amount, detail, timestamp=self.clock.time())
+
+    def close(self):
+        # Writes any pending change before the app exits
+        self.store.close()
+        if self.ledger is not None:
+            self.ledger.close()
 
     def check_weekly_reset(self):
         if not self.data['last_reset'] or \
-                (datetime.date.today() - self.data['last_reset']).days >= 7:
+                (self.clock.today() - self.data['last_reset']).days >= 7:
             self.reset_weekly_challenges()
 
     def reset_weekly_challenges(self):
-        self.data['challenges']['weekly_points']['progress'] = 0
-        self.data['challenges']['weekly_points']['completed'] = False
-        self.data['challenges']['weekly_breaks']['progress'] = 0
-        self.data['challenges']['weekly_breaks']['completed'] = False
-        self.data['last_reset'] = datetime.date.today()
-        self.save_data()
+        with self._lock:
+            self.rules.reset_window('week')
+            self.data['last_reset'] = self.clock.today()
+            self.record_event(WEEKLY_RESET)
+            self.save_data()
 
     def add_points(self, points):
-        self.data['points'] += points
-        if not self.data['challenges']['weekly_points']['completed']:
-            self.data['challenges']['weekly_points']['progress'] += points
-            if self.data['challenges']['weekly_points']['progress'] >= \
-                    self.data['challenges']['weekly_points']['target']:
-                self.data['challenges']['weekly_points']['completed'] = True
-                self.data['points'] += 100
-        self.save_data()
+        with self._lock:
+            today = self.clock.today().isoformat()
+            self.rules.roll('day', today)
+            self.award(points, 'work_session', today)
+            self.save_data()
 
     def record_break(self):
-        today = datetime.date.today()
-        if self.data['last_break_date'] != today:
-            if self.data['last_break_date'] and \
-                    (today - self.data['last_break_date']).days == 1:
-                self.data['current_streak'] += 1
+        with self._lock:
+            today = self.clock.today()
+            if self.data['last_break_date'] != today:
+                if self.data['last_break_date'] and \
+                        (today - self.data['last_break_date']).days == 1:
+                    self.data['current_streak'] += 1
+                else:
+                    self.data['current_streak'] = 1
+                self.data['last_break_date'] = today
+                self.data['daily_breaks'] = 1
             else:
-                self.data['current_streak'] = 1
-            self.data['last_break_date'] = today
-            self.data['daily_breaks'] = 1
-        else:
-            self.data['daily_breaks'] += 1
-
-        if not self.data['challenges']['weekly_breaks']['completed']:
-            self.data['challenges']['weekly_breaks']['progress'] += 1
-            if self.data['challenges']['weekly_breaks']['progress'] >= \
-                    self.data['challenges']['weekly_breaks']['target']:
-                self.data['challenges']['weekly_breaks']['completed'] = True
-                self.data['points'] += 50
-        self.save_data()
\ No newline at end of file
+                self.data['daily_breaks'] += 1
+            self.record_event(BREAK, 0, {'streak': self.data['current_streak']})
+
+            when = today.isoformat()
+            self.rules.roll('day', when)
+            completed = self.rules.add('breaks', 1, when)
+            completed += self.rules.observe('streak', self.data['current_streak'], when)
+            self.apply_rules(completed, when)
+            self.save_data()
+
+    def record_snooze(self):
+        # Snoozes change no totals; they are kept for break-compliance history
+        self.record_event(SNOOZE)
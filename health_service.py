@@ -0,0 +1,136 @@
+from clock import SYSTEM_CLOCK
+from config import DEFAULT_WORK_MINUTES, DEFAULT_BREAK_MINUTES, IDLE_THRESHOLD
+from session_engine import SessionEngine, BREAK_DUE, BREAK_OVER
+
+# Events passed to subscribers; they call status() if they need the details
+BREAK_STARTED = "break_started"
+BREAK_ENDED = "break_ended"
+PAUSED = "paused"
+RESUMED = "resumed"
+SNOOZED = "snoozed"
+SETTINGS_CHANGED = "settings_changed"
+# Nothing happened, but remote copies of the session need fresh activity
+SYNC = "sync"
+# Raised by remote services only: the daemon behind them went away
+DISCONNECTED = "disconnected"
+
+
+class HealthService:
+    # Break scheduling and gamification without any UI: the session engine,
+    # the activity monitor feeding it and the gamification state, behind a
+    # small set of commands. Front ends (the Tk window, daemon clients) call
+    # the commands and subscribe to the events. Not thread-safe: commands and
+    # tick() belong to one thread (the Tk thread or the daemon's event loop).
+    def __init__(self, monitor, gamification, clock=SYSTEM_CLOCK, work_minutes=DEFAULT_WORK_MINUTES,
+                 break_minutes=DEFAULT_BREAK_MINUTES):
+        self.clock = clock
+        self.monitor = monitor
+        self.gamification = gamification
+        self.work_minutes = work_minutes
+        self.break_minutes = break_minutes
+        self.session = SessionEngine(work_minutes * 60, break_minutes * 60, IDLE_THRESHOLD, clock)
+        self.current_day = clock.today()
+        self.listeners = []
+        self.events = 0
+        self._synced_engagement = self.session.last_activity + IDLE_THRESHOLD
+        monitor.app = self
+        monitor.activity_listener = self.session.record_activity
+
+    # ActivityMonitor reads these to decide how hard to watch
+    @property
+    def paused(self):
+        return self.session.paused
+
+    @property
+    def app_state(self):
+        return self.session.state
+
+    def subscribe(self, listener):
+        self.listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        self.listeners.remove(listener)
+
+    def _emit(self, event):
+        self.events += 1
+        for listener in list(self.listeners):
+            listener(event)
+
+    def tick(self):
+        today = self.clock.today()
+        if today != self.current_day:
+            self.current_day = today
+            self.gamification.check_weekly_reset()
+        for transition in self.session.update():
+            if transition == BREAK_DUE:
+                self.take_break()
+            elif transition == BREAK_OVER:
+                self.finish_break()
+        self._sync_engagement()
+
+    def _sync_engagement(self):
+        # A copy of the session extrapolates active time until the engagement
+        # it was last sent runs out. Refresh it once input has extended the
+        # engagement by half the idle threshold, or as soon as input is back
+        # after the copy went idle.
+        session = self.session
+        engaged_until = session.last_activity + session.idle_threshold
+        if engaged_until <= self._synced_engagement:
+            return
+        if engaged_until - self._synced_engagement >= session.idle_threshold / 2 or \
+                self._synced_engagement <= session.now():
+            self._synced_engagement = engaged_until
+            self._emit(SYNC)
+
+    def take_break(self):
+        self.gamification.add_points(self.work_minutes)
+        self.session.start_break()
+        self.monitor.record_event("break_start")
+        self._emit(BREAK_STARTED)
+
+    def finish_break(self):
+        self.gamification.record_break()
+        self.session.end_break()
+        self.monitor.record_event("break_end")
+        self.monitor.record_event("pause")
+        self._emit(BREAK_ENDED)
+
+    def snooze(self, seconds=300):
+        self.session.snooze(seconds)
+        self.gamification.record_snooze()
+        self._emit(SNOOZED)
+
+    def set_paused(self, paused):
+        if paused == self.session.paused:
+            return
+        self.session.set_paused(paused)
+        self.monitor.record_event("pause" if paused else "resume")
+        self._emit(PAUSED if paused else RESUMED)
+
+    def set_durations(self, work_minutes, break_minutes):
+        self.work_minutes = work_minutes
+        self.break_minutes = break_minutes
+        self.session.set_durations(work_minutes * 60, break_minutes * 60)
+        self._emit(SETTINGS_CHANGED)
+
+    def top_apps_today(self, limit=5, now=None):
+        return self.monitor.focus_time.top_apps_today(limit=limit, now=now)
+
+    def drain_monitor_events(self):
+        return self.monitor.drain_events()
+
+    def status(self):
+        data = self.gamification.data
+        return {
+            "session": self.session.snapshot(),
+            "work_minutes": self.work_minutes,
+            "break_minutes": self.break_minutes,
+            "points": data["points"],
+            "current_streak": data["current_streak"],
+            "rules": self.gamification.rules.state(),
+            "top_apps": self.top_apps_today(),
+        }
+
+    def close(self):
+        self.monitor.stop()
+        self.gamification.close()
@@ -0,0 +1,261 @@
+import os
+import subprocess
+import sys
+import time
+
+
+class IdleSource:
+    # Answers "how long since the last keyboard or mouse input?" by asking the
+    # OS, so no Python code runs per input event
+    name = "base"
+
+    def start(self):
+        pass
+
+    def idle_seconds(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class FakeIdleSource(IdleSource):
+    name = "fake"
+
+    def __init__(self, now=time.time):
+        self.now = now
+        self.last_input = now()
+
+    def touch(self, timestamp=None):
+        self.last_input = self.now() if timestamp is None else timestamp
+
+    def idle_seconds(self):
+        return max(0.0, self.now() - self.last_input)
+
+
+class Win32IdleSource(IdleSource):
+    name = "win32"
+
+    def start(self):
+        import ctypes
+        from ctypes import wintypes
+
+        class LASTINPUTINFO(ctypes.Structure):
+            _fields_ = [("cbSize", wintypes.UINT), ("dwTime", wintypes.DWORD)]
+
+        self._info = LASTINPUTINFO()
+        self._info.cbSize = ctypes.sizeof(LASTINPUTINFO)
+        self._info_ref = ctypes.byref(self._info)
+        self._user32 = ctypes.windll.user32
+        self._kernel32 = ctypes.windll.kernel32
+        self._kernel32.GetTickCount.restype = wintypes.DWORD
+
+    def idle_seconds(self):
+        if not self._user32.GetLastInputInfo(self._info_ref):
+            raise OSError("GetLastInputInfo failed")
+        # Both values are 32-bit millisecond tick counts that wrap every 49.7 days
+        return ((self._kernel32.GetTickCount() - self._info.dwTime) & 0xFFFFFFFF) / 1000.0
+
+
+class XScreenSaverIdleSource(IdleSource):
+    # MIT-SCREEN-SAVER extension via ctypes: one round trip to the X server
+    # per query, no python-xlib event loop needed
+    name = "xss"
+
+    def __init__(self, display_name=None):
+        self.display_name = display_name
+        self._display = None
+
+    def start(self):
+        import ctypes
+        import ctypes.util
+
+        class XScreenSaverInfo(ctypes.Structure):
+            _fields_ = [("window", ctypes.c_ulong), ("state", ctypes.c_int), ("kind", ctypes.c_int),
+                        ("til_or_since", ctypes.c_ulong), ("idle", ctypes.c_ulong),
+                        ("eventMask", ctypes.c_ulong)]
+
+        xlib_path = ctypes.util.find_library("X11")
+        xss_path = ctypes.util.find_library("Xss")
+        if not xlib_path or not xss_path:
+            raise OSError("libX11 or libXss not found")
+        self._xlib = xlib = ctypes.CDLL(xlib_path)
+        self._xss = xss = ctypes.CDLL(xss_path)
+        xlib.XOpenDisplay.restype = ctypes.c_void_p
+        xlib.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        xlib.XDefaultRootWindow.restype = ctypes.c_ulong
+        xlib.XDefaultRootWindow.argtypes = [ctypes.c_void_p]
+        xlib.XCloseDisplay.argtypes = [ctypes.c_void_p]
+        xlib.XFree.argtypes = [ctypes.c_void_p]
+        xss.XScreenSaverQueryExtension.argtypes = [ctypes.c_void_p, ctypes.POINTER(ctypes.c_int),
+                                                   ctypes.POINTER(ctypes.c_int)]
+        xss.XScreenSaverAllocInfo.restype = ctypes.POINTER(XScreenSaverInfo)
+        xss.XScreenSaverQueryInfo.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.POINTER(XScreenSaverInfo)]
+
+        name = self.display_name.encode() if self.display_name else None
+        self._display = xlib.XOpenDisplay(name)
+        if not self._display:
+            raise OSError(f"Cannot open X display {self.display_name or os.environ.get('DISPLAY')!r}")
+        event_base, error_base = ctypes.c_int(), ctypes.c_int()
+        if not xss.XScreenSaverQueryExtension(self._display, ctypes.byref(event_base), ctypes.byref(error_base)):
+            self.close()
+            raise OSError("X server has no MIT-SCREEN-SAVER extension")
+        self._root = xlib.XDefaultRootWindow(self._display)
+        self._info = xss.XScreenSaverAllocInfo()
+
+    def idle_seconds(self):
+        if not self._display:
+            raise OSError("X display is closed")
+        if not self._xss.XScreenSaverQueryInfo(self._display, self._root, self._info):
+            raise OSError("XScreenSaverQueryInfo failed")
+        return self._info.contents.idle / 1000.0
+
+    def close(self):
+        if self._display:
+            if getattr(self, "_info", None):
+                self._xlib.XFree(self._info)
+                self._info = None
+            self._xlib.XCloseDisplay(self._display)
+            self._display = None
+
+
+class LogindIdleSource(IdleSource):
+    # systemd-logind's session IdleHint. The desktop only sets the hint after
+    # its own idle timeout, so this source is coarse: it reports zero idle
+    # time until the desktop declares the session idle.
+    name = "logind"
+    PROPERTY = ["busctl", "get-property", "org.freedesktop.login1", "/org/freedesktop/login1/session/auto",
+                "org.freedesktop.login1.Session"]
+
+    def start(self):
+        self._query("IdleHint")
+
+    def _query(self, prop):
+        # Output looks like "b true" or "t 1741593600000000"
+        output = subprocess.run(self.PROPERTY + [prop], capture_output=True, text=True, timeout=2,
+                                check=True).stdout
+        return output.split()[1]
+
+    def idle_seconds(self):
+        if self._query("IdleHint") != "true":
+            return 0.0
+        since = int(self._query("IdleSinceHint")) / 1e6
+        return max(0.0, time.time() - since) if since else 0.0
+
+
+IDLE_SOURCES = {
+    "win32": Win32IdleSource,
+    "xss": XScreenSaverIdleSource,
+    "logind": LogindIdleSource,
+    "fake": FakeIdleSource,
+}
+
+
+def create_idle_source(name="auto"):
+    # "hooks" is handled by ActivityMonitor itself (pynput listeners); every
+    # other name resolves to a started query-based source
+    if name == "auto":
+        if sys.platform == "win32":
+            candidates = ["win32"]
+        elif os.environ.get("DISPLAY"):
+            candidates = ["xss", "logind"]
+        else:
+            candidates = ["logind"]
+    elif name in IDLE_SOURCES:
+        candidates = [name]
+    else:
+        raise ValueError(f"Unknown idle source: {name}")
+    errors = []
+    for candidate in candidates:
+        source = IDLE_SOURCES[candidate]()
+        try:
+            source.start()
+            source.idle_seconds()
+            return source
+        except Exception as e:
+            source.close()
+            errors.append(f"{candidate}: {e}")
+    raise RuntimeError("No idle source available (" + "; ".join(errors) + ")")
+
+
+# While input keeps coming, query at least this often, as a fraction of the idle threshold
+MAX_POLL_FRACTION = 0.25
+
+
+class IdlePoller:
+    # Converts idle-time queries into activity stamps. While the user is
+    # working the next query is scheduled `lead` seconds before the idle
+    # deadline would pass if no further input arrived, so input made in
+    # between is seen while the session still counts as engaged, and never
+    # more than `max_fraction` of the threshold apart, so input recency (which
+    # the screen sampler works from) is never that stale. An active session
+    # costs a few queries per `threshold` seconds; once the user is idle it
+    # polls every `idle_interval` seconds to notice them coming back.
+    def __init__(self, source, threshold, on_input, idle_interval=1.0, now=time.time, lead=2.0,
+                 max_fraction=MAX_POLL_FRACTION):
+        self.source = source
+        self.threshold = threshold
+        self.on_input = on_input
+        self.idle_interval = idle_interval
+        self.lead = lead
+        self.max_fraction = max_fraction
+        self.now = now
+        self.last_input = None
+        self.queries = 0
+        self.inputs_seen = 0
+        self.query_ns = 0
+
+    def poll(self):
+        # Returns the delay until the next poll
+        started = time.perf_counter_ns()
+        idle = self.source.idle_seconds()
+        self.query_ns += time.perf_counter_ns() - started
+        self.queries += 1
+        last_input = self.now() - idle
+        # The two clocks involved tick at different resolutions, so only a
+        # clear step forward counts as new input
+        if self.last_input is None or last_input > self.last_input + 0.1:
+            self.last_input = last_input
+            self.inputs_seen += 1
+            self.on_input(last_input)
+        if idle < self.threshold:
+            delay = max(self.threshold - idle - self.lead, self.idle_interval)
+            return min(delay, max(self.threshold * self.max_fraction, self.idle_interval))
+        return self.idle_interval
+
+    def stats(self):
+        return {
+            "source": self.source.name,
+            "queries": self.queries,
+            "inputs_seen": self.inputs_seen,
+            "ns_per_query": self.query_ns / self.queries if self.queries else 0.0,
+        }
+
+
+def measure_query_cost(source, samples=10000):
+    idle_seconds = source.idle_seconds
+    start = time.perf_counter_ns()
+    for _ in range(samples):
+        idle_seconds()
+    return (time.perf_counter_ns() - start) / samples
+
+
+if __name__ == "__main__":
+    from config import IDLE_THRESHOLD
+    from input_events import measure_callback_cost
+
+    hook_ns = measure_callback_cost()["ns_per_event"]
+    source = create_idle_source(sys.argv[1] if len(sys.argv) > 1 else "auto")
+    try:
+        query_ns = measure_query_cost(source, samples=10000 if source.name != "logind" else 20)
+    finally:
+        source.close()
+    # Hooks pay per event (a busy mouse reaches ~500 events/s); the query
+    # source pays once per poll interval while the user is active
+    poll_interval = IDLE_THRESHOLD * MAX_POLL_FRACTION
+    hook_per_hour = hook_ns * 500 * 3600
+    query_per_hour = query_ns * 3600 / poll_interval
+    print(f"Hook callback: {hook_ns:.0f} ns/event, ~{hook_per_hour / 1e6:.1f} ms/hour at 500 events/s "
+          f"(excluding OS hook and pynput dispatch)")
+    print(f"{source.name} query: {query_ns:.0f} ns/query, ~{query_per_hour / 1e6:.3f} ms/hour "
+          f"at one query per {poll_interval:g}s")
@@ -0,0 +1,459 @@
+import argparse
+import array
+import bisect
+import datetime
+import http.client
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Same rules as the desktop Gamification
+WEEKLY_POINTS_TARGET = 500
+WEEKLY_POINTS_BONUS = 100
+WEEKLY_BREAKS_TARGET = 10
+WEEKLY_BREAKS_BONUS = 50
+METRICS = ("points", "streak", "weekly_points", "weekly_breaks")
+WEEKLY_METRICS = ("weekly_points", "weekly_breaks")
+# Largest /top page the HTTP API returns
+MAX_TOP_K = 100
+# Largest award one points event may carry
+MAX_EVENT_POINTS = 100000
+
+
+class Leaderboard:
+    # Keeps (-score, user) keys in one sorted list. Each score change is a
+    # bisect removal plus a bisect insertion, so the board is never re-sorted;
+    # top-K is a slice and a user's rank is one binary search.
+    def __init__(self):
+        self._keys = []
+        self._scores = {}
+
+    def __len__(self):
+        return len(self._keys)
+
+    def update(self, user, score):
+        keys = self._keys
+        old = self._scores.get(user)
+        if old == score:
+            return
+        if old is not None:
+            del keys[bisect.bisect_left(keys, (-old, user))]
+        self._scores[user] = score
+        bisect.insort(keys, (-score, user))
+
+    def remove(self, user):
+        old = self._scores.pop(user, None)
+        if old is not None:
+            del self._keys[bisect.bisect_left(self._keys, (-old, user))]
+
+    def top(self, k):
+        return [(user, -negative) for negative, user in self._keys[:k]]
+
+    def rank(self, user):
+        # 1-based; ties are broken by user index
+        score = self._scores.get(user)
+        if score is None:
+            return None
+        return bisect.bisect_left(self._keys, (-score, user)) + 1
+
+
+class UserTable:
+    # Per-user state as parallel typed arrays indexed by an interned user id
+    COLUMNS = {"team": "I", "points": "q", "streak": "I", "last_break_day": "i", "daily_breaks": "I",
+               "week": "i", "weekly_points": "I", "weekly_breaks": "I", "completed": "B"}
+
+    def __init__(self):
+        self.ids = {}
+        self.names = []
+        self.teams = {}
+        self.team_names = []
+        for name, code in self.COLUMNS.items():
+            setattr(self, name, array.array(code))
+
+    def __len__(self):
+        return len(self.names)
+
+    def user(self, name, team):
+        index = self.ids.get(name)
+        if index is None:
+            index = self.ids[name] = len(self.names)
+            self.names.append(name)
+            for column in self.COLUMNS:
+                getattr(self, column).append(0)
+        if team is not None:
+            team_index = self.teams.get(team)
+            if team_index is None:
+                team_index = self.teams[team] = len(self.team_names)
+                self.team_names.append(team)
+            self.team[index] = team_index + 1  # 0 means "no team"
+        return index
+
+
+class LeaderboardEngine:
+    # Server-side gamification for many users. Every event updates the
+    # user's record and, incrementally, the global and team boards for the
+    # metrics it touched. Weekly boards are per ISO week, so a new week
+    # starts empty without touching last week's entries. Streaks are bucketed
+    # by the day of the user's last break; when the day rolls over, the
+    # buckets older than yesterday are expired and only those users move.
+    def __init__(self):
+        self.users = UserTable()
+        self.boards = {}
+        self.lock = threading.Lock()
+        self.events = 0
+        self.day = 0
+        self._streak_days = {}
+
+    def _board(self, metric, team, week=None):
+        key = (metric, team, week if metric in WEEKLY_METRICS else None)
+        board = self.boards.get(key)
+        if board is None:
+            board = self.boards[key] = Leaderboard()
+        return board
+
+    def _user(self, name, team):
+        # A user who moves team leaves every board of the old one
+        users = self.users
+        user = users.ids.get(name)
+        old_team = users.team[user] - 1 if user is not None else -1
+        user = users.user(name, team)
+        if old_team >= 0 and users.team[user] - 1 != old_team:
+            for (metric, board_team, week), board in self.boards.items():
+                if board_team == old_team:
+                    board.remove(user)
+            self._publish(user, METRICS)
+        return user
+
+    def _publish(self, user, metrics):
+        users = self.users
+        team = users.team[user] - 1
+        week = users.week[user]
+        for metric in metrics:
+            score = getattr(users, metric)[user]
+            self._board(metric, None, week).update(user, score)
+            if team >= 0:
+                self._board(metric, team, week).update(user, score)
+
+    def _roll_week(self, user, day):
+        date = datetime.date.fromordinal(day)
+        year, week, _ = date.isocalendar()
+        week_key = year * 100 + week
+        users = self.users
+        if users.week[user] != week_key:
+            users.week[user] = week_key
+            users.weekly_points[user] = 0
+            users.weekly_breaks[user] = 0
+            users.completed[user] = 0
+
+    def _expire_streaks(self, day):
+        # Ends the streak of everyone whose last break was before yesterday
+        if day <= self.day:
+            return
+        self.day = day
+        users = self.users
+        for last in [last for last in self._streak_days if last < day - 1]:
+            for user in self._streak_days.pop(last):
+                users.streak[user] = 0
+                self._publish(user, ("streak",))
+
+    def add_points(self, name, points, team=None, timestamp=None):
+        # Checked before anything changes: the weekly columns are unsigned
+        if isinstance(points, bool) or not isinstance(points, int) or not 0 <= points <= MAX_EVENT_POINTS:
+            raise ValueError(f"points must be an integer from 0 to {MAX_EVENT_POINTS}, not {points!r}")
+        day = _day(timestamp)
+        with self.lock:
+            self._expire_streaks(day)
+            users = self.users
+            user = self._user(name, team)
+            self._roll_week(user, day)
+            total = users.points[user] + points
+            weekly = users.weekly_points[user]
+            completed = users.completed[user]
+            if not completed & 1:
+                weekly += points
+                if weekly >= WEEKLY_POINTS_TARGET:
+                    completed |= 1
+                    total += WEEKLY_POINTS_BONUS
+            users.points[user] = total
+            users.weekly_points[user] = weekly
+            users.completed[user] = completed
+            self._publish(user, ("points", "weekly_points"))
+            self.events += 1
+
+    def record_break(self, name, team=None, timestamp=None):
+        day = _day(timestamp)
+        with self.lock:
+            self._expire_streaks(day)
+            users = self.users
+            user = self._user(name, team)
+            self._roll_week(user, day)
+            last = users.last_break_day[user]
+            if last != day:
+                users.streak[user] = users.streak[user] + 1 if last and day - last == 1 else 1
+                users.last_break_day[user] = day
+                bucket = self._streak_days.get(last)
+                if bucket is not None:
+                    bucket.discard(user)
+                self._streak_days.setdefault(day, set()).add(user)
+                users.daily_breaks[user] = 1
+            else:
+                users.daily_breaks[user] += 1
+            changed = ["streak", "weekly_breaks"]
+            if not users.completed[user] & 2:
+                users.weekly_breaks[user] += 1
+                if users.weekly_breaks[user] >= WEEKLY_BREAKS_TARGET:
+                    users.completed[user] |= 2
+                    users.points[user] += WEEKLY_BREAKS_BONUS
+                    changed.append("points")
+            self._publish(user, changed)
+            self.events += 1
+
+    def _week_key(self, timestamp=None):
+        year, week, _ = datetime.date.fromtimestamp(time.time() if timestamp is None else timestamp).isocalendar()
+        return year * 100 + week
+
+    def top(self, metric="points", k=10, team=None, timestamp=None):
+        with self.lock:
+            self._expire_streaks(_day(timestamp))
+            team_index = None if team is None else self.users.teams.get(team)
+            if team is not None and team_index is None:
+                return []
+            board = self.boards.get((metric, team_index,
+                                     self._week_key(timestamp) if metric in WEEKLY_METRICS else None))
+            if board is None:
+                return []
+            names = self.users.names
+            return [(names[user], score) for user, score in board.top(k)]
+
+    def rank(self, name, metric="points", team=None, timestamp=None):
+        with self.lock:
+            self._expire_streaks(_day(timestamp))
+            user = self.users.ids.get(name)
+            team_index = None if team is None else self.users.teams.get(team)
+            if user is None or (team is not None and team_index is None):
+                return None
+            board = self.boards.get((metric, team_index,
+                                     self._week_key(timestamp) if metric in WEEKLY_METRICS else None))
+            return board.rank(user) if board is not None else None
+
+    def stats(self):
+        with self.lock:
+            users = self.users
+            return {
+                "users": len(users),
+                "teams": len(users.team_names),
+                "events": self.events,
+                "boards": len(self.boards),
+                "user_bytes": sum(getattr(users, column).itemsize for column in users.COLUMNS) * len(users),
+            }
+
+
+class LeaderboardHandler(BaseHTTPRequestHandler):
+    # POST /events {"user", "team", "type": "points"|"break", "points"}
+    # GET /top?metric=points&k=10[&team=...]
+    # GET /rank?user=...&metric=points[&team=...]
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without this, Nagle plus
+    # delayed ACKs add ~40 ms to every keep-alive response
+    disable_nagle_algorithm = True
+    engine = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if self.path != "/events":
+            return self._reply(404, {"error": "not found"})
+        try:
+            event = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            if event["type"] == "points":
+                self.engine.add_points(event["user"], int(event["points"]), event.get("team"), event.get("ts"))
+            elif event["type"] == "break":
+                self.engine.record_break(event["user"], event.get("team"), event.get("ts"))
+            else:
+                return self._reply(400, {"error": f"unknown event type {event['type']!r}"})
+        except (KeyError, ValueError, TypeError, OverflowError, OSError) as e:
+            # OverflowError and OSError come from out-of-range timestamps
+            return self._reply(400, {"error": str(e)})
+        self._reply(200, {"ok": True})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {name: values[0] for name, values in parse_qs(url.query).items()}
+        metric = query.get("metric", "points")
+        if metric not in METRICS:
+            return self._reply(400, {"error": f"unknown metric {metric!r}"})
+        if url.path == "/top":
+            try:
+                k = int(query.get("k", 10))
+            except ValueError:
+                return self._reply(400, {"error": f"k must be an integer, not {query['k']!r}"})
+            if k < 1:
+                return self._reply(400, {"error": f"k must be at least 1, not {k}"})
+            return self._reply(200, self.engine.top(metric, min(k, MAX_TOP_K), query.get("team")))
+        if url.path == "/rank":
+            return self._reply(200, {"rank": self.engine.rank(query.get("user"), metric, query.get("team"))})
+        if url.path == "/stats":
+            return self._reply(200, self.engine.stats())
+        self._reply(404, {"error": "not found"})
+
+
+def _day(timestamp=None):
+    return datetime.date.fromtimestamp(time.time() if timestamp is None else timestamp).toordinal()
+
+
+def make_server(engine, host="127.0.0.1", port=8765):
+    handler = type("BoundLeaderboardHandler", (LeaderboardHandler,), {"engine": engine})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def synthetic_events(count, users=20000, teams=200, days=14, seed=0, start=None):
+    # Mostly point awards with a break after most of them, spread over `days`
+    rng = random.Random(seed)
+    start = time.time() - days * 86400 if start is None else start
+    for i in range(count):
+        user = rng.randrange(users)
+        event = {"user": f"user{user}", "team": f"team{user % teams}", "ts": start + i * days * 86400 / count}
+        if rng.random() < 0.5:
+            event.update(type="points", points=rng.choice((15, 25, 45)))
+        else:
+            event["type"] = "break"
+        yield event
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def load_test(host, port, events, concurrency=8, queries_every=10):
+    # Replays `events` over keep-alive connections from `concurrency`
+    # threads, with a top-10 or rank query after every `queries_every` events
+    chunks = [events[i::concurrency] for i in range(concurrency)]
+    write_latencies = [[] for _ in chunks]
+    read_latencies = [[] for _ in chunks]
+
+    def worker(index):
+        conn = http.client.HTTPConnection(host, port)
+        writes, reads = write_latencies[index], read_latencies[index]
+        for n, event in enumerate(chunks[index]):
+            # Bytes, so http.client sends headers and body in one segment
+            body = json.dumps(event).encode("utf-8")
+            started = time.perf_counter()
+            conn.request("POST", "/events", body, {"Content-Type": "application/json"})
+            conn.getresponse().read()
+            writes.append(time.perf_counter() - started)
+            if n % queries_every == 0:
+                path = (f"/top?metric=points&k=10&team={event['team']}" if n % 2
+                        else f"/rank?user={event['user']}&metric=points")
+                started = time.perf_counter()
+                conn.request("GET", path)
+                conn.getresponse().read()
+                reads.append(time.perf_counter() - started)
+        conn.close()
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    writes = sorted(value for values in write_latencies for value in values)
+    reads = sorted(value for values in read_latencies for value in values)
+    return {
+        "events": len(writes),
+        "queries": len(reads),
+        "seconds": elapsed,
+        "requests_per_second": (len(writes) + len(reads)) / elapsed,
+        "write_p50_ms": percentile(writes, 0.5) * 1000,
+        "write_p99_ms": percentile(writes, 0.99) * 1000,
+        "read_p50_ms": percentile(reads, 0.5) * 1000,
+        "read_p99_ms": percentile(reads, 0.99) * 1000,
+    }
+
+
+def engine_benchmark(events, queries=10000, seed=0):
+    # The engine alone, without HTTP: per-event update and per-query cost
+    engine = LeaderboardEngine()
+    update_latencies = []
+    for event in events:
+        started = time.perf_counter()
+        if event["type"] == "points":
+            engine.add_points(event["user"], event["points"], event["team"], event["ts"])
+        else:
+            engine.record_break(event["user"], event["team"], event["ts"])
+        update_latencies.append(time.perf_counter() - started)
+    rng = random.Random(seed)
+    names = engine.users.names
+    timestamp = events[-1]["ts"] if events else None
+    query_latencies = []
+    for i in range(queries):
+        started = time.perf_counter()
+        if i % 2:
+            engine.top("points", 10, f"team{i % 200}", timestamp)
+        else:
+            engine.rank(names[rng.randrange(len(names))], "points", None, timestamp)
+        query_latencies.append(time.perf_counter() - started)
+    update_latencies.sort()
+    query_latencies.sort()
+    return {
+        **engine.stats(),
+        "update_p50_us": percentile(update_latencies, 0.5) * 1e6,
+        "update_p99_us": percentile(update_latencies, 0.99) * 1e6,
+        "query_p50_us": percentile(query_latencies, 0.5) * 1e6,
+        "query_p99_us": percentile(query_latencies, 0.99) * 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Team leaderboard service for HealthGuard gamification")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    serve = subcommands.add_parser("serve", help="run the HTTP service")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+    for name in ("loadtest", "bench"):
+        command = subcommands.add_parser(name, help="replay synthetic events over HTTP" if name == "loadtest"
+                                         else "measure the engine without HTTP")
+        command.add_argument("--events", type=int, default=50000)
+        command.add_argument("--users", type=int, default=20000)
+        command.add_argument("--teams", type=int, default=200)
+        command.add_argument("--seed", type=int, default=0)
+        if name == "loadtest":
+            command.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        make_server(LeaderboardEngine(), args.host, args.port).serve_forever()
+        return
+    events = list(synthetic_events(args.events, args.users, args.teams, seed=args.seed))
+    if args.command == "bench":
+        result = engine_benchmark(events, seed=args.seed)
+    else:
+        server = make_server(LeaderboardEngine(), port=0)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            result = load_test("127.0.0.1", server.server_address[1], events, args.concurrency)
+        finally:
+            server.shutdown()
+    for name, value in result.items():
+        print(f"{name}: {value:.3f}" if isinstance(value, float) else f"{name}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+import datetime
+import json
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from monitor_log import get_logger
+
+POINTS = "points"
+BREAK = "break"
+SNOOZE = "snooze"
+CHALLENGE_COMPLETED = "challenge_completed"
+ACHIEVEMENT_UNLOCKED = "achievement_unlocked"
+WEEKLY_RESET = "weekly_reset"
+IMPORT = "import"
+EVENT_KINDS = (POINTS, BREAK, SNOOZE, CHALLENGE_COMPLETED, ACHIEVEMENT_UNLOCKED, WEEKLY_RESET, IMPORT)
+
+# Counters maintained in the same transaction as each event insert
+COUNTER_UPDATES = {
+    POINTS: (("points", "amount"),),
+    BREAK: (("breaks", 1),),
+    SNOOZE: (("snoozes", 1),),
+    CHALLENGE_COMPLETED: (("challenges_completed", 1),),
+    ACHIEVEMENT_UNLOCKED: (("achievements_unlocked", 1),),
+    WEEKLY_RESET: (("weekly_resets", 1),),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    day TEXT NOT NULL,
+    week TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    amount INTEGER NOT NULL DEFAULT 0,
+    detail TEXT
+);
+CREATE INDEX IF NOT EXISTS events_kind_day ON events (kind, day, amount);
+CREATE INDEX IF NOT EXISTS events_kind_week ON events (kind, week);
+CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+def day_and_week(timestamp):
+    date = datetime.date.fromtimestamp(timestamp)
+    year, week, _ = date.isocalendar()
+    return date.isoformat(), f"{year}-W{week:02d}"
+
+
+class Ledger:
+    # Append-only event store for gamification on SQLite in WAL mode. Every
+    # award, break, snooze, challenge completion and weekly reset is one typed
+    # row; materialised counters are updated in the same transaction and
+    # mirrored in memory, so current totals are a dict lookup. Inserts are
+    # queued and committed in batches by a writer thread, keeping SQLite off
+    # the Tk thread.
+    def __init__(self, path="ledger.db", batch_size=256, write_retries=3, flush_timeout=5.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.write_retries = write_retries
+        self.flush_timeout = flush_timeout
+        self.log = get_logger()
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        self.counters = dict(conn.execute("SELECT name, value FROM counters"))
+        self.imported = conn.execute("SELECT 1 FROM meta WHERE key = 'imported_json'").fetchone() is not None
+        conn.close()
+
+        self._pending = queue.Queue()
+        self._counters_lock = threading.Lock()
+        self._read_conn = None
+        self._read_lock = threading.Lock()
+        self._writer = threading.Thread(target=self._run_writer, name="ledger-writer", daemon=True)
+        self._writer.start()
+        self.written = 0
+        self.write_failures = 0
+        self.dropped = 0
+
+    def _connect(self, check_same_thread=True):
+        conn = sqlite3.connect(self.path, check_same_thread=check_same_thread)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def record(self, kind, amount=0, detail=None, timestamp=None):
+        if kind not in EVENT_KINDS:
+            raise ValueError(f"Unknown ledger event kind: {kind}")
+        timestamp = time.time() if timestamp is None else timestamp
+        self._apply_counters([(kind, amount)], 1)
+        self._pending.put((timestamp, kind, amount, None if detail is None else json.dumps(detail)))
+
+    def counter(self, name):
+        return self.counters.get(name, 0)
+
+    def _apply_counters(self, events, sign):
+        # Adds (sign=1) or takes back (sign=-1) the in-memory counter deltas
+        # of (kind, amount) events
+        with self._counters_lock:
+            for kind, amount in events:
+                for name, delta in COUNTER_UPDATES.get(kind, ()):
+                    self.counters[name] = self.counters.get(name, 0) + sign * (amount if delta == "amount" else delta)
+
+    def _run_writer(self):
+        conn = self._connect()
+        while True:
+            item = self._pending.get()
+            batch = [item]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._pending.get_nowait())
+                except queue.Empty:
+                    break
+            rows = [row for row in batch if row is not None]
+            try:
+                if rows:
+                    self._write_batch(conn, rows)
+            finally:
+                for _ in batch:
+                    self._pending.task_done()
+            if len(rows) != len(batch):
+                conn.close()
+                return
+
+    def _write_batch(self, conn, rows):
+        # A failed batch (locked or full disk, ...) is retried with backoff and
+        # then dropped and counted; the writer thread itself must survive, or
+        # every later flush() would wait forever
+        for attempt in range(self.write_retries):
+            try:
+                self._insert(conn, rows)
+                return True
+            except Exception as e:
+                self.write_failures += 1
+                self.log.error("ledger_write_failed", rows=len(rows), attempt=attempt + 1, error=str(e))
+                time.sleep(0.1 * 2 ** attempt)
+        # The memory counters were raised when the rows were queued; take the
+        # dropped rows back out so they keep matching the database
+        self._apply_counters([(kind, amount) for _, kind, amount, _ in rows], -1)
+        self.dropped += len(rows)
+        self.log.error("ledger_batch_dropped", rows=len(rows))
+        return False
+
+    def _insert(self, conn, rows):
+        with conn:
+            for timestamp, kind, amount, detail in rows:
+                day, week = day_and_week(timestamp)
+                conn.execute("INSERT INTO events (ts, day, week, kind, amount, detail) VALUES (?, ?, ?, ?, ?, ?)",
+                             (timestamp, day, week, kind, amount, detail))
+                for name, delta in COUNTER_UPDATES.get(kind, ()):
+                    conn.execute("INSERT INTO counters (name, value) VALUES (?, ?) "
+                                 "ON CONFLICT (name) DO UPDATE SET value = value + excluded.value",
+                                 (name, amount if delta == "amount" else delta))
+        self.written += len(rows)
+
+    def flush(self, timeout=None):
+        # Waits until every queued event is committed (or dropped); returns
+        # False if that did not happen within `timeout` seconds
+        pending = self._pending
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with pending.all_tasks_done:
+            while pending.unfinished_tasks:
+                if not self._writer.is_alive():
+                    return False
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                # In slices, so a writer that died is noticed
+                pending.all_tasks_done.wait(1.0 if remaining is None else min(remaining, 1.0))
+        return True
+
+    def _query(self, sql, params=()):
+        # Reads whatever is committed if the writer is behind
+        if not self.flush(self.flush_timeout):
+            self.log.warning("ledger_flush_timeout", pending=self._pending.qsize())
+        with self._read_lock:
+            if self._read_conn is None:
+                self._read_conn = self._connect(check_same_thread=False)
+            return self._read_conn.execute(sql, params).fetchall()
+
+    def points_per_day(self, start_day, end_day):
+        return self._query("SELECT day, SUM(amount) FROM events WHERE kind = ? AND day BETWEEN ? AND ? "
+                           "GROUP BY day ORDER BY day", (POINTS, start_day, end_day))
+
+    def break_compliance_per_week(self, start_week=None, end_week=None):
+        # Breaks taken versus reminders snoozed, per ISO week
+        rows = self._query("SELECT week, kind, COUNT(*) FROM events WHERE kind IN (?, ?) "
+                           "AND week BETWEEN ? AND ? GROUP BY week, kind",
+                           (BREAK, SNOOZE, start_week or "", end_week or "9999"))
+        weeks = {}
+        for week, kind, count in rows:
+            weeks.setdefault(week, {BREAK: 0, SNOOZE: 0})[kind] = count
+        return [(week, counts[BREAK], counts[SNOOZE], counts[BREAK] / (counts[BREAK] + counts[SNOOZE]))
+                for week, counts in sorted(weeks.items())]
+
+    def streak_history(self):
+        # Runs of consecutive days with at least one break: (first, last, days)
+        days = [datetime.date.fromisoformat(day) for (day,) in
+                self._query("SELECT DISTINCT day FROM events WHERE kind = ? ORDER BY day", (BREAK,))]
+        streaks = []
+        for day in days:
+            if streaks and (day - streaks[-1][1]).days == 1:
+                streaks[-1][1] = day
+            else:
+                streaks.append([day, day])
+        return [(first.isoformat(), last.isoformat(), (last - first).days + 1) for first, last in streaks]
+
+    def events(self, kind=None, start_day=None, end_day=None):
+        sql = "SELECT ts, kind, amount, detail FROM events WHERE 1 = 1"
+        params = []
+        if kind is not None:
+            sql += " AND kind = ?"
+            params.append(kind)
+        if start_day is not None:
+            sql += " AND day >= ?"
+            params.append(start_day)
+        if end_day is not None:
+            sql += " AND day <= ?"
+            params.append(end_day)
+        return self._query(sql + " ORDER BY id", params)
+
+    def rebuild_counters(self):
+        # Recomputes every counter from the event history, e.g. after fixing
+        # a bug in how events were interpreted
+        self.flush(self.flush_timeout)
+        conn = self._connect()
+        totals = {}
+        for kind, count, amount in conn.execute("SELECT kind, COUNT(*), SUM(amount) FROM events GROUP BY kind"):
+            for name, delta in COUNTER_UPDATES.get(kind, ()):
+                totals[name] = totals.get(name, 0) + (amount if delta == "amount" else count * delta)
+        for (detail,) in conn.execute("SELECT detail FROM events WHERE kind = ?", (IMPORT,)):
+            for name, value in json.loads(detail).get("counters", {}).items():
+                totals[name] = totals.get(name, 0) + value
+        with conn:
+            conn.execute("DELETE FROM counters")
+            conn.executemany("INSERT INTO counters (name, value) VALUES (?, ?)", totals.items())
+        conn.close()
+        with self._counters_lock:
+            self.counters = totals
+        return totals
+
+    def import_state(self, data, timestamp=None):
+        # One-shot migration of a gamification.json state dict. Its totals
+        # become an "import" event and seed the counters; later events add
+        # to them. Returns False if an import already happened.
+        if self.imported:
+            return False
+        self.flush(self.flush_timeout)
+        timestamp = time.time() if timestamp is None else timestamp
+        day, week = day_and_week(timestamp)
+        seeded = {"points": int(data.get("points", 0))}
+        conn = self._connect()
+        with conn:
+            conn.execute("INSERT INTO events (ts, day, week, kind, amount, detail) VALUES (?, ?, ?, ?, ?, ?)",
+                         (timestamp, day, week, IMPORT, 0,
+                          json.dumps({"counters": seeded, "state": data}, default=str)))
+            for name, value in seeded.items():
+                conn.execute("INSERT INTO counters (name, value) VALUES (?, ?) "
+                             "ON CONFLICT (name) DO UPDATE SET value = value + excluded.value", (name, value))
+            conn.execute("INSERT INTO meta (key, value) VALUES ('imported_json', ?)", (day,))
+        conn.close()
+        with self._counters_lock:
+            for name, value in seeded.items():
+                self.counters[name] = self.counters.get(name, 0) + value
+        self.imported = True
+        return True
+
+    def close(self):
+        self._pending.put(None)
+        self._writer.join(timeout=5)
+        with self._read_lock:
+            if self._read_conn is not None:
+                self._read_conn.close()
+                self._read_conn = None
+
+
+def main(argv):
+    # python ledger.py import gamification.json [ledger.db]
+    if len(argv) < 3 or argv[1] != "import":
+        print("usage: python ledger.py import <gamification.json> [ledger.db]")
+        return 2
+    with open(argv[2]) as f:
+        data = json.load(f)
+    ledger = Ledger(argv[3] if len(argv) > 3 else "ledger.db")
+    try:
+        imported = ledger.import_state(data)
+    finally:
+        ledger.close()
+    print("imported" if imported else "ledger already holds an import; nothing done")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -1,9 +1,104 @@
-from activity_monitor import ActivityMonitor
-from gamification import Gamification
-from ui_components import HealthAppUI
+import argparse
+import importlib
+import sys
+import time
 
-if __name__ == "__main__":
-    app = HealthAppUI(ActivityMonitor(None), Gamification())
-    app.monitor.app = app  # Set the app reference after initialization
+PROCESS_START = time.perf_counter()
+
+# Imported by the modules that need them, which should all happen after the
+# window is up; --profile-startup reports any that were loaded earlier
+HEAVY_MODULES = ("numpy", "PIL", "mss", "pynput", "win32gui", "psutil")
+APP_MODULES = ("config", "activity_monitor", "gamification", "ledger", "health_service", "ui_components")
+
+
+class StartupProfile:
+    # Times the import of each application module (including whatever it
+    # imports in turn) and the stages up to the first painted frame
+    def __init__(self):
+        self.imports = []
+        self.stages = []
+        self.heavy_before_first_frame = []
+        self._last = PROCESS_START
+
+    def import_modules(self, names):
+        modules = {}
+        for name in names:
+            started = time.perf_counter()
+            modules[name] = importlib.import_module(name)
+            self.imports.append((name, (time.perf_counter() - started) * 1000))
+        return modules
+
+    def stage(self, name):
+        now = time.perf_counter()
+        self.stages.append((name, (now - self._last) * 1000, (now - PROCESS_START) * 1000))
+        self._last = now
+        if name == "first_frame":
+            self.heavy_before_first_frame = [module for module in HEAVY_MODULES if module in sys.modules]
+
+    def report(self, stream=sys.stdout):
+        print("imports (ms, cumulative per module):", file=stream)
+        for name, ms in self.imports:
+            print(f"  {name:<24}{ms:9.1f}", file=stream)
+        print("stages (ms, stage / since start):", file=stream)
+        for name, ms, total in self.stages:
+            print(f"  {name:<24}{ms:9.1f}{total:9.1f}", file=stream)
+        loaded = ", ".join(self.heavy_before_first_frame) or "none"
+        print(f"heavy modules loaded before first frame: {loaded}", file=stream)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HealthGuard Pro")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="print an import and time-to-first-frame breakdown, then exit")
+    parser.add_argument("--connect", nargs="?", const="", metavar="SOCKET",
+                        help="run the window as a client of a running daemon.py instead of monitoring here")
+    args = parser.parse_args(argv)
+    try:
+        return run(args)
+    finally:
+        # Last, so the shutdown of every component still gets logged
+        from monitor_log import close_logger
+        close_logger()
+
+
+def run(args):
+    profile = StartupProfile()
+    if args.connect is not None:
+        modules = profile.import_modules(("daemon", "ui_components"))
+        profile.stage("imports")
+        monitor = None
+        service = modules["daemon"].RemoteService(args.connect or None)
+    else:
+        modules = profile.import_modules(APP_MODULES)
+        profile.stage("imports")
+        config = modules["config"]
+        ledger = modules["ledger"].Ledger(config.LEDGER_PATH) if config.LEDGER_PATH else None
+        gamification = modules["gamification"].Gamification(ledger=ledger)
+        monitor = modules["activity_monitor"].ActivityMonitor(None)
+        service = modules["health_service"].HealthService(monitor, gamification)
+    profile.stage("state_loaded")
+    app = modules["ui_components"].HealthAppUI(service)
     app.protocol("WM_DELETE_WINDOW", app.on_closing)
-    app.mainloop()
\ No newline at end of file
+    profile.stage("ui_built")
+    # Paint the first frame before any sensor (and its imports) gets going
+    app.update()
+    profile.stage("first_frame")
+    if monitor is not None:
+        monitor.start()
+        if config.METRICS_PORT:
+            from metrics import start_http_server
+            start_http_server(config.METRICS_PORT)
+        from profiling import install_signal_handler
+        install_signal_handler()
+    profile.stage("sensors_started")
+
+    if args.profile_startup:
+        profile.report()
+        app.on_closing()
+        return 0
+    app.mainloop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,273 @@
+import argparse
+import bisect
+import math
+import sys
+import threading
+import time
+
+# Seconds; suits everything from a sub-millisecond UI update to a slow capture
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# Recording is a plain attribute update with no lock. Each metric is written
+# from one thread in practice; where two threads share one, the GIL keeps it
+# consistent and the rare interleaving costs one lost increment, not a crash.
+class Counter:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+
+class Gauge:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds=DEFAULT_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # the last bucket is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def time(self):
+        return _Timer(self)
+
+
+class _Timer:
+    __slots__ = ("histogram", "started")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started)
+
+
+class Family:
+    # A named metric with one child per tuple of label values
+    def __init__(self, name, kind, help_text, labelnames, factory):
+        self.name = name
+        self.kind = kind
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.factory = factory
+        self.children = {}
+
+    def labels(self, *values):
+        child = self.children.get(values)
+        if child is None:
+            child = self.children.setdefault(values, self.factory())
+        return child
+
+
+class Registry:
+    # Metrics are created once (usually at import) and recorded into
+    # directly; callbacks read values that a component already keeps, such
+    # as its stats(), only when the registry is rendered.
+    def __init__(self):
+        self._families = {}
+        self._callbacks = {}
+        self._lock = threading.Lock()
+
+    def _family(self, name, kind, help_text, labelnames, factory):
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = self._families[name] = Family(name, kind, help_text, labelnames, factory)
+            elif family.kind != kind:
+                raise ValueError(f"Metric {name} already registered as a {family.kind}")
+        # Unlabelled metrics are used through their only child
+        return family if family.labelnames else family.labels()
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._family(name, "counter", help_text, labelnames, Counter)
+
+    def gauge(self, name, help_text, labelnames=()):
+        return self._family(name, "gauge", help_text, labelnames, Gauge)
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._family(name, "histogram", help_text, labelnames, lambda: Histogram(tuple(buckets)))
+
+    def callback(self, name, help_text, function, kind="gauge"):
+        # function() is called at render time; registering a name again
+        # replaces the previous callback (e.g. for a new monitor instance)
+        with self._lock:
+            self._callbacks[name] = (kind, help_text, function)
+
+    def render(self):
+        # Prometheus text exposition format 0.0.4
+        lines = []
+        with self._lock:
+            families = sorted(self._families.items())
+            callbacks = sorted(self._callbacks.items())
+        for name, family in families:
+            lines.append(f"# HELP {name} {_escape_help(family.help)}")
+            lines.append(f"# TYPE {name} {family.kind}")
+            for values, child in sorted(family.children.items()):
+                labels = list(zip(family.labelnames, values))
+                if family.kind == "histogram":
+                    cumulative = 0
+                    bounds = child.bounds + (math.inf,)
+                    for bound, count in zip(bounds, list(child.counts)):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_labels(labels + [('le', _number(bound))])} {cumulative}")
+                    lines.append(f"{name}_sum{_labels(labels)} {_number(child.sum)}")
+                    lines.append(f"{name}_count{_labels(labels)} {child.count}")
+                else:
+                    lines.append(f"{name}{_labels(labels)} {_number(child.value)}")
+        for name, (kind, help_text, function) in callbacks:
+            try:
+                value = function()
+            except Exception:
+                continue
+            if value is None:
+                continue
+            lines.append(f"# HELP {name} {_escape_help(help_text)}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape_help(text):
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+
+REGISTRY = Registry()
+
+
+def get_registry():
+    return REGISTRY
+
+
+def start_http_server(port, registry=REGISTRY):
+    # Serves GET /metrics on localhost only: the metrics describe this user's
+    # activity. http.server is imported here; it would add tens of
+    # milliseconds to every start otherwise.
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+def measure_recording_cost(calls=1_000_000):
+    # Per-call cost of the hot-path operations, in nanoseconds
+    registry = Registry()
+    counter = registry.counter("bench_total", "benchmark counter")
+    labelled = registry.counter("bench_labelled_total", "benchmark counter", ["source"])
+    histogram = registry.histogram("bench_seconds", "benchmark histogram")
+    results = {}
+    for name, record in (("counter_inc", lambda: counter.inc()),
+                         ("labelled_counter_inc", lambda: labelled.labels("keyboard").inc()),
+                         ("histogram_observe", lambda: histogram.observe(0.003)),
+                         ("baseline_call", lambda: None)):
+        started = time.perf_counter()
+        for _ in range(calls):
+            record()
+        results[name + "_ns"] = (time.perf_counter() - started) / calls * 1e9
+    return results
+
+
+def dump(url=None, socket_path=None):
+    # One-shot dump from a running instance: over HTTP when METRICS_PORT is
+    # set, otherwise through the daemon's socket
+    if url is None and socket_path is None:
+        from config import METRICS_PORT
+        if METRICS_PORT:
+            url = f"http://127.0.0.1:{METRICS_PORT}/metrics"
+    if url is not None:
+        from urllib.request import urlopen
+        with urlopen(url, timeout=5) as response:
+            return response.read().decode("utf-8")
+    from daemon import DaemonClient
+    client = DaemonClient(socket_path)
+    try:
+        return client.request("metrics")
+    finally:
+        client.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HealthGuard metrics")
+    parser.add_argument("command", choices=("dump", "bench"))
+    parser.add_argument("--url", help="metrics URL (default: http://127.0.0.1:METRICS_PORT/metrics)")
+    parser.add_argument("--socket", help="ask the daemon on this socket instead")
+    args = parser.parse_args(argv)
+    if args.command == "bench":
+        for name, value in measure_recording_cost().items():
+            print(f"{name}: {value:.1f}")
+        return 0
+    sys.stdout.write(dump(args.url, args.socket))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
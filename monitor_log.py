@@ -0,0 +1,173 @@
+import collections
+import sys
+import threading
+import time
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+OFF = 100
+LEVELS = {"debug": DEBUG, "info": INFO, "warning": WARNING, "error": ERROR, "off": OFF}
+LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARNING: "WARNING", ERROR: "ERROR"}
+REDACTED = "<redacted>"
+
+
+def _disabled(event, **fields):
+    pass
+
+
+class MonitorLogger:
+    # Structured logging for the monitoring hot paths. Producers append a
+    # tuple to a deque (atomic under the GIL, no lock taken); a background
+    # writer formats and writes records in batches. Disabled levels are
+    # rebound to a no-op, and `debug_enabled` lets call sites skip even that.
+    def __init__(self, level=INFO, stream=None, flush_interval=0.5, batch_size=256, max_queue=10000,
+                 sample_rates=None, rate_limits=None, redact_fields=("key",)):
+        self.stream = stream
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.sample_rates = dict(sample_rates or {})
+        self.rate_limits = dict(rate_limits or {})
+        self.redact_fields = frozenset(redact_fields)
+        self._records = collections.deque(maxlen=max_queue)
+        self._sample_counts = collections.Counter()
+        self._buckets = {}
+        self._wake = threading.Event()
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        self._closed = False
+
+        self.enqueued = 0
+        self.sampled_out = 0
+        self.rate_limited = 0
+        self.written = 0
+        self.set_level(level)
+
+    def set_level(self, level):
+        if isinstance(level, str):
+            level = LEVELS[level.lower()]
+        self.level = level
+        self.debug_enabled = level <= DEBUG
+        self.debug = self._logger_for(DEBUG)
+        self.info = self._logger_for(INFO)
+        self.warning = self._logger_for(WARNING)
+        self.error = self._logger_for(ERROR)
+
+    def _logger_for(self, level):
+        if level < self.level:
+            return _disabled
+        return lambda event, **fields: self.log(level, event, **fields)
+
+    def log(self, level, event, **fields):
+        if level < self.level or not self._admit(event):
+            return
+        self._records.append((time.time(), level, event, fields))
+        self.enqueued += 1
+        if self._writer is None:
+            self._start_writer()
+        elif len(self._records) >= self.batch_size:
+            self._wake.set()
+
+    def _admit(self, event):
+        every = self.sample_rates.get(event)
+        if every:
+            count = self._sample_counts[event]
+            self._sample_counts[event] = count + 1
+            if count % every:
+                self.sampled_out += 1
+                return False
+        limit = self.rate_limits.get(event)
+        if limit:
+            # Token bucket: `rate` records per second with bursts up to `burst`
+            rate, burst = limit
+            now = time.monotonic()
+            tokens, last = self._buckets.get(event, (burst, now))
+            tokens = min(burst, tokens + (now - last) * rate)
+            if tokens < 1:
+                self._buckets[event] = (tokens, now)
+                self.rate_limited += 1
+                return False
+            self._buckets[event] = (tokens - 1, now)
+        return True
+
+    def _start_writer(self):
+        with self._writer_lock:
+            if self._writer is None and not self._closed:
+                self._writer = threading.Thread(target=self._run_writer, name="log-writer", daemon=True)
+                self._writer.start()
+
+    def _run_writer(self):
+        idle_wait = self.flush_interval
+        while not self._closed:
+            self._wake.wait(idle_wait)
+            self._wake.clear()
+            written = self.flush()
+            # Back off while nothing is being logged so an idle app stays asleep
+            idle_wait = self.flush_interval if written else min(idle_wait * 2, 10.0)
+        self.flush()
+
+    def flush(self):
+        records = self._records
+        lines = []
+        while records and len(lines) < self.batch_size * 4:
+            lines.append(self.format(*records.popleft()))
+        if not lines:
+            return 0
+        stream = self.stream or sys.stdout
+        try:
+            stream.write("\n".join(lines) + "\n")
+            stream.flush()
+        except Exception:
+            pass
+        self.written += len(lines)
+        return len(lines)
+
+    def format(self, timestamp, level, event, fields):
+        stamp = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(timestamp))
+        parts = [f"{stamp}.{int(timestamp % 1 * 1000):03d}", LEVEL_NAMES.get(level, str(level)), event]
+        for name, value in fields.items():
+            if name in self.redact_fields:
+                value = REDACTED
+            elif isinstance(value, float):
+                value = f"{value:.1f}"
+            text = str(value)
+            if not text or " " in text or '"' in text or "=" in text:
+                text = '"' + text.replace("\\", "\\\\").replace('"', '\\"') + '"'
+            parts.append(f"{name}={text}")
+        return " ".join(parts)
+
+    def stats(self):
+        return {
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "queued": len(self._records),
+            "sampled_out": self.sampled_out,
+            "rate_limited": self.rate_limited,
+        }
+
+    def close(self):
+        self._closed = True
+        self._wake.set()
+        if self._writer is not None:
+            self._writer.join(timeout=2)
+        self.flush()
+
+
+_logger = None
+
+
+def get_logger():
+    global _logger
+    if _logger is None:
+        from config import LOG_LEVEL, LOG_SAMPLE_RATES, LOG_RATE_LIMITS, LOG_REDACT_FIELDS
+        _logger = MonitorLogger(LOG_LEVEL, sample_rates=LOG_SAMPLE_RATES, rate_limits=LOG_RATE_LIMITS,
+                                redact_fields=LOG_REDACT_FIELDS)
+    return _logger
+
+
+def close_logger():
+    # Flushes and stops the shared logger. Only the process entry points call
+    # this, after everything that logs through it has shut down.
+    if _logger is not None:
+        _logger.close()
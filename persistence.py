@@ -0,0 +1,145 @@
+import json
+import os
+import threading
+import time
+from metrics import REGISTRY
+from profiling import STAGES
+
+BACKUP_SUFFIX = ".bak"
+TEMP_SUFFIX = ".tmp"
+
+STATE_WRITE_SECONDS = REGISTRY.histogram("healthguard_state_write_seconds",
+                                         "Time to serialise and durably write a state file")
+
+
+def _fsync_directory(path):
+    # Makes the rename itself durable; not possible (or needed) on Windows
+    if os.name != "posix":
+        return
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def atomic_write(path, payload):
+    # Writes bytes so that `path` holds either the old or the new contents,
+    # never a mix. The previous version is kept as `path.bak`.
+    temp = path + TEMP_SUFFIX
+    with open(temp, "wb") as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    if os.path.exists(path):
+        os.replace(path, path + BACKUP_SUFFIX)
+    os.replace(temp, path)
+    _fsync_directory(path)
+
+
+def load_json(path, log=None):
+    # Returns (data, source) where source is "primary", "backup" or None when
+    # nothing usable exists. An unreadable primary file is moved aside rather
+    # than overwritten, so it can still be inspected.
+    for source, candidate in (("primary", path), ("backup", path + BACKUP_SUFFIX)):
+        try:
+            with open(candidate, "r") as f:
+                return json.load(f), source
+        except FileNotFoundError:
+            continue
+        except (OSError, ValueError) as e:
+            corrupt = f"{candidate}.corrupt-{int(time.time())}"
+            if log is not None:
+                log.warning("state_file_unreadable", path=candidate, error=str(e), moved_to=corrupt)
+            try:
+                os.replace(candidate, corrupt)
+            except OSError:
+                pass
+    return None, None
+
+
+class WriteBehindStore:
+    # Coalesces "state changed" notifications and writes the state from a
+    # background thread once it has been quiet for `debounce` seconds (or
+    # `max_delay` seconds after the first change, under constant churn).
+    # mark_dirty() only sets a flag, so callers never wait on the disk.
+    def __init__(self, path, snapshot, debounce=1.0, max_delay=10.0, log=None):
+        self.path = path
+        self.snapshot = snapshot
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.log = log
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._dirty_since = None
+        self._last_change = 0.0
+        self._closed = False
+        self._write_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="state-writer", daemon=True)
+        self._thread.start()
+
+        self.marks = 0
+        self.writes = 0
+        self.failures = 0
+
+    def mark_dirty(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._dirty_since is None:
+                self._dirty_since = now
+                self._changed.notify()
+            self._last_change = now
+            self.marks += 1
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while self._dirty_since is None and not self._closed:
+                    self._changed.wait()
+                if self._closed:
+                    return
+                # Debounce: wait for a quiet period, bounded by max_delay
+                while not self._closed:
+                    now = time.monotonic()
+                    due = min(self._last_change + self.debounce, self._dirty_since + self.max_delay)
+                    if now >= due:
+                        break
+                    self._changed.wait(due - now)
+                if self._closed:
+                    return
+            self.flush()
+
+    def flush(self):
+        # Writes the current state if anything changed since the last write
+        with self._write_lock:
+            with self._lock:
+                if self._dirty_since is None:
+                    return False
+                self._dirty_since = None
+            try:
+                started = time.perf_counter()
+                payload = json.dumps(self.snapshot()).encode("utf-8")
+                atomic_write(self.path, payload)
+                elapsed = time.perf_counter() - started
+                STATE_WRITE_SECONDS.observe(elapsed)
+                if STAGES.enabled:
+                    STAGES.record("gamification.write", elapsed)
+                self.writes += 1
+                return True
+            except Exception as e:
+                self.failures += 1
+                if self.log is not None:
+                    self.log.error("state_write_failed", path=self.path, error=str(e))
+                # Keep the change pending so the next flush retries it
+                self.mark_dirty()
+                return False
+
+    def stats(self):
+        return {"marks": self.marks, "writes": self.writes, "failures": self.failures}
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._changed.notify()
+        self._thread.join(timeout=2)
+        self.flush()
@@ -0,0 +1,299 @@
+import argparse
+import json
+import math
+import os
+import sys
+import threading
+import time
+from array import array
+from collections import Counter
+
+# 2**7 sub-buckets per power of two: values are kept to within 1/64 (1.6%)
+SUB_BUCKET_BITS = 7
+# Nanoseconds; anything slower than ~68 s lands in the last bucket (max stays exact)
+HIGHEST_SHIFT = 30
+
+
+class LatencyHistogram:
+    # HDR-style log-linear histogram of nanosecond durations: exact below
+    # 128 ns, then 64 equal buckets per power of two. Memory is fixed at
+    # 2048 counters however many values are recorded.
+    __slots__ = ("counts", "count", "total", "max")
+
+    SIZE = (HIGHEST_SHIFT + 2) << (SUB_BUCKET_BITS - 1)
+
+    def __init__(self):
+        self.counts = array("Q", bytes(8 * self.SIZE))
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    @staticmethod
+    def _index(value):
+        shift = value.bit_length() - SUB_BUCKET_BITS
+        if shift <= 0:
+            return value
+        if shift > HIGHEST_SHIFT:
+            return LatencyHistogram.SIZE - 1
+        return (shift << (SUB_BUCKET_BITS - 1)) + (value >> shift)
+
+    @staticmethod
+    def _highest_value(index):
+        # Largest value that maps to `index`
+        half = 1 << (SUB_BUCKET_BITS - 1)
+        shift = max(0, index // half - 1)
+        return ((index - (shift << (SUB_BUCKET_BITS - 1)) + 1) << shift) - 1
+
+    def record(self, nanoseconds):
+        value = max(0, int(nanoseconds))
+        self.counts[self._index(value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, percent):
+        if not self.count:
+            return 0
+        target = max(1, math.ceil(self.count * percent / 100))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                # The last bucket is open-ended; only the max is known there
+                if index == self.SIZE - 1:
+                    return self.max
+                return min(self._highest_value(index), self.max)
+        return self.max
+
+    def summary(self):
+        ms = 1e-6
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count * ms if self.count else 0.0,
+            "p50_ms": self.percentile(50) * ms,
+            "p90_ms": self.percentile(90) * ms,
+            "p99_ms": self.percentile(99) * ms,
+            "max_ms": self.max * ms,
+        }
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+NULL_TIMER = _NullTimer()
+
+
+class _StageTimer:
+    __slots__ = ("histogram", "started")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.record(time.perf_counter_ns() - self.started)
+
+
+class StageTimers:
+    # Per-stage latency histograms for the hot paths. Every call site checks
+    # `enabled` (or goes through time(), which hands out a shared no-op timer)
+    # before reading the clock, so switched off a stage costs one attribute
+    # test. Input callbacks are only wrapped when enabled at start-up.
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(name, LatencyHistogram())
+        return histogram
+
+    def record(self, name, seconds):
+        self.histogram(name).record(seconds * 1e9)
+
+    def time(self, name):
+        if not self.enabled:
+            return NULL_TIMER
+        return _StageTimer(self.histogram(name))
+
+    def wrap(self, name, function):
+        histogram = self.histogram(name)
+
+        def timed(*args):
+            started = time.perf_counter_ns()
+            try:
+                return function(*args)
+            finally:
+                histogram.record(time.perf_counter_ns() - started)
+        return timed
+
+    def report(self):
+        return {name: histogram.summary() for name, histogram in sorted(self.histograms.items())}
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {}
+
+
+def _enabled_from_config():
+    from config import PROFILE_STAGES
+    return bool(PROFILE_STAGES)
+
+
+STAGES = StageTimers(_enabled_from_config())
+
+
+class SamplingProfiler:
+    # Samples the stacks of every thread with sys._current_frames() from a
+    # background thread for a few seconds and writes them in the collapsed
+    # format flamegraph.pl and speedscope read ("thread;outer;...;inner N").
+    # Nothing runs between captures.
+    def __init__(self, directory, interval=0.005, log=None):
+        self.directory = directory
+        self.interval = interval
+        self.log = log
+        self._lock = threading.Lock()
+        self._thread = None
+        self.path = None
+        self.captures = 0
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, seconds=10.0):
+        # Returns the file the capture will be written to; a capture that is
+        # already running is reused rather than doubled up
+        with self._lock:
+            if self.running:
+                return self.path
+            os.makedirs(self.directory, exist_ok=True)
+            stamp = time.strftime("%Y%m%d-%H%M%S")
+            self.path = os.path.join(self.directory, f"profile-{os.getpid()}-{stamp}.folded")
+            self._thread = threading.Thread(target=self._capture, args=(self.path, seconds),
+                                            name="sampling-profiler", daemon=True)
+            self._thread.start()
+            return self.path
+
+    def wait(self, timeout=None):
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _capture(self, path, seconds):
+        own = threading.get_ident()
+        stacks = Counter()
+        samples = 0
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stacks[(names.get(ident, str(ident)),) + _stack(frame)] += 1
+            samples += 1
+            time.sleep(self.interval)
+        with open(path, "w") as f:
+            for stack, count in stacks.most_common():
+                f.write(";".join(stack) + f" {count}\n")
+        self.captures += 1
+        if self.log is not None:
+            self.log.info("profile_written", path=path, samples=samples, stacks=len(stacks))
+
+
+def _stack(frame):
+    # Outermost frame first, one entry per function rather than per line
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    frames.reverse()
+    return tuple(frames)
+
+
+_profiler = None
+
+
+def get_profiler():
+    global _profiler
+    if _profiler is None:
+        from config import PROFILE_DIR
+        from monitor_log import get_logger
+        _profiler = SamplingProfiler(PROFILE_DIR, log=get_logger())
+    return _profiler
+
+
+def install_signal_handler():
+    # SIGUSR1 starts a capture: kill -USR1 <pid>. Not available on Windows,
+    # where the daemon's "profile" command is the only trigger.
+    import signal
+    if not hasattr(signal, "SIGUSR1"):
+        return False
+    from config import PROFILE_SECONDS
+
+    def on_signal(signum, frame):
+        get_profiler().start(PROFILE_SECONDS)
+    signal.signal(signal.SIGUSR1, on_signal)
+    return True
+
+
+def measure_overhead(calls=1_000_000):
+    # Per-call cost of a stage switched off and on, in nanoseconds
+    results = {}
+    for enabled in (False, True):
+        timers = StageTimers(enabled)
+        label = "on" if enabled else "off"
+        started = time.perf_counter()
+        for _ in range(calls):
+            if timers.enabled:
+                timers.record("bench", 0.001)
+        results[f"guarded_record_{label}_ns"] = (time.perf_counter() - started) / calls * 1e9
+        started = time.perf_counter()
+        for _ in range(calls):
+            with timers.time("bench"):
+                pass
+        results[f"timer_{label}_ns"] = (time.perf_counter() - started) / calls * 1e9
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HealthGuard stage latencies and sampling profiles")
+    parser.add_argument("command", choices=("latency", "profile", "bench"))
+    parser.add_argument("--socket", help="daemon socket (default: config.DAEMON_SOCKET or the runtime dir)")
+    parser.add_argument("--seconds", type=float, help="length of a profile capture")
+    args = parser.parse_args(argv)
+    if args.command == "bench":
+        for name, value in measure_overhead().items():
+            print(f"{name}: {value:.1f}")
+        return 0
+    from daemon import DaemonClient
+    client = DaemonClient(args.socket)
+    try:
+        if args.command == "latency":
+            result = client.request("latency")
+        else:
+            arguments = {} if args.seconds is None else {"seconds": args.seconds}
+            result = client.request("profile", **arguments)
+    finally:
+        client.close()
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+import bisect
+import json
+from collections import namedtuple
+
+WINDOWS = ("day", "week", "all")
+# Gauges are observed values (the current streak) rather than running sums
+GAUGES = frozenset({"streak"})
+
+Rule = namedtuple("Rule", ["id", "title", "metric", "window", "target", "reward", "kind"])
+
+DEFAULT_RULES = [
+    {"id": "weekly_points", "title": "Earn 500 points", "metric": "points", "window": "week", "target": 500,
+     "reward": 100, "kind": "challenge"},
+    {"id": "weekly_breaks", "title": "Take 10 breaks", "metric": "breaks", "window": "week", "target": 10,
+     "reward": 50, "kind": "challenge"},
+    {"id": "first_break", "title": "First break", "metric": "breaks", "window": "all", "target": 1},
+    {"id": "breaks_100", "title": "100 breaks", "metric": "breaks", "window": "all", "target": 100, "reward": 50},
+    {"id": "breaks_1000", "title": "1000 breaks", "metric": "breaks", "window": "all", "target": 1000,
+     "reward": 250},
+    {"id": "busy_day", "title": "5 breaks in one day", "metric": "breaks", "window": "day", "target": 5,
+     "reward": 10},
+    {"id": "points_1000", "title": "1,000 points", "metric": "points", "window": "all", "target": 1000},
+    {"id": "points_10000", "title": "10,000 points", "metric": "points", "window": "all", "target": 10000},
+    {"id": "streak_3", "title": "3-day streak", "metric": "streak", "window": "all", "target": 3, "reward": 15},
+    {"id": "streak_7", "title": "7-day streak", "metric": "streak", "window": "all", "target": 7, "reward": 50},
+    {"id": "streak_30", "title": "30-day streak", "metric": "streak", "window": "all", "target": 30,
+     "reward": 200},
+]
+
+
+def compile_rules(definitions):
+    rules = []
+    seen = set()
+    for definition in definitions:
+        rule = Rule(definition["id"], definition.get("title", definition["id"]), definition["metric"],
+                    definition.get("window", "all"), int(definition["target"]), int(definition.get("reward", 0)),
+                    definition.get("kind", "achievement"))
+        if rule.id in seen:
+            raise ValueError(f"Duplicate rule id: {rule.id}")
+        if rule.window not in WINDOWS:
+            raise ValueError(f"Rule {rule.id}: unknown window {rule.window!r}")
+        if rule.metric in GAUGES and rule.window != "all":
+            raise ValueError(f"Rule {rule.id}: {rule.metric} is a gauge and only supports the 'all' window")
+        seen.add(rule.id)
+        rules.append(rule)
+    return rules
+
+
+def load_rules(path=None):
+    # The built-in catalog, or a JSON list of rule definitions
+    if path is None:
+        return compile_rules(DEFAULT_RULES)
+    with open(path) as f:
+        return compile_rules(json.load(f))
+
+
+class _RuleGroup:
+    # All rules on one (metric, window) counter, ordered by target. Counters
+    # only grow within a window, so the rules still to complete always start
+    # at `next`: an event checks one target unless it completes rules.
+    __slots__ = ("rules", "targets", "next")
+
+    def __init__(self, rules):
+        self.rules = sorted(rules, key=lambda rule: rule.target)
+        self.targets = [rule.target for rule in self.rules]
+        self.next = 0
+
+
+class RulesEngine:
+    # Evaluates a catalog of challenges and achievements incrementally. An
+    # index maps each metric to the groups of rules that read it, so an event
+    # touches only those groups, whatever the size of the catalog.
+    def __init__(self, rules, state=None):
+        self.rules = list(rules)
+        self.by_id = {rule.id: rule for rule in self.rules}
+        grouped = {}
+        for rule in self.rules:
+            grouped.setdefault((rule.metric, rule.window), []).append(rule)
+        self.groups = {key: _RuleGroup(rules) for key, rules in grouped.items()}
+        self.index = {}
+        for (metric, window), group in self.groups.items():
+            self.index.setdefault(metric, []).append((window, group))
+
+        self.counters = {key: 0 for key in self.groups}
+        self.completed = {}
+        self.window_keys = {}
+        # (metric, window) groups whose rules' progress changed since the last drain_changed()
+        self.changed = set(self.groups)
+        self.evaluations = 0
+        if state:
+            self.load_state(state)
+
+    def load_state(self, state):
+        for key, value in state.get("counters", {}).items():
+            metric, window = key.split("/")
+            if (metric, window) in self.counters:
+                self.counters[(metric, window)] = value
+        self.completed = {rule_id: when for rule_id, when in state.get("completed", {}).items()
+                          if rule_id in self.by_id}
+        self.window_keys = dict(state.get("windows", {}))
+        for key, group in self.groups.items():
+            group.next = bisect.bisect_right(group.targets, self.counters[key])
+        self.changed = set(self.groups)
+
+    def state(self):
+        return {
+            "counters": {f"{metric}/{window}": value for (metric, window), value in self.counters.items()},
+            "completed": dict(self.completed),
+            "windows": dict(self.window_keys),
+        }
+
+    def add(self, metric, amount=1, when=None, windows=WINDOWS):
+        # Adds to the counters for `metric` in `windows` (default: all of
+        # them); returns the rules completed by this event
+        completed = []
+        for window, group in self.index.get(metric, ()):
+            if window not in windows:
+                continue
+            key = (metric, window)
+            value = self.counters[key] + amount
+            self.counters[key] = value
+            self._advance(key, group, value, when, completed)
+        return completed
+
+    def observe(self, metric, value, when=None):
+        # Sets a gauge. Rules it has already completed stay completed when it drops.
+        completed = []
+        for window, group in self.index.get(metric, ()):
+            self.counters[(metric, window)] = value
+            self._advance((metric, window), group, value, when, completed)
+        return completed
+
+    def _advance(self, key, group, value, when, completed):
+        self.evaluations += 1
+        self.changed.add(key)
+        targets = group.targets
+        while group.next < len(targets) and value >= targets[group.next]:
+            rule = group.rules[group.next]
+            group.next += 1
+            if rule.id not in self.completed:
+                self.completed[rule.id] = when
+                completed.append(rule)
+
+    def roll(self, window, key):
+        # Starts a new window (e.g. a new day) when its key changes
+        if self.window_keys.get(window) != key:
+            self.window_keys[window] = key
+            self.reset_window(window)
+
+    def reset_window(self, window):
+        for (metric, group_window), group in self.groups.items():
+            if group_window != window:
+                continue
+            self.counters[(metric, group_window)] = 0
+            group.next = 0
+            for rule in group.rules:
+                self.completed.pop(rule.id, None)
+            self.changed.add((metric, group_window))
+
+    def progress(self, rule_id):
+        # (value, target, completed) with value capped at the target
+        rule = self.by_id[rule_id]
+        value = self.counters[(rule.metric, rule.window)]
+        completed = rule.id in self.completed
+        return (rule.target if completed else min(value, rule.target)), rule.target, completed
+
+    def catalog(self, kind=None):
+        return [(rule, *self.progress(rule.id)) for rule in self.rules if kind is None or rule.kind == kind]
+
+    def drain_changed(self):
+        # Rule ids whose progress or completion changed since the last call
+        changed, self.changed = self.changed, set()
+        return [rule.id for key in changed for rule in self.groups[key].rules]
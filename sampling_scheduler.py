@@ -0,0 +1,88 @@
+import time
+
+
+class SamplingScheduler:
+    # Decides when the screen thread should capture. Screen sampling only
+    # matters as the idle deadline approaches: before that, recent input
+    # already proves activity, and long after it an idle user rarely returns
+    # via the screen alone, so captures back off exponentially.
+    def __init__(self, idle_threshold, base_interval, min_interval=2.0, max_interval=300.0, now=time.time):
+        self.idle_threshold = idle_threshold
+        self.base_interval = base_interval
+        self.min_interval = min(min_interval, base_interval)
+        self.max_interval = max(max_interval, base_interval)
+        self.lead = min(base_interval, idle_threshold)
+        self.now = now
+
+        self.need_baseline = True
+        self.backoff_level = 0
+        self.next_idle_capture = 0.0
+
+        self.started = now()
+        self.captures = 0
+        self.baselines = 0
+        self.skipped_input = 0
+        self.skipped_state = 0
+        self.capture_cpu_seconds = 0.0
+
+    def next_action(self, last_activity, app_state="working", paused=False):
+        # Returns (mode, delay): mode is None (skip), "baseline" (capture a
+        # fresh reference frame) or "compare"; delay is how long to sleep
+        # before asking again.
+        now = self.now()
+        if paused or app_state == "breaking":
+            self.skipped_state += 1
+            self.need_baseline = True
+            self.backoff_level = 0
+            return None, self.base_interval
+
+        deadline_in = last_activity + self.idle_threshold - now
+        if deadline_in > self.lead:
+            # Anything the screen shows until the lead window opens was caused
+            # by input we already counted, so the next capture is a new baseline
+            self.skipped_input += 1
+            self.need_baseline = True
+            self.backoff_level = 0
+            return None, deadline_in - self.lead
+
+        if deadline_in > 0:
+            self.backoff_level = 0
+            self.next_idle_capture = 0.0
+            delay = min(max(deadline_in / 2, self.min_interval), self.base_interval)
+            return self._capture_mode(), delay
+
+        if now < self.next_idle_capture:
+            return None, min(self.next_idle_capture - now, self.base_interval)
+        self.backoff_level += 1
+        interval = min(self.base_interval * 2 ** self.backoff_level, self.max_interval)
+        self.next_idle_capture = now + interval
+        # Wake up at least every base interval so a returning user's idle
+        # deadline is noticed in time, even while captures are backed off
+        return self._capture_mode(), min(interval, self.base_interval)
+
+    def _capture_mode(self):
+        if self.need_baseline:
+            self.need_baseline = False
+            self.baselines += 1
+            return "baseline"
+        return "compare"
+
+    def record_capture(self, cpu_seconds):
+        self.captures += 1
+        self.capture_cpu_seconds += cpu_seconds
+
+    def stats(self):
+        elapsed = max(self.now() - self.started, 1e-9)
+        hours = elapsed / 3600
+        fixed_captures = elapsed / self.base_interval
+        mean_cpu = self.capture_cpu_seconds / self.captures if self.captures else 0.0
+        return {
+            "captures": self.captures,
+            "baselines": self.baselines,
+            "skipped_input": self.skipped_input,
+            "skipped_state": self.skipped_state,
+            "captures_per_hour": self.captures / hours,
+            "fixed_rate_captures_per_hour": fixed_captures / hours,
+            "capture_cpu_seconds": self.capture_cpu_seconds,
+            "cpu_seconds_saved": max(fixed_captures - self.captures, 0) * mean_cpu,
+        }
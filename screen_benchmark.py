@@ -0,0 +1,265 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+import numpy as np
+from change_detector import FrameDiffDetector, TemporalChangeDetector
+from profiling import STAGES, LatencyHistogram
+from screen_capture import ScreenCapture, select_monitors
+
+# Desktop layouts as (width, height) per monitor, placed left to right and
+# top-aligned the way mss reports a typical multi-monitor setup
+LAYOUTS = {
+    "1080p": [(1920, 1080)],
+    "1440p": [(2560, 1440)],
+    "4k": [(3840, 2160)],
+    "dual_1080p": [(1920, 1080), (1920, 1080)],
+    "4k+1440p": [(3840, 2160), (2560, 1440)],
+}
+PATTERNS = ("static", "cursor_blink", "scrolling", "video")
+STAGE_NAMES = (("grab", "screen.grab"), ("convert", "screen.convert"), ("diff", "screen.diff"))
+
+
+class FakeScreenshot:
+    # What ScreenCapture reads from an mss screenshot
+    __slots__ = ("raw", "width", "height")
+
+    def __init__(self, raw, width, height):
+        self.raw = raw
+        self.width = width
+        self.height = height
+
+
+class FakeScreen:
+    # Stands in for mss.mss(): a virtual desktop that advance() changes
+    # according to `pattern`. grab() copies the requested region into a new
+    # buffer, as mss does, so the copy is part of the measured grab.
+    def __init__(self, sizes, pattern="static", seed=0):
+        if pattern not in PATTERNS:
+            raise ValueError(f"Unknown change pattern: {pattern}")
+        self.pattern = pattern
+        self.monitors = [None]
+        left = 0
+        for width, height in sizes:
+            self.monitors.append({"left": left, "top": 0, "width": width, "height": height})
+            left += width
+        height = max(h for _, h in sizes)
+        self.monitors[0] = {"left": 0, "top": 0, "width": left, "height": height}
+        rng = np.random.default_rng(seed)
+        # A desktop-like frame: flat bands with some text-like noise
+        self.desktop = np.empty((height, left, 4), dtype=np.uint8)
+        self.desktop[:] = rng.integers(0, 256, size=(height // 40 + 1, 1, 4), dtype=np.uint8).repeat(40, 0)[:height]
+        text = rng.random((height, left)) < 0.05
+        self.desktop[text] = 20
+        primary = self.monitors[1]
+        self._rng = rng
+        self._scroll_step = 24
+        self._scroll_rows = rng.integers(0, 256, size=(self._scroll_step, primary["width"], 4), dtype=np.uint8)
+        # A player window covering the middle 3/4 of the primary monitor
+        video_h, video_w = primary["height"] * 3 // 4, primary["width"] * 3 // 4
+        top, left = (primary["height"] - video_h) // 2, (primary["width"] - video_w) // 2
+        self._video_box = (slice(top, top + video_h), slice(left, left + video_w))
+        # Video is smooth at thumbnail scale and never repeats: a fresh 12x16
+        # image per frame, scaled up to the video box
+        self._video_block = (video_h // 12, video_w // 16)
+        self._cursor = (slice(100, 120), slice(200, 202))
+        self._cursor_on = False
+        self.frame = 0
+
+    def advance(self):
+        self.frame += 1
+        pattern = self.pattern
+        if pattern == "cursor_blink":
+            self._cursor_on = not self._cursor_on
+            self.desktop[self._cursor] = 0 if self._cursor_on else 255
+        elif pattern == "scrolling":
+            step = self._scroll_step
+            width = self.monitors[1]["width"]
+            height = self.monitors[1]["height"]
+            self.desktop[:height - step, :width] = self.desktop[step:height, :width]
+            self.desktop[height - step:height, :width] = np.roll(self._scroll_rows, self.frame, axis=1)
+        elif pattern == "video":
+            block_h, block_w = self._video_block
+            small = self._rng.integers(0, 256, size=(12, 16, 4), dtype=np.uint8)
+            frame = small.repeat(block_h, 0).repeat(block_w, 1)
+            rows, cols = self._video_box
+            self.desktop[rows.start:rows.start + frame.shape[0], cols.start:cols.start + frame.shape[1]] = frame
+
+    def grab(self, region):
+        top, left = region["top"], region["left"]
+        width, height = region["width"], region["height"]
+        raw = bytearray(width * height * 4)
+        np.copyto(np.frombuffer(raw, dtype=np.uint8).reshape(height, width, 4),
+                  self.desktop[top:top + height, left:left + width])
+        return FakeScreenshot(raw, width, height)
+
+    def close(self):
+        pass
+
+
+def detector_factory(name):
+    from config import (SCREEN_THUMBNAIL_SIZE, SCREEN_TILE_GRID, SCREEN_CHANGE_THRESHOLD, SCREEN_HISTORY,
+                        SCREEN_MIN_THRESHOLD)
+    if name == "diff":
+        return lambda: FrameDiffDetector(SCREEN_THUMBNAIL_SIZE, SCREEN_TILE_GRID, SCREEN_CHANGE_THRESHOLD)
+    return lambda: TemporalChangeDetector(SCREEN_THUMBNAIL_SIZE, SCREEN_TILE_GRID, SCREEN_HISTORY,
+                                          SCREEN_CHANGE_THRESHOLD, SCREEN_MIN_THRESHOLD)
+
+
+def run_scenario(layout, pattern, frames=100, warmup=5, detector="temporal", memory_frames=10):
+    # One layout and change pattern through ScreenCapture, the code path
+    # ActivityMonitor.capture_screen runs. Stage latencies come from the
+    # profiling stage timers, switched on for the run; grab and total are
+    # per frame, convert and diff per monitor.
+    from config import SCREEN_THUMBNAIL_SIZE, SCREEN_ROW_STRIDE
+    sct = FakeScreen(LAYOUTS[layout], pattern)
+    capture = ScreenCapture(select_monitors(sct.monitors), SCREEN_THUMBNAIL_SIZE, SCREEN_ROW_STRIDE,
+                            detector_factory(detector))
+    for _ in range(warmup):
+        sct.advance()
+        capture.capture(sct)
+
+    enabled = STAGES.enabled
+    STAGES.enabled = True
+    STAGES.reset()
+    total = LatencyHistogram()
+    changed = 0
+    measured = 0.0
+    try:
+        for _ in range(frames):
+            sct.advance()
+            started = time.perf_counter_ns()
+            changes = capture.capture(sct)
+            elapsed = time.perf_counter_ns() - started
+            total.record(elapsed)
+            measured += elapsed
+            changed += any(change.changed for change in changes)
+        stages = {name: STAGES.histogram(stage).summary() for name, stage in STAGE_NAMES}
+    finally:
+        STAGES.enabled = enabled
+        STAGES.reset()
+    stages["total"] = total.summary()
+
+    # Peak memory in a separate pass, since tracing slows every allocation
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        for _ in range(memory_frames):
+            sct.advance()
+            capture.capture(sct)
+        peak = tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+
+    region = capture.region
+    seconds = measured / 1e9
+    return {
+        "layout": layout,
+        "pattern": pattern,
+        "detector": detector,
+        "monitors": len(capture.monitors),
+        "width": region["width"],
+        "height": region["height"],
+        "frames": frames,
+        "frames_with_change": changed,
+        "frames_per_second": frames / seconds if seconds else 0.0,
+        "megapixels_per_second": frames * region["width"] * region["height"] / 1e6 / seconds if seconds else 0.0,
+        "stages": stages,
+        "peak_memory_bytes": peak,
+        "buffer_bytes": capture.stats()["buffer_bytes"],
+    }
+
+
+def _git_commit():
+    try:
+        # From the repository this file lives in, wherever the benchmark is run from
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run_suite(layouts=tuple(LAYOUTS), patterns=PATTERNS, frames=100, detector="temporal"):
+    from config import SCREEN_THUMBNAIL_SIZE, SCREEN_ROW_STRIDE
+    results = [run_scenario(layout, pattern, frames, detector=detector) for layout in layouts for pattern in patterns]
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "thumbnail_size": SCREEN_THUMBNAIL_SIZE,
+            "row_stride": SCREEN_ROW_STRIDE,
+        },
+        "results": results,
+    }
+
+
+def compare(baseline, current, tolerance=None):
+    # Ratios of current to baseline per scenario (> 1 is slower); returns
+    # the lines to print and whether any p50 regressed past `tolerance`
+    previous = {(r["layout"], r["pattern"], r["detector"]): r for r in baseline["results"]}
+    lines = []
+    regressed = False
+    for result in current["results"]:
+        old = previous.get((result["layout"], result["pattern"], result["detector"]))
+        if old is None:
+            continue
+        ratio = result["stages"]["total"]["p50_ms"] / max(old["stages"]["total"]["p50_ms"], 1e-9)
+        memory = result["peak_memory_bytes"] / max(old["peak_memory_bytes"], 1)
+        flag = ""
+        if tolerance is not None and ratio > 1 + tolerance:
+            regressed = True
+            flag = "  REGRESSION"
+        lines.append(f"{result['layout']:<12}{result['pattern']:<14}p50 x{ratio:5.2f}  "
+                     f"peak memory x{memory:5.2f}{flag}")
+    return lines, regressed
+
+
+def format_table(report):
+    lines = [f"{'layout':<12}{'pattern':<14}{'fps':>8}{'MP/s':>9}{'grab p50':>10}{'conv p50':>10}"
+             f"{'diff p50':>10}{'p99':>9}{'max':>9}{'peak MB':>9}  (ms)"]
+    for r in report["results"]:
+        stages = r["stages"]
+        lines.append(f"{r['layout']:<12}{r['pattern']:<14}{r['frames_per_second']:8.1f}"
+                     f"{r['megapixels_per_second']:9.0f}{stages['grab']['p50_ms']:10.2f}"
+                     f"{stages['convert']['p50_ms']:10.3f}{stages['diff']['p50_ms']:10.3f}"
+                     f"{stages['total']['p99_ms']:9.2f}{stages['total']['max_ms']:9.2f}"
+                     f"{r['peak_memory_bytes'] / 2**20:9.1f}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the screen change detection pipeline on synthetic frames")
+    parser.add_argument("--layout", action="append", choices=tuple(LAYOUTS), help="repeatable; default: all")
+    parser.add_argument("--pattern", action="append", choices=PATTERNS, help="repeatable; default: all")
+    parser.add_argument("--detector", choices=("temporal", "diff"), default="temporal")
+    parser.add_argument("--frames", type=int, default=100, help="measured frames per scenario")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--compare", metavar="BASELINE", help="JSON from an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float,
+                        help="with --compare, exit 1 if a p50 is slower by more than this fraction")
+    args = parser.parse_args(argv)
+
+    report = run_suite(args.layout or tuple(LAYOUTS), args.pattern or PATTERNS, args.frames, args.detector)
+    print(format_table(report))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            lines, regressed = compare(json.load(f), report, args.tolerance)
+        print(f"\ncompared with {args.compare}:")
+        print("\n".join(lines))
+        return 1 if regressed else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,190 @@
+import time
+import tracemalloc
+from collections import namedtuple
+import numpy as np
+from change_detector import FrameDiffDetector
+from profiling import STAGES
+
+# ITU-R 601 luma weights, in the BGRA channel order mss hands us (alpha ignored)
+LUMA_WEIGHTS = np.array([0.114, 0.587, 0.299, 0.0], dtype=np.float32)
+
+
+def frame_view(screenshot):
+    # Zero-copy (height, width, 4) BGRA view over the mss buffer
+    return np.frombuffer(screenshot.raw, dtype=np.uint8).reshape(screenshot.height, screenshot.width, 4)
+
+
+class ThumbnailSampler:
+    def __init__(self, width, height, size=32, row_stride=1):
+        self.width = width
+        self.height = height
+        self.size = size
+        self.row_stride = max(1, int(row_stride))
+
+        # Only rows are skipped: keeping each row contiguous is what makes
+        # the reduction fast, so columns are always read in full.
+        stride = self.row_stride
+        block_h = max((height // size) // stride * stride, stride)
+        block_w = max(width // size, 1)
+        if block_h * size > height or block_w * size > width:
+            raise ValueError(f"Frame {width}x{height} is smaller than a {size}x{size} thumbnail")
+        self.block_h = block_h
+        self.block_w = block_w
+        # Remainder rows/columns are trimmed evenly from both edges
+        self.offset_y = (height - block_h * size) // 2
+        self.offset_x = (width - block_w * size) // 2
+        self.pixels_per_block = (block_h // stride) * block_w
+
+        # Block averaging runs in two passes over strided views: first collapse
+        # each block's rows (contiguous, vectorised), then each block's columns.
+        # uint16 is enough for the row pass unless blocks are very tall.
+        rows_dtype = np.uint16 if (block_h // stride) * 255 < 2 ** 16 else np.uint32
+        self._rows = np.zeros((size, size * block_w, 4), dtype=rows_dtype)
+        self._sums = np.zeros((size, size, 4), dtype=np.float32)
+        self._weights = LUMA_WEIGHTS / self.pixels_per_block
+
+    @property
+    def buffer_bytes(self):
+        return self._rows.nbytes + self._sums.nbytes
+
+    def region(self, frame):
+        stride = self.row_stride
+        return frame[self.offset_y:self.offset_y + self.block_h * self.size:stride,
+                     self.offset_x:self.offset_x + self.block_w * self.size]
+
+    def sample(self, frame, out):
+        size = self.size
+        region = self.region(frame)
+        np.add.reduce(region.reshape(size, self.block_h // self.row_stride, region.shape[1], 4),
+                      axis=1, dtype=self._rows.dtype, out=self._rows)
+        np.add.reduce(self._rows.reshape(size, size, self.block_w, 4),
+                      axis=2, dtype=np.float32, out=self._sums)
+        np.dot(self._sums, self._weights, out=out)
+        return out
+
+
+class ScreenSampler:
+    def __init__(self, size=32, row_stride=1):
+        self.size = size
+        self.row_stride = row_stride
+        self.sampler = None
+        self.thumbnail = np.zeros((size, size), dtype=np.float32)
+
+    @property
+    def buffer_bytes(self):
+        return self.thumbnail.nbytes + (self.sampler.buffer_bytes if self.sampler else 0)
+
+    def process(self, frame):
+        # Returns the thumbnail buffer, which is overwritten by the next call
+        height, width = frame.shape[:2]
+        if self.sampler is None or self.sampler.width != width or self.sampler.height != height:
+            self.sampler = ThumbnailSampler(width, height, self.size, self.row_stride)
+        return self.sampler.sample(frame, self.thumbnail)
+
+
+# `tiles` is the detector's own tile_scores buffer and is overwritten by the next sample
+MonitorChange = namedtuple("MonitorChange", ["monitor", "score", "changed", "tiles"])
+
+
+def select_monitors(monitors, indices=None):
+    # mss lists the union of all displays at index 0 and each display from index 1
+    available = range(1, len(monitors))
+    chosen = available if indices is None else [i for i in indices if i in available]
+    return [(i, monitors[i]) for i in chosen]
+
+
+def bounding_box(monitors):
+    left = min(m["left"] for m in monitors)
+    top = min(m["top"] for m in monitors)
+    right = max(m["left"] + m["width"] for m in monitors)
+    bottom = max(m["top"] + m["height"] for m in monitors)
+    return {"left": left, "top": top, "width": right - left, "height": bottom - top}
+
+
+class ScreenCapture:
+    # Grabs the bounding box of all selected monitors in one call and samples
+    # each monitor from a zero-copy slice of that single buffer. Each monitor
+    # gets its own change detector from `detector_factory`.
+    def __init__(self, monitors, size=32, row_stride=1, detector_factory=None, track_allocations=False):
+        if not monitors:
+            raise ValueError("No monitors selected for screen capture")
+        self.monitors = list(monitors)
+        self.region = bounding_box([m for _, m in self.monitors])
+        if detector_factory is None:
+            detector_factory = lambda: FrameDiffDetector(size)
+        self.samplers = [ScreenSampler(size, row_stride) for _ in self.monitors]
+        self.detectors = [detector_factory() for _ in self.monitors]
+        self._slices = []
+        for _, m in self.monitors:
+            top = m["top"] - self.region["top"]
+            left = m["left"] - self.region["left"]
+            self._slices.append((slice(top, top + m["height"]), slice(left, left + m["width"])))
+        self.track_allocations = track_allocations
+        self.last_changes = []
+
+        self.samples = 0
+        self.total_seconds = 0.0
+        self.last_grab_seconds = 0.0
+        self.last_process_seconds = 0.0
+        self.last_allocated_bytes = None
+        self.peak_allocated_bytes = 0
+
+    def reset(self):
+        # Forget the previous thumbnails so the next sample becomes a fresh baseline
+        for detector in self.detectors:
+            detector.reset()
+
+    def capture(self, sct, calibrate=True):
+        start = time.perf_counter()
+        screenshot = sct.grab(self.region)
+        self.last_grab_seconds = time.perf_counter() - start
+        self.total_seconds += self.last_grab_seconds
+        if STAGES.enabled:
+            STAGES.record("screen.grab", self.last_grab_seconds)
+        return self.process(frame_view(screenshot), calibrate)
+
+    def process(self, frame, calibrate=True):
+        # calibrate=False keeps the detectors from learning their noise floor
+        # from this sample, e.g. while the user is typing
+        tracing = self.track_allocations
+        if tracing:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+
+        changes = []
+        for (index, _), sampler, detector, (rows, cols) in zip(self.monitors, self.samplers, self.detectors,
+                                                               self._slices):
+            # Two clock reads are noise next to a sample; recording them is optional
+            convert_start = time.perf_counter()
+            thumbnail = sampler.process(frame[rows, cols])
+            diff_start = time.perf_counter()
+            score = detector.update(thumbnail, calibrate)
+            if STAGES.enabled:
+                STAGES.record("screen.convert", diff_start - convert_start)
+                STAGES.record("screen.diff", time.perf_counter() - diff_start)
+            changes.append(MonitorChange(index, score, detector.changed, detector.tile_scores))
+        self.last_changes = changes
+
+        self.last_process_seconds = time.perf_counter() - start
+        self.total_seconds += self.last_process_seconds
+        self.samples += 1
+        if tracing:
+            self.last_allocated_bytes = tracemalloc.get_traced_memory()[1] - baseline
+            self.peak_allocated_bytes = max(self.peak_allocated_bytes, self.last_allocated_bytes)
+        return changes
+
+    def stats(self):
+        return {
+            "monitors": [index for index, _ in self.monitors],
+            "samples": self.samples,
+            "last_grab_ms": self.last_grab_seconds * 1000,
+            "last_process_ms": self.last_process_seconds * 1000,
+            "mean_sample_ms": self.total_seconds / self.samples * 1000 if self.samples else 0.0,
+            "buffer_bytes": (sum(sampler.buffer_bytes for sampler in self.samplers) +
+                             sum(detector.buffer_bytes for detector in self.detectors)),
+            "last_allocated_bytes": self.last_allocated_bytes,
+            "peak_allocated_bytes": self.peak_allocated_bytes,
+        }
@@ -0,0 +1,120 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event, Thread
+from activity_monitor import SENSOR_ERRORS
+
+
+class AsyncSensorRuntime:
+    # Runs the window, screen and idle-timer work of an ActivityMonitor as
+    # tasks on one asyncio loop thread. Blocking screen captures go to a
+    # small bounded executor; results reach the UI through monitor.events.
+    #
+    # Threads: this replaces the window, screen and idle-poll threads with
+    # the loop thread plus one capture worker. Captures stay off the loop
+    # because an mss grab blocks for tens of milliseconds at 4K, which would
+    # hold up focus changes and the idle timer. The pynput listener threads
+    # belong to pynput; they go away only with a query-based IDLE_SOURCE.
+    def __init__(self, monitor, capture_workers=1):
+        self.monitor = monitor
+        self.capture_workers = capture_workers
+        self.loop = None
+        self.executor = None
+        self._thread = None
+        # Set by stop() from any thread, even before the loop exists
+        self._stop_requested = Event()
+        self._stopping = None
+
+    def start(self):
+        self._thread = Thread(target=self._run, name="sensor-loop", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_requested.set()
+        loop = self.loop
+        if loop is not None and not loop.is_closed():
+            try:
+                loop.call_soon_threadsafe(self._wake_for_stop)
+            except RuntimeError:
+                pass  # closed in the meantime
+
+    def _wake_for_stop(self):
+        # May run before _main has created the asyncio event; _main then
+        # sees _stop_requested instead
+        if self._stopping is not None:
+            self._stopping.set()
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self._main())
+        finally:
+            self.loop.close()
+
+    async def _main(self):
+        self._stopping = asyncio.Event()
+        if self._stop_requested.is_set():
+            self._stopping.set()
+        self.executor = ThreadPoolExecutor(max_workers=self.capture_workers, thread_name_prefix="capture")
+        tasks = [asyncio.create_task(self._sample_screen()), asyncio.create_task(self._idle_timer())]
+        if self.monitor.focus_backend is not None:
+            tasks.append(asyncio.create_task(self._watch_focus()))
+        if self.monitor.idle_poller is not None:
+            tasks.append(asyncio.create_task(self._poll_idle()))
+        await self._stopping.wait()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        # Captures must close their mss handles on the thread that opened them
+        await self.loop.run_in_executor(self.executor, self.monitor.close_screen_grabber)
+        self.executor.shutdown(wait=True)
+
+    async def _watch_focus(self):
+        changes = asyncio.Queue()
+        backend = self.monitor.focus_backend
+        backend.set_listener(lambda change: self.loop.call_soon_threadsafe(changes.put_nowait, change))
+        # The backend was started before this loop, so the window focused at
+        # start-up is waiting in its own queue
+        change = backend.wait_for_change(0)
+        while change is not None:
+            changes.put_nowait(change)
+            change = backend.wait_for_change(0)
+        while True:
+            change = await changes.get()
+            try:
+                self.monitor.handle_focus_change(change)
+            except Exception as e:
+                SENSOR_ERRORS.labels("window").inc()
+                self.monitor.log.error("window_monitor_error", error=str(e))
+
+    async def _sample_screen(self):
+        while True:
+            mode, delay = self.monitor.next_screen_action()
+            if mode is not None:
+                await self.loop.run_in_executor(self.executor, self.monitor.capture_screen, mode)
+            await asyncio.sleep(delay)
+
+    async def _poll_idle(self):
+        # Idle-time queries are a single syscall or X round trip, cheap enough
+        # to run on the loop itself
+        while True:
+            await asyncio.sleep(self.monitor.poll_idle_source())
+
+    async def _idle_timer(self):
+        # Tells the UI once per idle period that the idle deadline has passed
+        from config import IDLE_THRESHOLD
+        notified_for = None
+        while True:
+            self.monitor.wakeups += 1
+            last_activity = self.monitor.last_activity_time
+            deadline = last_activity + IDLE_THRESHOLD
+            now = self.monitor.clock.time()
+            if now < deadline:
+                await asyncio.sleep(deadline - now)
+                continue
+            if notified_for != last_activity:
+                notified_for = last_activity
+                self.monitor.events.put(("idle", last_activity))
+            # Input arrives on pynput threads, not on this loop, so re-check
+            # at the idle threshold's own granularity
+            await asyncio.sleep(IDLE_THRESHOLD)
@@ -0,0 +1,281 @@
+import threading
+import time
+from collections import deque
+from clock import SYSTEM_CLOCK
+
+WORKING = "working"
+BREAKING = "breaking"
+
+# Transitions returned by SessionEngine.update()
+BREAK_DUE = "break_due"
+BREAK_OVER = "break_over"
+
+# Deadlines are floats; a millisecond short of one still counts as reached
+EPSILON = 1e-3
+
+
+class SessionEngine:
+    # The work/break state machine, without Tk. Active time is integrated
+    # over time rather than counted in ticks: every input opens an engaged
+    # interval [t, t + idle_threshold), overlapping intervals merge, and
+    # active time grows inside them and drains at the same rate outside, as
+    # the old once-a-second counter did. How often update() is called only
+    # changes how soon a transition is noticed, never the totals.
+    #
+    # Everything runs on a time line made of the monotonic clock plus any
+    # suspend it did not see (CLOCK_MONOTONIC stops while Linux sleeps), so a
+    # sleeping machine counts as time away from the keyboard. Suspends are
+    # measured against CLOCK_BOOTTIME, which wall-clock adjustments never
+    # move. Without it they are inferred from the wall clock, and there a
+    # forward step larger than suspend_threshold also counts as a suspend.
+    def __init__(self, work_seconds, break_seconds, idle_threshold=30, clock=SYSTEM_CLOCK,
+                 suspend_threshold=5.0, history=86400):
+        self.clock = clock
+        self.work_seconds = work_seconds
+        self.break_seconds = break_seconds
+        self.idle_threshold = idle_threshold
+        self.suspend_threshold = suspend_threshold
+        self.history = history
+        self._lock = threading.RLock()
+        self._mono = clock.monotonic()
+        self._boot = clock.boottime()
+        self._wall = clock.time()
+        self.suspended = 0.0
+        self.suspends = 0
+
+        now = self._mono
+        self.state = WORKING
+        self.paused = False
+        self.active = 0.0
+        self._anchor = now  # self.active is exact as of this instant
+        self.snooze_until = now
+        self.break_started = None
+        # Like the old loop, start as if input had just been seen
+        self.last_activity = now
+        self.intervals = deque([[now, now + idle_threshold]])  # merged engaged intervals, oldest first
+
+        self.activity_events = 0
+        self.updates = 0
+
+    def now(self):
+        # The current position on the time line
+        with self._lock:
+            mono, boot, wall = self.clock.monotonic(), self.clock.boottime(), self.clock.time()
+            if boot is not None and self._boot is not None:
+                jump = (boot - self._boot) - (mono - self._mono)
+            else:
+                jump = (wall - self._wall) - (mono - self._mono)
+            if jump > self.suspend_threshold:
+                # Boot time (or the wall clock) moved on while the monotonic
+                # clock stood still
+                self.suspended += jump
+                self.suspends += 1
+            self._mono, self._boot, self._wall = mono, boot, wall
+            return mono + self.suspended
+
+    def _advance(self, to):
+        # Integrates active time from the anchor up to `to`
+        start = self._anchor
+        if to <= start:
+            return
+        self._anchor = to
+        if self.paused or self.state != WORKING:
+            return
+        start = max(start, self.snooze_until)
+        if to <= start:
+            return
+        engaged_until = self.last_activity + self.idle_threshold
+        if engaged_until > start:
+            engaged = min(to, engaged_until) - start
+            self.active += engaged
+            start += engaged
+        if to > start:
+            self.active = max(0.0, self.active - (to - start))
+
+    def _engage(self, t):
+        self.last_activity = t
+        end = t + self.idle_threshold
+        intervals = self.intervals
+        if intervals and intervals[-1][1] >= t:
+            intervals[-1][1] = max(intervals[-1][1], end)
+        else:
+            intervals.append([t, end])
+            while intervals[0][1] < t - self.history:
+                intervals.popleft()
+
+    def record_activity(self, timestamp=None):
+        # Input at wall-clock `timestamp` (default: now). Safe to call from
+        # the input threads.
+        with self._lock:
+            now = self.now()
+            t = now if timestamp is None else now - max(0.0, self._wall - timestamp)
+            if t <= self.last_activity:
+                return
+            # Settle the time before the input with the previous engagement
+            self._advance(t)
+            self._engage(t)
+            self.activity_events += 1
+
+    def update(self):
+        # Brings the state up to now and returns the transitions that are due
+        with self._lock:
+            now = self.now()
+            self._advance(now)
+            self.updates += 1
+            if self.paused:
+                return []
+            if self.state == WORKING and self.active >= self.work_seconds - EPSILON:
+                return [BREAK_DUE]
+            if self.state == BREAKING and now - self.break_started >= self.break_seconds - EPSILON:
+                return [BREAK_OVER]
+            return []
+
+    def next_deadline(self):
+        # Time-line instant of the next transition if no input or button
+        # press arrives first; None when nothing will happen on its own
+        with self._lock:
+            if self.paused:
+                return None
+            if self.state == BREAKING:
+                return self.break_started + self.break_seconds
+            start = max(self._anchor, self.snooze_until)
+            if self.active >= self.work_seconds - EPSILON:
+                return start
+            due = start + (self.work_seconds - self.active)
+            return due if due <= self.last_activity + self.idle_threshold else None
+
+    def seconds_until_deadline(self):
+        deadline = self.next_deadline()
+        return None if deadline is None else max(0.0, deadline - self.now())
+
+    def start_break(self):
+        with self._lock:
+            now = self.now()
+            self._advance(now)
+            self.state = BREAKING
+            self.break_started = now
+            self.active = 0.0
+
+    def end_break(self):
+        # Back to work, paused until the user confirms they are back
+        with self._lock:
+            now = self.now()
+            self._advance(now)
+            self.state = WORKING
+            self.break_started = None
+            self.active = 0.0
+            self.paused = True
+            self._engage(max(now, self.last_activity))
+
+    def snooze(self, seconds):
+        with self._lock:
+            now = self.now()
+            self._advance(now)
+            self.active = 0.0
+            self.snooze_until = now + seconds
+
+    def set_paused(self, paused):
+        with self._lock:
+            self._advance(self.now())
+            self.paused = paused
+
+    def set_durations(self, work_seconds, break_seconds):
+        # New settings restart the timer of the current phase
+        with self._lock:
+            now = self.now()
+            self._advance(now)
+            self.work_seconds = work_seconds
+            self.break_seconds = break_seconds
+            if self.state == WORKING:
+                self.active = 0.0
+                self._engage(max(now, self.last_activity))
+            else:
+                self.break_started = now
+
+    def snapshot(self):
+        # The state with every instant given relative to now, so that
+        # load_snapshot() can rebuild it on another process's clock
+        with self._lock:
+            now = self.now()
+            self._advance(now)
+            return {
+                "state": self.state,
+                "paused": self.paused,
+                "active": self.active,
+                "work_seconds": self.work_seconds,
+                "break_seconds": self.break_seconds,
+                "idle_threshold": self.idle_threshold,
+                "engaged_for": self.last_activity + self.idle_threshold - now,
+                "snoozed_for": max(0.0, self.snooze_until - now),
+                "break_elapsed": None if self.break_started is None else now - self.break_started,
+            }
+
+    def load_snapshot(self, snapshot):
+        with self._lock:
+            now = self.now()
+            self._anchor = now
+            self.state = snapshot["state"]
+            self.paused = snapshot["paused"]
+            self.active = snapshot["active"]
+            self.work_seconds = snapshot["work_seconds"]
+            self.break_seconds = snapshot["break_seconds"]
+            self.idle_threshold = snapshot["idle_threshold"]
+            self.last_activity = now + snapshot["engaged_for"] - self.idle_threshold
+            self.snooze_until = now + snapshot["snoozed_for"]
+            elapsed = snapshot["break_elapsed"]
+            self.break_started = None if elapsed is None else now - elapsed
+
+    def work_remaining(self):
+        return max(self.work_seconds - self.active, 0.0)
+
+    def break_elapsed(self):
+        if self.break_started is None:
+            return 0.0
+        return max(self._anchor - self.break_started, 0.0)
+
+    def engaged_seconds(self, window=3600):
+        # Time covered by engaged intervals in the last `window` seconds
+        with self._lock:
+            now = self.now()
+            since = now - window
+            return sum(max(0.0, min(end, now) - max(start, since)) for start, end in self.intervals)
+
+    def stats(self):
+        return {
+            "state": self.state,
+            "paused": self.paused,
+            "active_seconds": self.active,
+            "activity_events": self.activity_events,
+            "updates": self.updates,
+            "intervals": len(self.intervals),
+            "suspends": self.suspends,
+            "suspended_seconds": self.suspended,
+        }
+
+
+def benchmark(events=1_000_000, input_every=2.0):
+    # Feeds input and updates straight into an engine on a virtual clock;
+    # returns the cost per call
+    from clock import VirtualClock
+    clock = VirtualClock()
+    engine = SessionEngine(25 * 60, 5 * 60, clock=clock)
+    breaks = 0
+    started = time.perf_counter()
+    for i in range(events):
+        clock.advance(input_every if i % 500 else 120.0)
+        engine.record_activity()
+        for transition in engine.update():
+            if transition == BREAK_DUE:
+                engine.start_break()
+                breaks += 1
+            elif transition == BREAK_OVER:
+                engine.end_break()
+                engine.set_paused(False)
+    elapsed = time.perf_counter() - started
+    return {"events": events, "breaks": breaks, "ns_per_event": elapsed / events * 1e9,
+            "simulated_hours": clock.monotonic() / 3600}
+
+
+if __name__ == "__main__":
+    for name, value in benchmark().items():
+        print(f"{name}: {value:.1f}" if isinstance(value, float) else f"{name}: {value}")
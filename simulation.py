@@ -0,0 +1,270 @@
+import argparse
+import datetime
+import math
+import os
+import random
+import tempfile
+import time
+from audio import AudioPlayer, NullBackend
+from clock import VirtualClock
+from config import DEFAULT_WORK_MINUTES, DEFAULT_BREAK_MINUTES, IDLE_THRESHOLD
+from gamification import Gamification
+from focus_time import FocusTimeTracker
+from health_service import HealthService
+from ledger import Ledger
+from ui_components import HealthAppUI
+
+
+class NullWidget:
+    # Stands in for labels, buttons and the progress bar; keeps the last options
+    __slots__ = ("options",)
+
+    def __init__(self):
+        self.options = {}
+
+    def config(self, **options):
+        self.options.update(options)
+
+    configure = config
+
+    def __setitem__(self, key, value):
+        self.options[key] = value
+
+    def __getitem__(self, key):
+        return self.options.get(key)
+
+    def winfo_exists(self):
+        return False
+
+    def destroy(self):
+        pass
+
+
+class SimpleVar:
+    def __init__(self, value):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+
+class SimulatedMonitor:
+    # The parts of ActivityMonitor the service talks to, without sensors
+    def __init__(self, clock):
+        self.clock = clock
+        self.app = None
+        self.last_activity_time = clock.time()
+        self.activity_listener = None
+        self.focus_time = FocusTimeTracker(now=clock.time)
+        self.recorded = []
+
+    def on_activity(self, source=None, value=0, timestamp=None):
+        if not self.app.paused:
+            self.last_activity_time = now = self.clock.time() if timestamp is None else timestamp
+            if self.activity_listener is not None:
+                self.activity_listener(now)
+
+    def record_event(self, kind, value=0):
+        self.recorded.append((self.clock.time(), kind))
+
+    def drain_events(self):
+        return []
+
+    def stop(self):
+        pass
+
+
+class HeadlessHealthApp(HealthAppUI):
+    # Runs HealthAppUI's real state machine without creating a Tk interpreter.
+    # `tk = None` keeps tkinter.Tk.__getattr__ from recursing on attributes
+    # that only exist on a real window.
+    tk = None
+    WIDGETS = ("time_label", "date_label", "time_active_label", "next_break_label", "current_status_label",
+               "progress_bar", "progress_label", "pause_button", "points_label", "streak_label",
+               "current_window_label")
+
+    def __init__(self, service, clock):
+        self.init_state(service, clock)
+        self.work_interval = SimpleVar(service.work_minutes)
+        self.break_duration = SimpleVar(service.break_minutes)
+        for name in self.WIDGETS:
+            setattr(self, name, NullWidget())
+        self.rule_labels = {}
+        self.rule_rows = set()
+        self.audio = AudioPlayer(NullBackend())
+        self.alerts = []
+        self.continue_shown_at = None
+
+    def after(self, ms, callback):
+        pass
+
+    def notify(self, title, message):
+        self.alerts.append((self.clock.time(), title))
+
+    def show_break_alert(self):
+        self.alerts.append((self.clock.time(), "Break Time!"))
+
+    def show_continue_alert(self):
+        self.alerts.append((self.clock.time(), "Continue Working"))
+        self.continue_shown_at = self.clock.time()
+
+
+def synthetic_trace(start, days=7, seed=0, workday=(9, 17), input_every=5.0):
+    # A weekday office pattern: input every few seconds during working hours,
+    # reading pauses now and then, and a lunch hour without input
+    rng = random.Random(seed)
+    first_day = datetime.date.fromtimestamp(start)
+    for offset in range(days):
+        day = first_day + datetime.timedelta(days=offset)
+        if day.weekday() >= 5:
+            continue
+        midnight = datetime.datetime.combine(day, datetime.time()).timestamp()
+        t = midnight + workday[0] * 3600 + rng.uniform(0, 900)
+        end = midnight + workday[1] * 3600
+        lunch_start, lunch_end = midnight + 12 * 3600, midnight + 13 * 3600
+        while t < end:
+            if lunch_start <= t < lunch_end:
+                t = lunch_end + rng.uniform(0, 300)
+                continue
+            if t >= start:
+                yield t, "input"
+            gap = rng.expovariate(1 / input_every)
+            if rng.random() < 0.005:
+                gap += rng.uniform(IDLE_THRESHOLD, 600)
+            t += gap
+
+
+def load_trace(activity_log_dir, start=None, end=None):
+    # Replays a recorded ActivityLog: input, window and screen events become
+    # input, recorded pauses and resumes become button presses
+    from activity_log import ActivityLog, EVENT_KINDS
+    actions = {EVENT_KINDS["keyboard"]: "input", EVENT_KINDS["mouse"]: "input", EVENT_KINDS["input"]: "input",
+               EVENT_KINDS["window"]: "input", EVENT_KINDS["screen"]: "input", EVENT_KINDS["pause"]: "pause",
+               EVENT_KINDS["resume"]: "resume"}
+    log = ActivityLog(activity_log_dir)
+    for records in log.read(start, end):
+        for timestamp, kind in zip(records["time"].tolist(), records["kind"].tolist()):
+            if kind in actions:
+                yield timestamp, actions[kind]
+
+
+class Simulation:
+    def __init__(self, trace, days=7, start=None, work_minutes=DEFAULT_WORK_MINUTES,
+                 break_minutes=DEFAULT_BREAK_MINUTES, continue_delay=60, data_dir=None):
+        self.clock = VirtualClock(start)
+        self.start = self.clock.time()
+        self.end = self.start + days * 86400
+        self.trace = trace
+        self.continue_delay = continue_delay
+        self._temp_dir = None
+        if data_dir is None:
+            self._temp_dir = tempfile.TemporaryDirectory()
+            data_dir = self._temp_dir.name
+        self.monitor = SimulatedMonitor(self.clock)
+        self.ledger = Ledger(os.path.join(data_dir, "ledger.db"))
+        self.gamification = Gamification(os.path.join(data_dir, "gamification.json"), clock=self.clock,
+                                         ledger=self.ledger)
+        self.service = HealthService(self.monitor, self.gamification, self.clock, work_minutes, break_minutes)
+        self.app = HeadlessHealthApp(self.service, self.clock)
+        self.ticks = 0
+        self.events_replayed = 0
+
+    def apply(self, timestamp, action):
+        app = self.app
+        if action == "input":
+            self.monitor.on_activity("keyboard", timestamp=timestamp)
+        elif action == "pause" and not app.paused or action == "resume" and app.paused:
+            app.toggle_pause()
+        elif action == "snooze":
+            app.snooze_alert()
+        elif action == "break_now" and app.app_state == "working":
+            app.trigger_break()
+        elif action == "end_break" and app.app_state == "breaking":
+            app.end_break()
+        self.events_replayed += 1
+
+    def run(self):
+        # Nothing changes between trace events except what the session engine
+        # schedules, so time jumps from one to the next instead of ticking
+        started = time.perf_counter()
+        clock, app, session = self.clock, self.app, self.app.session
+        events = iter(sorted(self.trace))
+        pending = next(events, None)
+        while True:
+            now = clock.time()
+            wake = pending[0] if pending is not None else self.end
+            until_deadline = session.seconds_until_deadline()
+            if until_deadline is not None:
+                wake = min(wake, now + until_deadline)
+            if app.continue_shown_at is not None:
+                wake = min(wake, app.continue_shown_at + self.continue_delay)
+            if wake >= self.end:
+                break
+            clock.advance_to(wake)
+            while pending is not None and pending[0] <= wake:
+                self.apply(*pending)
+                pending = next(events, None)
+            if app.continue_shown_at is not None and wake >= app.continue_shown_at + self.continue_delay:
+                app.continue_shown_at = None
+                if app.paused:
+                    app.toggle_pause()
+            app.tick()
+            self.ticks += 1
+        return self.summary(time.perf_counter() - started)
+
+    def summary(self, wall_seconds):
+        data = self.gamification.data
+        return {
+            "simulated_days": (self.end - self.start) / 86400,
+            "wall_seconds": wall_seconds,
+            "ticks": self.ticks,
+            "session_updates": self.app.session.updates,
+            "events_replayed": self.events_replayed,
+            "breaks": sum(1 for _, title in self.app.alerts if title == "Break Time!"),
+            "points": data["points"],
+            "current_streak": data["current_streak"],
+            "ledger_points": self.ledger.counter("points"),
+            "ledger_breaks": self.ledger.counter("breaks"),
+            "weekly_breaks_progress": self.gamification.rules.progress("weekly_breaks")[0],
+            "weekly_points_progress": self.gamification.rules.progress("weekly_points")[0],
+            "achievements": sum(1 for rule, _, _, completed in self.gamification.rules.catalog("achievement")
+                                if completed),
+        }
+
+    def close(self):
+        self.app.audio.close()
+        self.gamification.close()
+        if self._temp_dir is not None:
+            self._temp_dir.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay an input trace through the HealthGuard state machine")
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--activity-log", help="replay a recorded activity log directory instead of a synthetic week")
+    parser.add_argument("--work-minutes", type=int, default=DEFAULT_WORK_MINUTES)
+    parser.add_argument("--break-minutes", type=int, default=DEFAULT_BREAK_MINUTES)
+    args = parser.parse_args()
+
+    start = None
+    if args.activity_log:
+        trace = list(load_trace(args.activity_log))
+        start = math.floor(trace[0][0]) if trace else None
+    clock_start = VirtualClock(start).time()
+    if not args.activity_log:
+        trace = list(synthetic_trace(clock_start, args.days, args.seed))
+    simulation = Simulation(trace, args.days, clock_start, args.work_minutes, args.break_minutes)
+    try:
+        result = simulation.run()
+    finally:
+        simulation.close()
+    for name, value in result.items():
+        print(f"{name}: {value:.3f}" if isinstance(value, float) else f"{name}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import os
+
+import numpy as np
+import pytest
+from activity_log import ActivityLog, KEYBOARD, MOUSE, INPUT
+
+DAY = 86400.0
+START = 1_700_000_000.0
+
+
+@pytest.fixture
+def directory(tmp_path):
+    return str(tmp_path / "activity")
+
+
+def times(log, start=None, end=None):
+    return [float(t) for records in log.read(start, end) for t in records["time"]]
+
+
+def test_late_timestamps_are_clamped_so_reads_stay_sorted(directory):
+    log = ActivityLog(directory)
+    for offset in (0, 10, 5, 20, 15, 30):
+        log.append(KEYBOARD, timestamp=START + offset)
+    assert times(log) == [START, START + 10, START + 10, START + 20, START + 20, START + 30]
+    # Range lookups rely on that order
+    assert times(log, START + 10, START + 30) == [START + 10, START + 10, START + 20, START + 20]
+    log.close()
+
+
+def test_segments_roll_by_count_and_age(directory):
+    log = ActivityLog(directory, segment_records=4, segment_seconds=100)
+    for i in range(10):
+        log.append(MOUSE, value=i, timestamp=START + i)
+    log.append(MOUSE, timestamp=START + 500)
+    assert len(log.segments()) == 4
+    assert [int(v) for records in log.read() for v in records["value"]] == list(range(10)) + [0]
+    log.close()
+
+
+def test_reopened_log_keeps_its_records_and_order(directory):
+    log = ActivityLog(directory)
+    log.append(KEYBOARD, timestamp=START + 50)
+    log.append(INPUT, value=7, timestamp=START + 60)
+    log.close()
+
+    reopened = ActivityLog(directory)
+    assert times(reopened) == [START + 50, START + 60]
+    # A wall clock that went back across the restart is clamped too
+    reopened.append(KEYBOARD, timestamp=START + 40)
+    assert times(reopened) == [START + 50, START + 60, START + 60]
+    reopened.close()
+
+
+def test_reopen_ignores_a_torn_last_record(directory):
+    log = ActivityLog(directory)
+    log.append(KEYBOARD, timestamp=START)
+    log.close()
+    path = log.segments()[-1][1]
+    with open(path, "ab") as f:
+        f.write(b"\x01\x02\x03")
+    reopened = ActivityLog(directory)
+    assert times(reopened) == [START]
+    reopened.close()
+
+
+def test_compaction_keeps_minute_counts(directory):
+    log = ActivityLog(directory, segment_seconds=DAY, raw_retention=DAY)
+    for day in range(3):
+        for i in range(90):
+            log.append(KEYBOARD, timestamp=START + day * DAY + i * 2)
+    end = START + 2 * DAY + 600
+    before = log.minute_counts(KEYBOARD, START, end)
+    assert log.compact(now=START + 2 * DAY + 10) == 1
+    assert len(log.segments()) == 2
+    assert np.array_equal(log.minute_counts(KEYBOARD, START, end), before)
+    assert int(before.sum()) == 270
+    log.close()
+
+
+def test_failed_removal_after_compaction_is_not_counted_twice(directory, monkeypatch):
+    log = ActivityLog(directory, segment_seconds=DAY, raw_retention=DAY)
+    for day in range(3):
+        log.append(KEYBOARD, timestamp=START + day * DAY)
+    end = START + 3 * DAY
+
+    def failing_remove(path):
+        raise PermissionError(path)
+    with monkeypatch.context() as patch:
+        patch.setattr(os, "remove", failing_remove)
+        assert log.compact(now=START + 3 * DAY) == 2
+    # Both raw files are still there, but reads skip them
+    assert len(log._files("segment-")) == 3
+    assert int(log.minute_counts(KEYBOARD, START, end).sum()) == 3
+    assert times(log) == [START + 2 * DAY]
+
+    # The next compaction finishes the removal
+    assert log.compact(now=START + 3 * DAY) == 0
+    assert len(log._files("segment-")) == 1
+    assert int(log.minute_counts(KEYBOARD, START, end).sum()) == 3
+    log.close()
@@ -0,0 +1,153 @@
+import threading
+
+from audio import AudioBackend, AudioPlayer, NullBackend, Sound
+
+TIMEOUT = 5.0
+
+
+class FakeCache:
+    # Sounds without files; loading a path in `gates` waits until its event is set
+    def __init__(self, gates=None):
+        self.gates = gates or {}
+        self.loading = {path: threading.Event() for path in self.gates}
+        self.loads = 0
+        self.load_ms = 0.0
+
+    def get(self, path):
+        if path in self.gates:
+            self.loading[path].set()
+            self.gates[path].wait(TIMEOUT)
+        self.loads += 1
+        return Sound(path, b"", 1.0)
+
+
+class BlockingBackend(AudioBackend):
+    # Each sound plays until stop() reaches it or finish() ends it
+    name = "blocking"
+
+    def __init__(self):
+        super().__init__()
+        self.started = []
+        self.halted = []
+        self.events = {}
+        self._done = None
+
+    def play(self, sound, generation=None):
+        with self._lock:
+            if not self._begin(generation):
+                return False
+            self.started.append(sound.path)
+            self._done = threading.Event()
+            self.started_event(sound.path).set()
+            done = self._done
+        done.wait(TIMEOUT)
+        self._end()
+        return True
+
+    def _halt(self):
+        self.halted.append(self.started[-1])
+        self._done.set()
+
+    def started_event(self, path):
+        return self.events.setdefault(path, threading.Event())
+
+    def finish(self):
+        with self._lock:
+            self._done.set()
+
+
+def test_null_backend_plays_the_request():
+    backend = NullBackend()
+    player = AudioPlayer(backend, FakeCache())
+    try:
+        player.play("break.wav")
+        assert player.wait_idle(TIMEOUT)
+        assert backend.played == ["break.wav"]
+        assert player.stats()["played"] == 1
+    finally:
+        player.close()
+
+
+def test_new_request_cuts_off_the_playing_sound():
+    backend = BlockingBackend()
+    player = AudioPlayer(backend, FakeCache())
+    try:
+        player.play("old")
+        assert backend.started_event("old").wait(TIMEOUT)
+        player.play("new")
+        assert backend.started_event("new").wait(TIMEOUT)
+        backend.finish()
+        assert player.wait_idle(TIMEOUT)
+        assert backend.started == ["old", "new"]
+        assert backend.halted == ["old"]
+    finally:
+        player.close()
+
+
+def test_cancel_stops_the_playing_sound():
+    backend = BlockingBackend()
+    player = AudioPlayer(backend, FakeCache())
+    try:
+        player.play("alert")
+        assert backend.started_event("alert").wait(TIMEOUT)
+        player.cancel()
+        assert player.wait_idle(TIMEOUT)
+        assert backend.halted == ["alert"]
+        assert player.stats()["cancelled"] == 1
+    finally:
+        player.close()
+
+
+def test_request_overtaken_while_loading_never_plays():
+    gate = threading.Event()
+    cache = FakeCache({"old": gate})
+    backend = BlockingBackend()
+    player = AudioPlayer(backend, cache)
+    try:
+        player.play("old")
+        assert cache.loading["old"].wait(TIMEOUT)
+        player.play("new")
+        gate.set()
+        assert backend.started_event("new").wait(TIMEOUT)
+        backend.finish()
+        assert player.wait_idle(TIMEOUT)
+        assert backend.started == ["new"]
+        assert backend.halted == []
+    finally:
+        player.close()
+
+
+def test_cancel_while_loading_never_plays():
+    gate = threading.Event()
+    cache = FakeCache({"alert": gate})
+    backend = NullBackend()
+    player = AudioPlayer(backend, cache)
+    try:
+        player.play("alert")
+        assert cache.loading["alert"].wait(TIMEOUT)
+        player.cancel()
+        gate.set()
+        assert player.wait_idle(TIMEOUT)
+        assert backend.played == []
+    finally:
+        player.close()
+
+
+def test_late_stop_does_not_cut_off_a_newer_sound():
+    backend = BlockingBackend()
+    thread = threading.Thread(target=backend.play, args=(Sound("new", b"", 1.0), 2))
+    thread.start()
+    assert backend.started_event("new").wait(TIMEOUT)
+    backend.stop(1)
+    assert backend.halted == []
+    backend.stop(2)
+    thread.join(TIMEOUT)
+    assert backend.halted == ["new"]
+
+
+def test_stop_before_play_skips_that_generation():
+    backend = NullBackend()
+    backend.stop(3)
+    assert backend.play(Sound("old", b"", 1.0), 3) is False
+    assert backend.play(Sound("new", b"", 1.0), 4) is True
+    assert backend.played == ["new"]
@@ -0,0 +1,69 @@
+import numpy as np
+from change_detector import TemporalChangeDetector
+
+SIZE = 32
+
+
+def feed(detector, frames, calibrate=True):
+    return [(detector.update(frame, calibrate), detector.changed) for frame in frames]
+
+
+def scrolling_frames(count, step=2, seed=0):
+    # A page taller than the screen, moved up `step` thumbnail rows per sample
+    page = np.random.default_rng(seed).uniform(0, 255, size=(SIZE + step * count, SIZE)).astype(np.float32)
+    return [page[i * step:i * step + SIZE].copy() for i in range(count)]
+
+
+def typing_frames(count, chars_per_sample=6, seed=0):
+    # Dark glyphs appearing one after another on a light page
+    rng = np.random.default_rng(seed)
+    frame = np.full((SIZE, SIZE), 230, dtype=np.float32)
+    frames = []
+    for i in range(count):
+        frame = frame.copy()
+        for j in range(chars_per_sample):
+            position = (i * chars_per_sample + j) % (SIZE * SIZE // 4)
+            row, column = divmod(position, SIZE // 2)
+            frame[row * 2:row * 2 + 2, column * 2:column * 2 + 2] = rng.uniform(0, 60)
+        frames.append(frame)
+    return frames
+
+
+def blinking_frames(count):
+    # A large block flipping between two values, e.g. a blinking banner
+    on = np.zeros((SIZE, SIZE), dtype=np.float32)
+    off = on.copy()
+    on[:16, :16] = 255
+    return [on if i % 2 else off for i in range(count)]
+
+
+def test_scrolling_keeps_counting_as_change():
+    detector = TemporalChangeDetector(SIZE, history=16)
+    results = feed(detector, scrolling_frames(40))
+    assert all(changed for _, changed in results[1:])
+    assert detector.masked_fraction < 0.05
+
+
+def test_typing_keeps_counting_as_change():
+    detector = TemporalChangeDetector(SIZE, history=16, threshold=15, min_threshold=5)
+    results = feed(detector, typing_frames(40), calibrate=False)
+    assert all(changed for _, changed in results[1:])
+
+
+def test_blinking_is_masked():
+    detector = TemporalChangeDetector(SIZE, history=16)
+    results = feed(detector, blinking_frames(40))
+    assert results[1][1]
+    assert not any(changed for _, changed in results[8:])
+
+
+def test_noise_floor_frozen_while_input_is_recent():
+    # Sub-threshold typing must not teach the detector a higher floor
+    detector = TemporalChangeDetector(SIZE, history=16, threshold=100, min_threshold=5)
+    feed(detector, typing_frames(40, chars_per_sample=2), calibrate=False)
+    assert detector.noise_samples == 0
+    assert detector.threshold == 100
+
+    calibrated = TemporalChangeDetector(SIZE, history=16, threshold=100, min_threshold=5)
+    feed(calibrated, typing_frames(40, chars_per_sample=2), calibrate=True)
+    assert calibrated.noise_samples > 0
@@ -0,0 +1,152 @@
+import asyncio
+import threading
+
+import pytest
+from daemon import DaemonClient, DaemonServer, _number
+from health_service import DISCONNECTED
+from session_engine import WORKING
+from simulation import Simulation
+
+
+class FakeService:
+    app_state = WORKING
+
+    def __init__(self):
+        self.calls = []
+        self.listeners = []
+
+    def subscribe(self, listener):
+        self.listeners.append(listener)
+
+    def status(self):
+        return {"calls": len(self.calls)}
+
+    def set_paused(self, paused):
+        self.calls.append(("set_paused", paused))
+
+    def snooze(self, seconds):
+        self.calls.append(("snooze", seconds))
+
+    def set_durations(self, work_minutes, break_minutes):
+        self.calls.append(("set_durations", work_minutes, break_minutes))
+
+
+@pytest.fixture
+def server(tmp_path):
+    return DaemonServer(FakeService(), str(tmp_path / "daemon.sock"))
+
+
+def test_number_coerces_and_checks_bounds():
+    assert _number({"seconds": "90"}, "seconds", float) == 90.0
+    assert _number({}, "seconds", float, default=300) == 300
+    assert _number({"work_minutes": 1}, "work_minutes", int, minimum=1) == 1
+    for value in (None, True, "soon", [], float("nan"), float("inf")):
+        with pytest.raises(ValueError):
+            _number({"seconds": value}, "seconds", float)
+    with pytest.raises(ValueError):
+        _number({"seconds": 0}, "seconds", float, minimum=0, inclusive=False)
+    with pytest.raises(ValueError):
+        _number({"work_minutes": 0}, "work_minutes", int, minimum=1)
+
+
+def test_bad_arguments_are_rejected_before_the_service_is_touched(server):
+    service = server.service
+    for request in ({"cmd": "snooze", "seconds": -5},
+                    {"cmd": "snooze", "seconds": "later"},
+                    {"cmd": "settings", "work_minutes": 25},
+                    {"cmd": "settings", "work_minutes": 25, "break_minutes": 0},
+                    {"cmd": "settings", "work_minutes": "x", "break_minutes": 5},
+                    {"cmd": "reboot"}):
+        with pytest.raises(ValueError):
+            server.dispatch(request, None)
+    assert service.calls == []
+
+    server.dispatch({"cmd": "snooze"}, None)
+    server.dispatch({"cmd": "settings", "work_minutes": "50", "break_minutes": 10}, None)
+    assert service.calls == [("snooze", 300.0), ("set_durations", 50, 10)]
+
+
+class ServerThread:
+    # Runs a DaemonServer on its own event loop, as run_daemon would
+    def __init__(self, server):
+        self.server = server
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.call(server.start())
+
+    def call(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(5)
+
+    def stop(self):
+        self.call(self.server.close())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(5)
+        self.loop.close()
+
+
+def test_client_gets_error_replies_and_notices_the_daemon_going_away(server):
+    running = ServerThread(server)
+    events = []
+    disconnected = threading.Event()
+
+    def on_event(event, status):
+        events.append(event)
+        if event == DISCONNECTED:
+            disconnected.set()
+    client = DaemonClient(server.path, on_event=on_event, timeout=5.0)
+    try:
+        with pytest.raises(RuntimeError, match="break_minutes"):
+            client.request("settings", work_minutes=25)
+        assert client.request("pause") == {"calls": 1}
+        client.request("subscribe")
+
+        # The daemon shutting down closes its subscribers' connections
+        running.stop()
+        assert disconnected.wait(5)
+        assert events == [DISCONNECTED]
+        with pytest.raises(ConnectionError):
+            client.request("status")
+    finally:
+        client.close()
+
+
+def test_ui_stops_sending_commands_once_disconnected(tmp_path):
+    simulation = Simulation([], days=1, data_dir=str(tmp_path))
+    app = simulation.app
+    try:
+        sent = []
+
+        def lost(*args):
+            sent.append(args)
+            raise ConnectionError("Lost the daemon")
+
+        def rejected(*args):
+            raise RuntimeError("seconds must be greater than 0")
+        app.send_command(rejected, 0)
+        assert not app.disconnected
+
+        app.send_command(lost, True)
+        assert app.disconnected
+        app.send_command(lost, False)
+        assert sent == [(True,)]
+    finally:
+        simulation.close()
+
+
+def test_disconnected_event_disables_command_widgets(tmp_path):
+    simulation = Simulation([], days=1, data_dir=str(tmp_path))
+    app = simulation.app
+
+    class Widget:
+        state = "normal"
+
+        def configure(self, state):
+            self.state = state
+    try:
+        app.command_widgets = [Widget(), Widget()]
+        app.on_service_event(DISCONNECTED)
+        assert app.disconnected
+        assert [widget.state for widget in app.command_widgets] == ["disabled", "disabled"]
+    finally:
+        simulation.close()
@@ -0,0 +1,158 @@
+import datetime
+import os
+
+import pytest
+from activity_monitor import ActivityMonitor
+from clock import VirtualClock
+from focus_backends import FakeFocusBackend, X11FocusBackend
+
+
+class App:
+    paused = False
+
+
+@pytest.fixture
+def monitor(monkeypatch):
+    import config
+    monkeypatch.setattr(config, "ACTIVITY_LOG_DIR", None)
+    clock = VirtualClock(datetime.datetime(2025, 3, 12, 9, 0).timestamp())
+    return ActivityMonitor(App(), clock=clock)
+
+
+def deliver(monitor, backend):
+    # What the window monitor thread does, without the thread
+    change = backend.wait_for_change(0)
+    while change is not None:
+        monitor.handle_focus_change(change)
+        change = backend.wait_for_change(0)
+
+
+def test_focus_time_follows_backend_changes(monitor):
+    backend = FakeFocusBackend()
+    clock = monitor.clock
+    backend.emit(1, "notes.txt - Editor", "editor")
+    deliver(monitor, backend)
+    clock.advance(60)
+    backend.emit(2, "News - Browser", "browser")
+    deliver(monitor, backend)
+    clock.advance(30)
+    # The same window again is not a new span
+    backend.emit(2, "News - Browser", "browser")
+    deliver(monitor, backend)
+    clock.advance(30)
+    backend.emit(1, "notes.txt - Editor", "editor")
+    deliver(monitor, backend)
+    clock.advance(15)
+
+    assert monitor.focus_time.top_apps_today(now=clock.time()) == [("editor", 75.0), ("browser", 60.0)]
+    assert [row[2] for row in monitor.focus_time.spans()] == ["editor", "browser"]
+    assert [event[1].title for event in monitor.drain_events() if event[0] == "window"] == [
+        "notes.txt - Editor", "News - Browser", "notes.txt - Editor"]
+    assert monitor.last_activity_time == clock.time() - 15
+
+
+def test_listener_receives_changes_and_close_wakes_waiters():
+    backend = FakeFocusBackend()
+    seen = []
+    backend.set_listener(seen.append)
+    backend.emit(7, "Terminal", "terminal")
+    assert [change.window for change in seen] == [7]
+    backend.close()
+    assert backend.wait_for_change(1.0) is None
+    backend.emit(8, "Ignored", "ignored")
+    assert len(seen) == 1
+
+
+class FakeProperty:
+    def __init__(self, value):
+        self.value = value
+
+
+class FakeWindow:
+    def __init__(self, error=None):
+        self.error = error
+
+    def get_full_property(self, atom, kind):
+        if self.error is not None:
+            raise self.error
+        return FakeProperty(b"Editor")
+
+    def get_wm_name(self):
+        return "Editor"
+
+    def get_wm_class(self):
+        return ("editor", "Editor")
+
+
+class FakeDisplay:
+    def __init__(self, windows):
+        self.windows = windows
+
+    def create_resource_object(self, kind, window_id):
+        return self.windows[window_id]
+
+
+class FakeRoot:
+    def __init__(self):
+        self.active = 0
+
+    def get_full_property(self, atom, kind):
+        return FakeProperty([self.active])
+
+
+def x11_backend(windows):
+    backend = X11FocusBackend()
+    backend._atoms = {"_NET_ACTIVE_WINDOW": 1, "_NET_WM_NAME": 2, "UTF8_STRING": 3}
+    backend._display = FakeDisplay(windows)
+    return backend
+
+
+def test_failed_window_query_keeps_the_last_published_window():
+    error = pytest.importorskip("Xlib.error")
+
+    class WindowGone(error.XError):
+        def __init__(self):
+            Exception.__init__(self, "BadWindow")
+
+    windows = {10: FakeWindow(), 11: FakeWindow(WindowGone())}
+    backend = x11_backend(windows)
+    root = FakeRoot()
+    try:
+        root.active = 10
+        assert backend._publish_active(root, None) == 10
+        root.active = 11
+        assert backend._publish_active(root, 10) == 10
+        # Once the window answers, it is published and becomes the last window
+        windows[11] = FakeWindow()
+        assert backend._publish_active(root, 10) == 11
+        assert [backend.wait_for_change(0).window for _ in range(2)] == [10, 11]
+        assert backend.wait_for_change(0) is None
+    finally:
+        backend.close()
+
+
+def closed(fd):
+    try:
+        os.fstat(fd)
+    except OSError:
+        return True
+    return False
+
+
+def test_close_releases_the_wake_pipe():
+    backend = X11FocusBackend()
+    fds = (backend._wake_read, backend._wake_write)
+    backend.close()
+    assert all(closed(fd) for fd in fds)
+    # A second close is harmless
+    backend.close()
+
+
+def test_close_after_a_failed_start_releases_the_wake_pipe():
+    pytest.importorskip("Xlib")
+    backend = X11FocusBackend(":1999")
+    fds = (backend._wake_read, backend._wake_write)
+    with pytest.raises(Exception):
+        backend.start()
+    backend.close()
+    assert all(closed(fd) for fd in fds)
@@ -0,0 +1,89 @@
+import datetime
+import json
+
+import pytest
+from clock import VirtualClock
+from gamification import Gamification
+from ledger import ACHIEVEMENT_UNLOCKED, CHALLENGE_COMPLETED, POINTS, Ledger
+from rules import compile_rules
+
+
+@pytest.fixture
+def clock():
+    return VirtualClock(datetime.datetime(2025, 3, 12, 9, 0).timestamp())
+
+
+def open_gamification(tmp_path, clock, rules=None, ledger=True):
+    ledger = Ledger(str(tmp_path / "ledger.db")) if ledger else None
+    return Gamification(str(tmp_path / "gamification.json"), clock=clock, ledger=ledger, rules=rules)
+
+
+def test_migration_seeds_all_time_counters(tmp_path, clock):
+    today = clock.today()
+    old = {
+        "points": 1200,
+        "daily_breaks": 2,
+        "current_streak": 3,
+        "last_break_date": today.isoformat(),
+        "challenges": {
+            "weekly_points": {"target": 500, "progress": 120, "completed": False},
+            "weekly_breaks": {"target": 10, "progress": 4, "completed": False},
+        },
+        "last_reset": today.isoformat(),
+    }
+    (tmp_path / "gamification.json").write_text(json.dumps(old))
+    gamification = open_gamification(tmp_path, clock, ledger=False)
+    try:
+        counters = gamification.rules.state()["counters"]
+        assert counters["points/all"] == 1200
+        assert counters["breaks/all"] == 4
+        assert counters["streak/all"] == 3
+        assert counters["breaks/day"] == 2
+        assert counters["points/week"] == 120
+        completed = gamification.rules.completed
+        assert {"first_break", "points_1000", "streak_3"} <= set(completed)
+        assert "points_10000" not in completed and "weekly_points" not in completed
+
+        # Already-met rules pay no reward when the next event arrives
+        gamification.record_break()
+        assert gamification.data["points"] == 1200
+    finally:
+        gamification.close()
+
+
+def test_reward_counts_toward_a_points_rule(tmp_path, clock):
+    rules = compile_rules([
+        {"id": "first_break", "metric": "breaks", "target": 1, "reward": 1000, "kind": "challenge"},
+        {"id": "points_1000", "metric": "points", "target": 1000, "reward": 5},
+        {"id": "weekly_points", "metric": "points", "window": "week", "target": 500, "reward": 100,
+         "kind": "challenge"},
+    ])
+    gamification = open_gamification(tmp_path, clock, rules)
+    try:
+        gamification.record_break()
+        assert gamification.data["points"] == 1005
+        assert set(gamification.rules.completed) == {"first_break", "points_1000"}
+        assert gamification.rules.state()["counters"]["points/all"] == 1005
+        # Rewards are not points earned this week
+        assert gamification.rules.state()["counters"]["points/week"] == 0
+
+        ledger = gamification.ledger
+        assert ledger.flush(5.0)
+        assert ledger.counter("points") == 1005
+        kinds = [kind for _, kind, _, _ in ledger.events()]
+        assert kinds.count(CHALLENGE_COMPLETED) == 1
+        assert kinds.count(ACHIEVEMENT_UNLOCKED) == 1
+        assert [amount for _, kind, amount, _ in ledger.events(POINTS)] == [1000, 5]
+    finally:
+        gamification.close()
+
+
+def test_work_points_feed_every_window(tmp_path, clock):
+    gamification = open_gamification(tmp_path, clock, ledger=False)
+    try:
+        gamification.add_points(25)
+        counters = gamification.rules.state()["counters"]
+        assert counters["points/all"] == counters["points/week"] == 25
+        assert gamification.data["points"] == 25
+    finally:
+        gamification.close()
@@ -0,0 +1,86 @@
+import pytest
+from clock import VirtualClock
+from idle_sources import FakeIdleSource, IdlePoller
+
+THRESHOLD = 30.0
+
+
+@pytest.fixture
+def clock():
+    return VirtualClock()
+
+
+def make_poller(clock, seen, **options):
+    source = FakeIdleSource(now=clock.time)
+    return source, IdlePoller(source, THRESHOLD, seen.append, idle_interval=1.0, now=clock.time, **options)
+
+
+def test_first_poll_reports_the_last_input(clock):
+    seen = []
+    source, poller = make_poller(clock, seen)
+    clock.advance(3)
+    poller.poll()
+    assert seen == [clock.time() - 3]
+    # Nothing new: no second report
+    clock.advance(1)
+    poller.poll()
+    assert len(seen) == 1 and poller.queries == 2
+
+
+def test_active_user_is_polled_at_most_a_quarter_threshold_apart(clock):
+    seen = []
+    source, poller = make_poller(clock, seen)
+    inputs = []
+    delays = []
+    for _ in range(40):
+        source.touch()
+        inputs.append(clock.time())
+        delay = poller.poll()
+        delays.append(delay)
+        clock.advance(delay)
+    assert max(delays) <= THRESHOLD * 0.25
+    assert min(delays) >= poller.idle_interval
+    assert seen == inputs
+
+
+def test_idle_deadline_is_polled_before_it_passes(clock):
+    seen = []
+    source, poller = make_poller(clock, seen, lead=2.0)
+    last_input = clock.time()
+    poll_times = []
+    while clock.time() - last_input < THRESHOLD + 5:
+        delay = poller.poll()
+        poll_times.append(clock.time() - last_input)
+        clock.advance(delay)
+    before = [t for t in poll_times if t < THRESHOLD]
+    # The last poll of the engaged period lands within `lead` of the deadline
+    assert THRESHOLD - 2.0 - 1e-9 <= before[-1] < THRESHOLD
+    after = [t for t in poll_times if t >= THRESHOLD]
+    assert all(b - a == pytest.approx(1.0) for a, b in zip(after, after[1:]))
+
+
+def test_returning_user_is_seen_within_the_idle_interval(clock):
+    seen = []
+    source, poller = make_poller(clock, seen)
+    poller.poll()
+    clock.advance(THRESHOLD + 10)
+    assert poller.poll() == poller.idle_interval
+    clock.advance(0.4)
+    source.touch()
+    back = clock.time()
+    clock.advance(0.6)
+    delay = poller.poll()
+    assert seen[-1] == back
+    assert poller.inputs_seen == 2
+    # Active again: the next poll is scheduled from the fresh input
+    assert 1.0 < delay <= THRESHOLD * 0.25
+
+
+def test_small_clock_disagreements_are_not_input(clock):
+    seen = []
+    source, poller = make_poller(clock, seen)
+    poller.poll()
+    source.last_input += 0.05
+    clock.advance(2)
+    poller.poll()
+    assert len(seen) == 1
@@ -0,0 +1,92 @@
+import http.client
+import json
+import threading
+import time
+
+import pytest
+from leaderboard_service import LeaderboardEngine, MAX_TOP_K, make_server
+
+DAY = 86400
+
+
+@pytest.fixture
+def server():
+    engine = LeaderboardEngine()
+    server = make_server(engine, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield engine, server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+def request(port, method, path, body=None):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    try:
+        conn.request(method, path, None if body is None else json.dumps(body).encode("utf-8"),
+                     {"Content-Type": "application/json"})
+        response = conn.getresponse()
+        return response.status, json.loads(response.read())
+    finally:
+        conn.close()
+
+
+def test_negative_points_are_rejected_without_changing_state():
+    engine = LeaderboardEngine()
+    engine.add_points("a", 30, "t")
+    with pytest.raises(ValueError):
+        engine.add_points("a", -10, "t")
+    assert engine.top("points") == [("a", 30)]
+    engine.add_points("a", 20, "t")
+    assert engine.top("points") == [("a", 50)]
+    assert engine.top("weekly_points") == [("a", 50)]
+    assert engine.top("points", team="t") == [("a", 50)]
+
+
+def test_weekly_points_bonus_is_added_once():
+    engine = LeaderboardEngine()
+    engine.add_points("a", 450)
+    engine.add_points("a", 60)
+    engine.add_points("a", 60)
+    assert engine.top("points") == [("a", 450 + 60 + 100 + 60)]
+    assert engine.top("weekly_points") == [("a", 510)]
+
+
+def test_lapsed_streak_expires_when_the_day_rolls_over():
+    engine = LeaderboardEngine()
+    start = time.time() - 5 * DAY
+    for day in range(3):
+        engine.record_break("a", "t", start + day * DAY)
+    engine.record_break("b", "t", start + 2 * DAY)
+    assert engine.top("streak", timestamp=start + 3 * DAY) == [("a", 3), ("b", 1)]
+    assert engine.top("streak", timestamp=start + 4 * DAY) == [("a", 0), ("b", 0)]
+    engine.record_break("a", "t", start + 5 * DAY)
+    assert engine.top("streak", team="t", timestamp=start + 5 * DAY)[0] == ("a", 1)
+
+
+def test_post_negative_points_is_a_bad_request(server):
+    engine, port = server
+    status, reply = request(port, "POST", "/events", {"type": "points", "user": "a", "points": -10})
+    assert status == 400 and "points" in reply["error"]
+    assert engine.stats()["users"] == 0
+
+
+def test_post_out_of_range_timestamp_is_a_bad_request(server):
+    _, port = server
+    status, _ = request(port, "POST", "/events", {"type": "break", "user": "a", "ts": 1e300})
+    assert status == 400
+
+
+@pytest.mark.parametrize("k", ["x", "0", "-3"])
+def test_top_rejects_bad_k(server, k):
+    _, port = server
+    status, reply = request(port, "GET", f"/top?k={k}")
+    assert status == 400 and "k" in reply["error"]
+
+
+def test_top_clamps_large_k(server):
+    engine, port = server
+    for i in range(MAX_TOP_K + 5):
+        engine.add_points(f"user{i}", i + 1)
+    status, reply = request(port, "GET", f"/top?k={MAX_TOP_K * 10}")
+    assert status == 200 and len(reply) == MAX_TOP_K
@@ -0,0 +1,64 @@
+import sqlite3
+import time
+
+import pytest
+from ledger import Ledger, BREAK, POINTS, SNOOZE
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    ledger = Ledger(str(tmp_path / "ledger.db"), write_retries=2)
+    yield ledger
+    ledger.close()
+
+
+def stored_counters(ledger):
+    conn = sqlite3.connect(ledger.path)
+    try:
+        return dict(conn.execute("SELECT name, value FROM counters"))
+    finally:
+        conn.close()
+
+
+def test_counters_follow_recorded_events(ledger):
+    ledger.record(POINTS, 25)
+    ledger.record(POINTS, 15)
+    ledger.record(BREAK)
+    ledger.record(SNOOZE)
+    assert ledger.counter("points") == 40
+    assert ledger.flush(5.0)
+    assert stored_counters(ledger) == {"points": 40, "breaks": 1, "snoozes": 1}
+    assert [row[1:3] for row in ledger.events()] == [(POINTS, 25), (POINTS, 15), (BREAK, 0), (SNOOZE, 0)]
+
+
+def test_dropped_batch_is_taken_out_of_the_counters(ledger, monkeypatch):
+    ledger.record(POINTS, 25)
+    assert ledger.flush(5.0)
+    insert = ledger._insert
+
+    def failing_insert(conn, rows):
+        raise sqlite3.OperationalError("database is locked")
+    monkeypatch.setattr(ledger, "_insert", failing_insert)
+    ledger.record(POINTS, 100)
+    ledger.record(BREAK)
+    assert ledger.flush(5.0)
+    assert ledger.dropped == 2
+    assert ledger.write_failures == 2
+    assert ledger.counter("points") == 25
+    assert ledger.counter("breaks") == 0
+
+    # The writer survived and keeps committing
+    monkeypatch.setattr(ledger, "_insert", insert)
+    ledger.record(POINTS, 10)
+    assert ledger.flush(5.0)
+    assert ledger._writer.is_alive()
+    assert stored_counters(ledger) == {"points": 35}
+    assert ledger.counter("points") == 35
+    assert ledger.rebuild_counters() == {"points": 35}
+
+
+def test_flush_times_out_instead_of_hanging(ledger, monkeypatch):
+    monkeypatch.setattr(ledger, "_insert", lambda conn, rows: time.sleep(0.5))
+    ledger.record(POINTS, 5)
+    assert ledger.flush(0.05) is False
+    assert ledger.flush(5.0)
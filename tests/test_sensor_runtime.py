@@ -0,0 +1,61 @@
+import queue
+import threading
+
+from clock import SYSTEM_CLOCK
+from focus_backends import FakeFocusBackend
+from monitor_log import get_logger
+from sensor_runtime import AsyncSensorRuntime
+
+TIMEOUT = 5.0
+
+
+class FakeMonitor:
+    # The parts of ActivityMonitor the runtime drives, with no screen work
+    def __init__(self, focus_backend):
+        self.focus_backend = focus_backend
+        self.idle_poller = None
+        self.clock = SYSTEM_CLOCK
+        self.last_activity_time = SYSTEM_CLOCK.time()
+        self.events = queue.Queue()
+        self.log = get_logger()
+        self.wakeups = 0
+        self.focused = []
+        self.focus_seen = threading.Event()
+
+    def next_screen_action(self):
+        return None, 60.0
+
+    def close_screen_grabber(self):
+        pass
+
+    def handle_focus_change(self, change):
+        self.focused.append(change.title)
+        self.focus_seen.set()
+
+
+def test_focus_change_from_before_the_loop_started_is_handled():
+    backend = FakeFocusBackend()
+    # What a real backend does in start(): publish the current window
+    backend.emit(1, "Editor", "editor")
+    monitor = FakeMonitor(backend)
+    runtime = AsyncSensorRuntime(monitor)
+    runtime.start()
+    try:
+        assert monitor.focus_seen.wait(TIMEOUT)
+        monitor.focus_seen.clear()
+        backend.emit(2, "Browser", "browser")
+        assert monitor.focus_seen.wait(TIMEOUT)
+        assert monitor.focused == ["Editor", "Browser"]
+    finally:
+        runtime.stop()
+        runtime._thread.join(TIMEOUT)
+    assert not runtime._thread.is_alive()
+
+
+def test_stop_before_start_ends_the_loop():
+    monitor = FakeMonitor(None)
+    runtime = AsyncSensorRuntime(monitor)
+    runtime.stop()
+    runtime.start()
+    runtime._thread.join(TIMEOUT)
+    assert not runtime._thread.is_alive()
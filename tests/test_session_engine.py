@@ -0,0 +1,106 @@
+from clock import VirtualClock
+from session_engine import SessionEngine, BREAK_DUE, BREAK_OVER, BREAKING, WORKING
+
+WORK = 25 * 60
+BREAK = 5 * 60
+
+
+def work(engine, clock, seconds, input_every=5.0):
+    # Input every `input_every` seconds, with an update after each
+    transitions = []
+    elapsed = 0.0
+    while elapsed < seconds:
+        clock.advance(input_every)
+        elapsed += input_every
+        engine.record_activity()
+        transitions += engine.update()
+    return transitions
+
+
+def test_break_due_after_work_seconds_of_input():
+    clock = VirtualClock()
+    engine = SessionEngine(WORK, BREAK, idle_threshold=30, clock=clock)
+    assert work(engine, clock, WORK - 10) == []
+    assert BREAK_DUE in work(engine, clock, 10)
+
+
+def test_idle_time_drains_active_time():
+    clock = VirtualClock()
+    engine = SessionEngine(WORK, BREAK, idle_threshold=30, clock=clock)
+    work(engine, clock, 600)
+    clock.advance(30 + 200)
+    engine.update()
+    # Engaged until 30 s after the last input, then drained for 200 s
+    assert abs(engine.active - (600 + 30 - 200)) < 1e-6
+
+
+def test_break_over_after_break_seconds():
+    clock = VirtualClock()
+    engine = SessionEngine(WORK, BREAK, clock=clock)
+    engine.start_break()
+    assert engine.state == BREAKING
+    clock.advance(BREAK - 1)
+    assert engine.update() == []
+    clock.advance(1)
+    assert engine.update() == [BREAK_OVER]
+    engine.end_break()
+    assert engine.state == WORKING and engine.paused
+
+
+def test_suspend_counts_as_time_away():
+    clock = VirtualClock()
+    engine = SessionEngine(WORK, BREAK, idle_threshold=30, clock=clock)
+    work(engine, clock, 600)
+    clock.suspend(3600)
+    engine.update()
+    assert engine.suspends == 1
+    assert engine.suspended == 3600
+    assert engine.active == 0.0
+
+
+def test_forward_wall_clock_step_is_not_a_suspend():
+    clock = VirtualClock()
+    engine = SessionEngine(WORK, BREAK, idle_threshold=30, clock=clock)
+    work(engine, clock, 600)
+    clock.step(60)
+    engine.update()
+    assert engine.suspends == 0
+    assert abs(engine.active - 600) < 1e-6
+
+
+def test_backward_wall_clock_step_is_ignored():
+    clock = VirtualClock(boottime=False)
+    engine = SessionEngine(WORK, BREAK, idle_threshold=30, clock=clock)
+    work(engine, clock, 600)
+    clock.step(-3600)
+    assert work(engine, clock, 60) == []
+    assert engine.suspends == 0
+    assert abs(engine.active - 660) < 1e-6
+
+
+def test_suspend_without_boottime_uses_the_wall_clock():
+    clock = VirtualClock(boottime=False)
+    engine = SessionEngine(WORK, BREAK, clock=clock)
+    clock.suspend(3600)
+    engine.update()
+    assert engine.suspends == 1
+    assert engine.suspended == 3600
+
+
+def test_snooze_defers_the_break():
+    clock = VirtualClock()
+    engine = SessionEngine(WORK, BREAK, idle_threshold=30, clock=clock)
+    assert BREAK_DUE in work(engine, clock, WORK)
+    engine.snooze(300)
+    assert work(engine, clock, 300) == []
+    assert engine.active == 0.0
+
+
+def test_snapshot_round_trip():
+    clock = VirtualClock()
+    engine = SessionEngine(WORK, BREAK, idle_threshold=30, clock=clock)
+    work(engine, clock, 600)
+    copy = SessionEngine(WORK, BREAK, idle_threshold=30, clock=VirtualClock(start=0))
+    copy.load_snapshot(engine.snapshot())
+    assert copy.state == engine.state
+    assert abs(copy.active - engine.active) < 1e-6
@@ -1,41 +1,84 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-import time
 import os
 import ctypes
-import winsound
-from config import COLORS, DEFAULT_WORK_MINUTES, DEFAULT_BREAK_MINUTES, IDLE_THRESHOLD
+import time
+from audio import AudioPlayer, create_audio_backend
+from clock import SYSTEM_CLOCK
+from health_service import BREAK_STARTED, BREAK_ENDED, PAUSED, RESUMED, SNOOZED, SETTINGS_CHANGED, DISCONNECTED
+from metrics import REGISTRY
+from profiling import STAGES
+from monitor_log import get_logger
+from session_engine import WORKING
+from view_model import ViewModel
+from config import COLORS, AUDIO_BACKEND
+
+UI_TICK_INTERVAL = 1000  # ms
+UI_TICK_SECONDS = REGISTRY.histogram("healthguard_ui_tick_seconds", "Time spent in one update_ui tick")
+UI_TICK_LATENESS = REGISTRY.histogram("healthguard_ui_tick_lateness_seconds",
+                                      "How long after it was due an update_ui tick started")
 
 class HealthAppUI(tk.Tk):
-    def __init__(self, activity_monitor, gamification):
+    def __init__(self, service, clock=SYSTEM_CLOCK):
         super().__init__()
         self.title("HealthGuard Pro")
         self.geometry("1000x700")
         self.configure(bg=COLORS["background"])
 
-        self.paused = False
-        self.active_time = 0
-        self.app_state = "working"
-        self.break_start_time = 0
-        self.snooze_until = 0
-
-        self.work_interval = tk.IntVar(value=DEFAULT_WORK_MINUTES)
-        self.break_duration = tk.IntVar(value=DEFAULT_BREAK_MINUTES)
-        self.prev_work = DEFAULT_WORK_MINUTES
-        self.prev_break = DEFAULT_BREAK_MINUTES
-
-        self.break_sound = "break_alert.wav"
-        self.continue_sound = "continue_alert.wav"
+        self.init_state(service, clock)
+        self.work_interval = tk.IntVar(value=service.work_minutes)
+        self.break_duration = tk.IntVar(value=service.break_minutes)
         self.check_audio_files()
-
-        self.monitor = activity_monitor
-        self.gamification = gamification
+        # Alerts play from memory on the audio thread, never on the Tk thread
+        self.audio = AudioPlayer(create_audio_backend(AUDIO_BACKEND))
+        self.audio.preload(self.break_sound, self.continue_sound)
 
         self.setup_styles()
         self.create_widgets()
         self.setup_settings_listeners()
         self.update_ui()
 
+    def init_state(self, service, clock):
+        # Everything apart from widgets. The service (local, or a daemon
+        # connection) runs the work/break logic; this window sends it
+        # commands and renders its state and events.
+        self.clock = clock
+        self.service = service
+        self.session = service.session
+        self.gamification = service.gamification
+        service.subscribe(self.on_service_event)
+        # Buttons and spinboxes that send commands; disabled once a remote
+        # service has lost its daemon
+        self.command_widgets = []
+        self.disconnected = False
+
+        self.prev_work = service.work_minutes
+        self.prev_break = service.break_minutes
+
+        self.break_sound = "break_alert.wav"
+        self.continue_sound = "continue_alert.wav"
+
+        # Widget updates go through the view model, which only sends changes to Tk
+        self.view = ViewModel()
+        self._ui_due = None  # perf_counter time the next update_ui tick is due
+        view = self.view
+        REGISTRY.callback("healthguard_ui_tcl_calls_total", "Widget updates sent to Tk", lambda: view.sent, "counter")
+        REGISTRY.callback("healthguard_ui_updates_requested_total", "Widget option updates asked for",
+                          lambda: view.requested, "counter")
+
+    # The work/break state lives in the session engine; the UI only renders it
+    @property
+    def paused(self):
+        return self.session.paused
+
+    @property
+    def app_state(self):
+        return self.session.state
+
+    @property
+    def active_time(self):
+        return int(self.session.active)
+
     def setup_styles(self):
         style = ttk.Style()
         style.theme_use("clam")
@@ -59,6 +102,31 @@ class HealthAppUI(tk.Tk):
         self.notebook.add(self.settings_tab, text=" Settings ")
         self.notebook.add(self.gamification_tab, text=" Gamification ")
 
+        self.view.register(self.dashboard_tab, self.time_label, self.date_label, self.time_active_label,
+                           self.next_break_label, self.current_status_label, self.progress_bar,
+                           self.progress_label, self.pause_button, self.top_apps_label, self.current_window_label)
+        self.view.show_tab(self.dashboard_tab)
+        self.notebook.bind("<<NotebookTabChanged>>", self.on_tab_changed)
+        self.bind("<Map>", self.on_window_map)
+        self.bind("<Unmap>", self.on_window_map)
+
+    def on_tab_changed(self, event):
+        tab = self.nametowidget(self.notebook.select())
+        if tab is self.gamification_tab and self.points_label is None:
+            self.populate_gamification_tab()
+        self.view.show_tab(tab)
+        self.update_gamification_display()
+        self.view.flush()
+
+    def on_window_map(self, event):
+        # Bindings on the root also fire for its children; only the window itself counts
+        if event.widget is self:
+            mapped = event.type == tk.EventType.Map
+            self.view.set_window_mapped(mapped)
+            if mapped:
+                # Paint what changed while minimized now, not on the next tick
+                self.view.flush()
+
     def create_dashboard(self):
         tab = ttk.Frame(self.notebook)
         header = ttk.Frame(tab, style="Card.TFrame")
@@ -95,10 +163,22 @@ class HealthAppUI(tk.Tk):
         self.pause_button = ttk.Button(control_frame, text="Pause", style="Warning.TButton",
                                       command=self.toggle_pause)
         self.pause_button.pack(side="left", padx=5)
-        ttk.Button(control_frame, text="Take Break Now", style="Primary.TButton",
-                  command=self.trigger_break).pack(side="left", padx=5)
-        ttk.Button(control_frame, text="Snooze", style="Primary.TButton",
-                  command=self.snooze_alert).pack(side="left", padx=5)
+        break_button = ttk.Button(control_frame, text="Take Break Now", style="Primary.TButton",
+                                  command=self.trigger_break)
+        break_button.pack(side="left", padx=5)
+        snooze_button = ttk.Button(control_frame, text="Snooze", style="Primary.TButton",
+                                   command=self.snooze_alert)
+        snooze_button.pack(side="left", padx=5)
+        self.command_widgets += [self.pause_button, break_button, snooze_button]
+
+        focus_frame = ttk.LabelFrame(tab, text="Top Apps Today")
+        focus_frame.pack(fill="x", padx=20, pady=10)
+        self.top_apps_label = ttk.Label(focus_frame, text="No focus data yet", font=("Segoe UI", 10),
+                                        foreground=COLORS["text"], justify="left")
+        self.top_apps_label.pack(anchor="w", padx=10, pady=5)
+        self.current_window_label = ttk.Label(focus_frame, text="", font=("Segoe UI", 9),
+                                              foreground=COLORS["text"], wraplength=500, justify="left")
+        self.current_window_label.pack(anchor="w", padx=10, pady=(0, 5))
 
         return tab
 
@@ -116,14 +196,23 @@ class HealthAppUI(tk.Tk):
         break_frame.pack(fill="x", padx=20, pady=10)
 
         ttk.Label(break_frame, text="Work Duration (minutes):").grid(row=0, column=0, padx=10, pady=5)
-        ttk.Spinbox(break_frame, from_=15, to=90, textvariable=self.work_interval).grid(row=0, column=1, padx=10)
+        work_spinbox = ttk.Spinbox(break_frame, from_=15, to=90, textvariable=self.work_interval)
+        work_spinbox.grid(row=0, column=1, padx=10)
         ttk.Label(break_frame, text="Break Duration (minutes):").grid(row=1, column=0, padx=10, pady=5)
-        ttk.Spinbox(break_frame, from_=1, to=15, textvariable=self.break_duration).grid(row=1, column=1, padx=10)
+        break_spinbox = ttk.Spinbox(break_frame, from_=1, to=15, textvariable=self.break_duration)
+        break_spinbox.grid(row=1, column=1, padx=10)
+        self.command_widgets += [work_spinbox, break_spinbox]
 
         return tab
 
     def create_gamification_tab(self):
-        tab = ttk.Frame(self.notebook)
+        # Filled in by populate_gamification_tab() when first shown: it is the
+        # largest tab and most sessions never open it
+        self.points_label = None
+        return ttk.Frame(self.notebook)
+
+    def populate_gamification_tab(self):
+        tab = self.gamification_tab
         points_frame = ttk.Frame(tab, style="Card.TFrame")
         points_frame.pack(fill="x", padx=20, pady=10, ipadx=10, ipady=10)
         ttk.Label(points_frame, text="Total Points", font=("Segoe UI", 12)).pack()
@@ -138,38 +227,64 @@ class HealthAppUI(tk.Tk):
                                      font=("Segoe UI", 18), foreground=COLORS["secondary"])
         self.streak_label.pack(pady=5)
 
+        # Challenges and achievements are rendered from the rules catalog;
+        # update_gamification_display() only refreshes the ones that changed
+        rules = self.gamification.rules
         challenges_frame = ttk.LabelFrame(tab, text="Weekly Challenges")
         challenges_frame.pack(fill="x", padx=20, pady=10)
-        self.weekly_points_challenge = ttk.Label(challenges_frame,
-            text=f"Earn {self.gamification.data['challenges']['weekly_points']['target']} points: "
-                 f"{self.gamification.data['challenges']['weekly_points']['progress']}/"
-                 f"{self.gamification.data['challenges']['weekly_points']['target']}")
-        self.weekly_points_challenge.pack(anchor="w", padx=10, pady=5)
-        self.weekly_breaks_challenge = ttk.Label(challenges_frame,
-            text=f"Take {self.gamification.data['challenges']['weekly_breaks']['target']} breaks: "
-                 f"{self.gamification.data['challenges']['weekly_breaks']['progress']}/"
-                 f"{self.gamification.data['challenges']['weekly_breaks']['target']}")
-        self.weekly_breaks_challenge.pack(anchor="w", padx=10, pady=5)
-
-        return tab
+        self.rule_labels = {}
+        for rule, *_ in rules.catalog("challenge"):
+            label = ttk.Label(challenges_frame)
+            label.pack(anchor="w", padx=10, pady=5)
+            self.rule_labels[rule.id] = label
+
+        achievements_frame = ttk.LabelFrame(tab, text="Achievements")
+        achievements_frame.pack(fill="both", expand=True, padx=20, pady=10)
+        self.achievements_tree = ttk.Treeview(achievements_frame, columns=("progress", "reward"), height=8)
+        self.achievements_tree.heading("#0", text="Achievement")
+        self.achievements_tree.heading("progress", text="Progress")
+        self.achievements_tree.heading("reward", text="Reward")
+        self.achievements_tree.column("progress", width=120, anchor="center")
+        self.achievements_tree.column("reward", width=80, anchor="center")
+        self.achievements_tree.tag_configure("earned", foreground=COLORS["secondary"])
+        scrollbar = ttk.Scrollbar(achievements_frame, orient="vertical", command=self.achievements_tree.yview)
+        self.achievements_tree.configure(yscrollcommand=scrollbar.set)
+        self.achievements_tree.pack(side="left", fill="both", expand=True, padx=(10, 0), pady=5)
+        scrollbar.pack(side="right", fill="y", pady=5)
+        self.rule_rows = set()
+        for rule, *_ in rules.catalog("achievement"):
+            self.achievements_tree.insert("", "end", iid=rule.id, text=rule.title,
+                                          values=("", f"+{rule.reward}" if rule.reward else ""))
+            self.rule_rows.add(rule.id)
+
+        self.view.register(tab, self.points_label, self.streak_label, *self.rule_labels.values())
+        self.update_rule_display(rules.drain_changed())
 
     def update_gamification_display(self):
-        self.points_label.config(text=str(self.gamification.data['points']))
+        if self.points_label is None:
+            return
+        self.view.set(self.points_label, text=str(self.gamification.data['points']))
         streak_text = f"{self.gamification.data['current_streak']} days "
         streak_text += "🔥" * min(self.gamification.data['current_streak'], 3)
-        self.streak_label.config(text=streak_text)
-
-        points_challenge = self.gamification.data['challenges']['weekly_points']
-        points_text = f"Earn {points_challenge['target']} points: {points_challenge['progress']}/{points_challenge['target']}"
-        if points_challenge['completed']:
-            points_text += " ✓"
-        self.weekly_points_challenge.config(text=points_text, foreground=COLORS["secondary"] if points_challenge['completed'] else COLORS["text"])
-
-        breaks_challenge = self.gamification.data['challenges']['weekly_breaks']
-        breaks_text = f"Take {breaks_challenge['target']} breaks: {breaks_challenge['progress']}/{breaks_challenge['target']}"
-        if breaks_challenge['completed']:
-            breaks_text += " ✓"
-        self.weekly_breaks_challenge.config(text=breaks_text, foreground=COLORS["secondary"] if breaks_challenge['completed'] else COLORS["text"])
+        self.view.set(self.streak_label, text=streak_text)
+
+        # The achievements list is only refreshed while it can be seen; its
+        # changes keep accumulating in the rules engine until then
+        if self.view.is_visible(getattr(self, "gamification_tab", None)):
+            self.update_rule_display(self.gamification.rules.drain_changed())
+
+    def update_rule_display(self, rule_ids):
+        rules = self.gamification.rules
+        for rule_id in rule_ids:
+            progress, target, completed = rules.progress(rule_id)
+            label = self.rule_labels.get(rule_id)
+            if label is not None:
+                text = f"{rules.by_id[rule_id].title}: {progress}/{target}" + (" ✓" if completed else "")
+                self.view.set(label, text=text, foreground=COLORS["secondary"] if completed else COLORS["text"])
+            elif rule_id in self.rule_rows:
+                self.achievements_tree.item(rule_id, values=("✓" if completed else f"{progress}/{target}",
+                                                             self.achievements_tree.set(rule_id, "reward")),
+                                            tags=("earned",) if completed else ())
 
     def setup_settings_listeners(self):
         self.work_interval.trace_add("write", self.handle_settings_change)
@@ -181,89 +296,141 @@ class HealthAppUI(tk.Tk):
             current_break = int(self.break_duration.get())
         except ValueError:
             return
+        if current_work < 1 or current_break < 1:
+            return
         if current_work != self.prev_work or current_break != self.prev_break:
             self.prev_work = current_work
             self.prev_break = current_break
-            if self.app_state == "working":
-                self.active_time = 0
-                self.monitor.last_activity_time = time.time()
-                self.time_active_label.config(text="0m")
-                work_seconds = current_work * 60
-                mins, secs = divmod(work_seconds, 60)
-                self.next_break_label.config(text=f"{mins:02d}:{secs:02d}")
-                self.progress_bar["value"] = 0
-                self.progress_label.config(text="0% Complete")
-                messagebox.showinfo("Settings Updated", f"Work duration updated to {current_work} minutes. Timer reset.")
-            elif self.app_state == "breaking":
-                self.break_start_time = time.time()
-                break_seconds = current_break * 60
-                self.progress_bar["value"] = 0
-                self.progress_label.config(text="0% Complete")
-                mins, secs = divmod(break_seconds, 60)
-                self.next_break_label.config(text=f"{mins:02d}:{secs:02d}")
-                messagebox.showinfo("Settings Updated", f"Break duration updated to {current_break} minutes. Timer reset.")
+            self.send_command(self.service.set_durations, current_work, current_break)
+
+    def send_command(self, command, *args):
+        # A remote service raises once its daemon is gone; show that
+        # instead of letting the error escape a Tk callback
+        if self.disconnected:
+            return
+        try:
+            command(*args)
+        except (ConnectionError, TimeoutError) as e:
+            get_logger().warning("service_disconnected", error=str(e))
+            self.render_disconnected()
+        except RuntimeError as e:
+            # The daemon is still there but refused the command
+            get_logger().warning("service_command_rejected", error=str(e))
+
+    def render_disconnected(self):
+        self.disconnected = True
+        for widget in self.command_widgets:
+            widget.configure(state="disabled")
+        self.view.set(self.current_status_label, text="Disconnected", foreground=COLORS["highlight"])
 
     def toggle_pause(self):
-        self.paused = not self.paused
-        self.pause_button.config(text="Resume" if self.paused else "Pause")
+        self.send_command(self.service.set_paused, not self.paused)
+
+    def on_service_event(self, event):
+        if event == DISCONNECTED:
+            self.render_disconnected()
+        elif event == BREAK_STARTED:
+            self.view.set(self.current_status_label, text="On Break", foreground=COLORS["secondary"])
+            self.show_break_alert()
+            self.update_gamification_display()
+        elif event == BREAK_ENDED:
+            if hasattr(self, 'break_alert') and self.break_alert.winfo_exists():
+                self.break_alert.destroy()
+            self.view.set(self.pause_button, text="Resume")
+            self.view.set(self.current_status_label, text="Paused", foreground=COLORS["highlight"])
+            self.show_continue_alert()
+            self.update_gamification_display()
+        elif event in (PAUSED, RESUMED):
+            self.render_pause_state()
+        elif event == SNOOZED:
+            self.notify("Snoozed", "Break reminder postponed for 5 minutes")
+        elif event == SETTINGS_CHANGED:
+            # Possibly changed by another client: bring the spinboxes along
+            self.prev_work, self.prev_break = self.service.work_minutes, self.service.break_minutes
+            self.work_interval.set(self.prev_work)
+            self.break_duration.set(self.prev_break)
+            self.render_session()
+            if self.app_state == "working":
+                self.notify("Settings Updated", f"Work duration updated to {self.prev_work} minutes. Timer reset.")
+            else:
+                self.notify("Settings Updated", f"Break duration updated to {self.prev_break} minutes. Timer reset.")
+
+    def render_pause_state(self):
+        self.view.set(self.pause_button, text="Resume" if self.paused else "Pause")
         status_text = "Paused" if self.paused else ("Working" if self.app_state == "working" else "On Break")
         color = COLORS["highlight"] if self.paused else (COLORS["primary"] if self.app_state == "working" else COLORS["secondary"])
-        self.current_status_label.config(text=status_text, foreground=color)
+        self.view.set(self.current_status_label, text=status_text, foreground=color)
+
+    def process_monitor_events(self):
+        # Screen results only matter to the monitor; the latest window is shown
+        for kind, payload in self.service.drain_monitor_events():
+            if kind == "window":
+                self.view.set(self.current_window_label, text=f"Now: {payload.title}" if payload.title else "")
+
+    def update_focus_display(self, current_time):
+        top_apps = self.service.top_apps_today(limit=5, now=current_time)
+        if not top_apps:
+            return
+        lines = []
+        for app, seconds in top_apps:
+            hours, minutes = divmod(int(seconds) // 60, 60)
+            lines.append(f"{app}: {hours}h {minutes:02d}m" if hours else f"{app}: {minutes}m")
+        self.view.set(self.top_apps_label, text="\n".join(lines))
 
     def update_ui(self):
-        current_time = time.time()
-        if not self.paused:
-            if self.app_state == "working" and current_time > self.snooze_until:
-                self.update_working_state(current_time)
-            elif self.app_state == "breaking":
-                self.update_breaking_state(current_time)
-        self.time_label.config(text=time.strftime("%H:%M"))
-        self.date_label.config(text=time.strftime("%A, %d %B %Y"))
+        started = time.perf_counter()
+        if self._ui_due is not None:
+            UI_TICK_LATENESS.observe(max(0.0, started - self._ui_due))
+        self.process_monitor_events()
+        current_time = self.clock.time()
+        self.tick()
+        self.update_focus_display(current_time)
+        self.view.set(self.time_label, text=self.clock.strftime("%H:%M"))
+        self.view.set(self.date_label, text=self.clock.strftime("%A, %d %B %Y"))
         self.update_gamification_display()
-        self.after(1000, self.update_ui)
-
-    def update_working_state(self, current_time):
-        work_seconds = self.work_interval.get() * 60
-        time_since_last_activity = current_time - self.monitor.last_activity_time
-        if time_since_last_activity < IDLE_THRESHOLD:
-            self.active_time += 1
+        self.view.flush()
+        if self.view.ticks % 60 == 0:
+            log = get_logger()
+            if log.debug_enabled:
+                log.debug("ui_render", **self.view.stats())
+        finished = time.perf_counter()
+        UI_TICK_SECONDS.observe(finished - started)
+        if STAGES.enabled:
+            STAGES.record("ui.tick", finished - started)
+        self._ui_due = finished + UI_TICK_INTERVAL / 1000
+        self.after(UI_TICK_INTERVAL, self.update_ui)
+
+    def tick(self):
+        # Events raised by the service are handled in on_service_event
+        self.service.tick()
+        if not self.paused:
+            self.render_session()
+
+    def render_session(self):
+        session = self.session
+        if session.state == WORKING:
+            work_seconds = session.work_seconds
+            active = int(session.active)
+            progress = min((active / work_seconds) * 100, 100)
+            self.view.set(self.progress_bar, value=progress)
+            self.view.set(self.progress_label, text=f"{int(progress)}% Complete")
+            mins, secs = divmod(int(session.work_remaining()), 60)
+            self.view.set(self.next_break_label, text=f"{mins:02d}:{secs:02d}")
+            self.view.set(self.time_active_label, text=f"{active // 60}m")
         else:
-            self.active_time = max(0, self.active_time - 1)
-        progress = min((self.active_time / work_seconds) * 100, 100)
-        self.progress_bar["value"] = progress
-        self.progress_label.config(text=f"{int(progress)}% Complete")
-        remaining = max(work_seconds - self.active_time, 0)
-        mins, secs = divmod(remaining, 60)
-        self.next_break_label.config(text=f"{mins:02d}:{secs:02d}")
-        self.time_active_label.config(text=f"{self.active_time // 60}m")
-        if self.active_time >= work_seconds:
-            self.trigger_break()
-
-    def update_breaking_state(self, current_time):
-        break_seconds = self.break_duration.get() * 60
-        elapsed = current_time - self.break_start_time
-        remaining = max(break_seconds - elapsed, 0)
-        mins, secs = divmod(int(remaining), 60)
-        self.next_break_label.config(text=f"{mins:02d}:{secs:02d}")
-        self.progress_bar["value"] = (elapsed / break_seconds) * 100
-        self.progress_label.config(text=f"Break: {int((elapsed / break_seconds)*100)}% Complete")
-        if remaining <= 0:
-            self.end_break()
+            break_seconds = session.break_seconds
+            elapsed = session.break_elapsed()
+            remaining = max(break_seconds - elapsed, 0)
+            mins, secs = divmod(int(remaining), 60)
+            self.view.set(self.next_break_label, text=f"{mins:02d}:{secs:02d}")
+            self.view.set(self.progress_bar, value=min((elapsed / break_seconds) * 100, 100))
+            self.view.set(self.progress_label, text=f"Break: {int(min(elapsed / break_seconds, 1) * 100)}% Complete")
 
     def trigger_break(self):
-        points_earned = self.work_interval.get()
-        self.gamification.add_points(points_earned)
-        self.app_state = "breaking"
-        self.break_start_time = time.time()
-        self.active_time = 0
-        self.current_status_label.config(text="On Break", foreground=COLORS["secondary"])
-        self.show_break_alert()
-        self.update_gamification_display()
+        self.send_command(self.service.take_break)
 
     def snooze_alert(self):
-        self.snooze_until = time.time() + 300
-        self.active_time = 0
-        messagebox.showinfo("Snoozed", "Break reminder postponed for 5 minutes")
+        self.send_command(self.service.snooze, 300)
 
     def check_audio_files(self):
         if not os.path.exists(self.break_sound):
@@ -283,12 +450,13 @@ class HealthAppUI(tk.Tk):
         except Exception as e:
             print(f"Error deactivating screensaver: {str(e)}")
 
+    def notify(self, title, message):
+        messagebox.showinfo(title, message)
+
     def play_sound(self, sound_file):
-        try:
-            if os.path.exists(sound_file):
-                winsound.PlaySound(sound_file, winsound.SND_FILENAME)
-        except Exception as e:
-            print(f"Error playing sound: {str(e)}")
+        # Missing or unreadable files are logged by the audio thread
+        with STAGES.time("ui.play_sound"):
+            self.audio.play(sound_file)
 
     def show_break_alert(self):
         self.break_alert = tk.Toplevel(self)
@@ -303,18 +471,7 @@ class HealthAppUI(tk.Tk):
         ttk.Button(self.break_alert, text="End Break", command=lambda: [self.end_break(), self.break_alert.destroy()]).pack(pady=10)
 
     def end_break(self):
-        self.gamification.record_break()
-        if hasattr(self, 'break_alert') and self.break_alert.winfo_exists():
-            self.break_alert.destroy()
-        self.app_state = "working"
-        self.current_status_label.config(text="Working", foreground=COLORS["primary"])
-        self.monitor.last_activity_time = time.time()
-        self.active_time = 0
-        self.paused = True
-        self.pause_button.config(text="Resume")
-        self.current_status_label.config(text="Paused", foreground=COLORS["highlight"])
-        self.show_continue_alert()
-        self.update_gamification_display()
+        self.send_command(self.service.finish_break)
 
     def show_continue_alert(self):
         self.deactivate_screensaver()
@@ -327,5 +484,6 @@ class HealthAppUI(tk.Tk):
                   command=lambda: [self.toggle_pause(), self.continue_alert.destroy()]).pack(pady=10)
 
     def on_closing(self):
-        self.monitor.stop()
+        self.service.close()
+        self.audio.close()
         self.destroy()
\ No newline at end of file
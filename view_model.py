@@ -0,0 +1,80 @@
+class ViewModel:
+    # Sits between HealthAppUI and Tk. Callers set the values they want a
+    # widget to show; flush() compares them with what was last sent and
+    # issues at most one configure per widget, skipping widgets whose tab is
+    # not visible (they catch up when the tab is shown). Every configure is a
+    # Tcl round-trip, so both sides are counted.
+    def __init__(self):
+        self._rendered = {}  # widget -> options as last sent to Tk
+        self._pending = {}   # widget -> options changed since then
+        self._tab_of = {}
+        self.visible_tab = None
+        self.window_mapped = True
+
+        self.ticks = 0
+        self.requested = 0   # option updates asked for, i.e. what a direct config() per update would cost
+        self.sent = 0        # configure calls actually made
+        self.deferred = 0
+        self.last_requested = 0
+        self.last_sent = 0
+        self._requested_at_flush = 0
+
+    def register(self, tab, *widgets):
+        for widget in widgets:
+            self._tab_of[widget] = tab
+
+    def show_tab(self, tab):
+        self.visible_tab = tab
+
+    def set_window_mapped(self, mapped):
+        self.window_mapped = mapped
+
+    def is_visible(self, tab):
+        return self.window_mapped and (tab is None or self.visible_tab is None or tab is self.visible_tab)
+
+    def set(self, widget, **options):
+        self.requested += 1
+        rendered = self._rendered.get(widget)
+        pending = self._pending.get(widget)
+        for name, value in options.items():
+            if rendered is not None and name in rendered and rendered[name] == value:
+                # Back to what Tk already shows: drop any change queued this tick
+                if pending is not None:
+                    pending.pop(name, None)
+                continue
+            if pending is None:
+                pending = self._pending[widget] = {}
+            pending[name] = value
+
+    def flush(self):
+        sent = 0
+        for widget in list(self._pending):
+            options = self._pending[widget]
+            if not options:
+                del self._pending[widget]
+                continue
+            if not self.is_visible(self._tab_of.get(widget)):
+                self.deferred += 1
+                continue
+            widget.configure(**options)
+            self._rendered.setdefault(widget, {}).update(options)
+            del self._pending[widget]
+            sent += 1
+        self.ticks += 1
+        self.sent += sent
+        self.last_sent = sent
+        self.last_requested = self.requested - self._requested_at_flush
+        self._requested_at_flush = self.requested
+        return sent
+
+    def stats(self):
+        ticks = max(self.ticks, 1)
+        return {
+            "ticks": self.ticks,
+            "requested_per_tick": self.requested / ticks,
+            "tcl_calls_per_tick": self.sent / ticks,
+            "last_requested": self.last_requested,
+            "last_tcl_calls": self.last_sent,
+            "deferred": self.deferred,
+            "pending_widgets": len(self._pending),
+        }